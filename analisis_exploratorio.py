@@ -7,20 +7,90 @@ Fecha: 2024
 Descripción: Script para identificar problemas de calidad en los datos antes de la importación
 """
 
+import argparse
 import json
 import os
-from collections import defaultdict, Counter
-from datetime import datetime
-import re
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import backend_json
+from analizadores import DocRef, default_analyzers
+from cache_eda import CACHE_DIRNAME, AnalysisCache, FileResult, analyzers_signature
+from estadisticas import DEFAULT_HLL_PRECISION, DEFAULT_MAX_EXACT, DEFAULT_RELATIVE_ACCURACY
+from fechas import detect_date_format
+from lector_json import MappedDump, iter_documents_in_buffer
+from metricas import Metrics, add_metrics_arguments
+from muestreo import DEFAULT_CONFIDENCE, run_sampled_analysis
+
+def analyze_dump(filepath, analyzers, timings=None):
+    """
+    Actualiza los acumuladores vacíos recibidos con los documentos de un
+    volcado y devuelve el FileResult. Es una función de módulo para poder
+    ejecutarse en un proceso del pool: solo recibe y devuelve datos
+    serializables, sin estado compartido. Con timings (dict) suma en él los
+    segundos de lectura y decodificación ('parse') y de cada acumulador; sin
+    él el bucle no mide nada.
+    """
+    filename = os.path.basename(filepath)
+    clock = time.perf_counter
+    start = clock()
+    spent = [0.0] * len(analyzers)
+    
+    # Archivo mapeado en memoria: un único decode por objeto
+    dump = MappedDump(filepath)
+    loaded = 0
+    if timings is None:
+        updates = [analyzer.update for analyzer in analyzers]
+        for offset, doc in dump.iter_documents_with_offsets():
+            ref = DocRef(filename, offset)
+            for update in updates:
+                update(doc, ref)
+            loaded += 1
+    else:
+        for offset, doc in dump.iter_documents_with_offsets():
+            ref = DocRef(filename, offset)
+            for i, analyzer in enumerate(analyzers):
+                t = clock()
+                analyzer.update(doc, ref)
+                spent[i] += clock() - t
+            loaded += 1
+    for analyzer in analyzers:
+        analyzer.finish()
+    
+    if timings is not None:
+        timings['parse'] = timings.get('parse', 0.0) + clock() - start - sum(spent)
+        for analyzer, seconds in zip(analyzers, spent):
+            name = f"analyze_{type(analyzer).__name__}"
+            timings[name] = timings.get(name, 0.0) + seconds
+    
+    return FileResult(filename, loaded, dump.encoding, dump.fallback_objects,
+                      sorted(dump.fallback_encodings), dump.malformed, analyzers)
+
+
+def analyze_dump_timed(filepath, analyzers, timed=True):
+    """analyze_dump para el pool: devuelve (FileResult, timings)"""
+    timings = {} if timed else None
+    return analyze_dump(filepath, analyzers, timings), timings or {}
+
 
 class DataExplorer:
-    def __init__(self, data_directory):
+    def __init__(self, data_directory, analyzers=None, cache=None, workers=1, metrics=None,
+                 timed_analyzers=False):
         self.data_directory = data_directory
-        self.all_documents = []
+        self.documents_loaded = 0
+        self.metrics = Metrics("analisis_exploratorio") if metrics is None else metrics
+        # Medir cada acumulador por documento solo si se exportan las métricas
+        self.timed_analyzers = timed_analyzers
+        self.cache = cache
+        self.workers = workers
+        self.analyzers = default_analyzers() if analyzers is None else list(analyzers)
         self.quality_issues = {
             'duplicados': [],
             'valores_ausentes': defaultdict(list),
             'formatos_fecha': defaultdict(set),
+            'fechas_no_convertibles': defaultdict(int),
             'inconsistencias_estructura': [],
             'valores_anomalos': [],
             'tipos_datos_mixtos': defaultdict(set)
@@ -30,408 +100,173 @@ class DataExplorer:
         """
         Parser personalizado para archivos con múltiples objetos JSON separados
         """
-        documents = []
-        
-        # Estrategia 1: Intentar como array JSON estándar
+        # Estrategia 1: el archivo ya es un array JSON estándar (o un único objeto)
         try:
             data = json.loads(content)
-            if isinstance(data, list):
-                return data
-            else:
-                return [data]
-        except json.JSONDecodeError:
+            return data if isinstance(data, list) else [data]
+        except ValueError:
             pass
         
-        # Estrategia 2: Separar por objetos JSON individuales
-        # Buscar patrones de inicio de objeto JSON
-        brace_count = 0
-        current_obj = ""
-        in_string = False
-        escape_next = False
-        
-        for char in content:
-            if escape_next:
-                current_obj += char
-                escape_next = False
-                continue
-                
-            if char == '\\':
-                escape_next = True
-                current_obj += char
-                continue
-            
-            if char == '"' and not escape_next:
-                in_string = not in_string
-            
-            if not in_string:
-                if char == '{':
-                    if brace_count == 0:
-                        current_obj = ""
-                    brace_count += 1
-                elif char == '}':
-                    brace_count -= 1
-            
-            current_obj += char
-            
-            # Cuando cerramos un objeto completo
-            if brace_count == 0 and current_obj.strip():
+        # Estrategia 2: objetos JSON individuales localizados sobre los bytes
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        return [doc for _, doc in iter_documents_in_buffer(content)]
+    
+    def register_analyzer(self, analyzer):
+        """Registra un acumulador adicional (ver analizadores.Analyzer)"""
+        self.analyzers.append(analyzer)
+    
+    def analyze_file(self, filename, timings=None):
+        """Analiza un archivo con acumuladores vacíos y devuelve su resultado parcial"""
+        templates = [analyzer.fresh() for analyzer in self.analyzers]
+        return analyze_dump(os.path.join(self.data_directory, filename), templates, timings)
+    
+    def _analyze_and_store(self, filename, signature):
+        """Analiza un archivo y guarda su resultado en la caché; devuelve (resultado, error)"""
+        timings = {} if self.timed_analyzers else None
+        try:
+            result = self.analyze_file(filename, timings)
+        except (OSError, ValueError) as e:
+            return None, f"No se pudo leer el archivo: {e}"
+        self._store(result, signature)
+        self._record_timings(filename, result, timings or {})
+        return result, None
+    
+    def _record_timings(self, filename, result, timings):
+        """
+        Registra lectura y acumuladores de un archivo analizado (no de la
+        caché) como fases. Con workers > 1 son la suma de todos los procesos.
+        """
+        size = os.path.getsize(os.path.join(self.data_directory, filename))
+        self.metrics.add(bytes_read=size)
+        for name, seconds in timings.items():
+            if name == 'parse':
+                self.metrics.record(name, seconds, docs=result.documents, bytes_read=size)
+            else:
+                self.metrics.record(name, seconds, docs=result.documents)
+    
+    def _store(self, result, signature):
+        if not self.cache:
+            return
+        try:
+            self.cache.store(os.path.join(self.data_directory, result.filename), signature, result)
+        except OSError as e:
+            print(f"   ⚠️  No se pudo guardar {result.filename} en la caché: {e}")
+    
+    def _analyze_parallel(self, filenames, signature, workers):
+        """
+        Analiza los archivos en un pool de procesos (map) y devuelve
+        {archivo: (resultado, error)}. La combinación (reduce) se hace después
+        en load_all en orden alfabético, así el informe no depende del orden
+        en que terminan los procesos.
+        """
+        print(f"\n⚙️  Analizando {len(filenames)} archivos en {workers} procesos")
+        templates = [analyzer.fresh() for analyzer in self.analyzers]
+        results = {}
+        
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(analyze_dump_timed, os.path.join(self.data_directory, filename), templates,
+                            self.timed_analyzers): filename
+                for filename in filenames
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                filename = futures[future]
                 try:
-                    obj = json.loads(current_obj.strip())
-                    documents.append(obj)
-                    current_obj = ""
-                except json.JSONDecodeError as e:
-                    # Intentar limpiar y parsear de nuevo
-                    cleaned = current_obj.strip()
-                    if cleaned:
-                        try:
-                            obj = json.loads(cleaned)
-                            documents.append(obj)
-                        except:
-                            pass
-                    current_obj = ""
+                    result, timings = future.result()
+                except Exception as e:
+                    results[filename] = (None, f"No se pudo leer el archivo: {e}")
+                    print(f"   [{done}/{len(filenames)}] ✗ {filename}")
+                    continue
+                results[filename] = (result, None)
+                self._store(result, signature)
+                self._record_timings(filename, result, timings)
+                print(f"   [{done}/{len(filenames)}] ✓ {filename} ({result.documents} documentos)")
         
-        return documents
+        return results
+    
+    def _merge_result(self, result):
+        """Incorpora el resultado parcial de un archivo al análisis global"""
+        for analyzer, partial in zip(self.analyzers, result.analyzers):
+            analyzer.merge(partial)
+        self.documents_loaded += result.documents
+        
+        encoding_info = result.encoding
+        if result.fallback_objects:
+            encoding_info += f", {result.fallback_objects} objetos en {', '.join(result.fallback_encodings)}"
+        
+        if result.documents:
+            print(f"   ✓ Cargados {result.documents} documentos (encoding: {encoding_info})")
+        else:
+            print(f"   ⚠️  No se encontraron documentos válidos en el archivo")
+        
+        for bad in result.malformed:
+            print(f"   ⚠️  Objeto inválido en byte {bad.offset} ({bad.length} bytes): {bad.message}")
+            self.quality_issues['inconsistencias_estructura'].append(
+                f"{result.filename}: objeto JSON inválido en byte {bad.offset}"
+            )
     
-    def load_all_files(self):
-        """Carga todos los archivos JSON del directorio con manejo robusto"""
+    def load_all(self):
+        """
+        Analiza todos los archivos JSON del directorio. Los que no han cambiado
+        desde la última ejecución se toman de la caché sin volver a leerlos y,
+        con workers > 1, el resto se analiza en un pool de procesos.
+        """
         print("=" * 80)
         print("CARGANDO ARCHIVOS JSON")
         print("=" * 80)
         
         json_files = sorted([f for f in os.listdir(self.data_directory) if f.endswith('.json')])
+        signature = analyzers_signature(self.analyzers)
         
-        # Lista de encodings a probar en orden
-        encodings_to_try = ['utf-8', 'latin-1', 'iso-8859-1', 'windows-1252', 'cp1252']
+        cached = {}
+        if self.cache:
+            for filename in json_files:
+                result = self.cache.load(os.path.join(self.data_directory, filename), signature)
+                if result is not None:
+                    cached[filename] = result
+        
+        pending = [f for f in json_files if f not in cached]
+        workers = min(self.workers if self.workers > 0 else (os.cpu_count() or 1), len(pending))
+        analyzed = self._analyze_parallel(pending, signature, workers) if workers > 1 else {}
+        
+        fallback_files = []
         
         for filename in json_files:
-            filepath = os.path.join(self.data_directory, filename)
             print(f"\n📁 Procesando: {filename}")
             
-            content = None
-            used_encoding = None
-            
-            # Intentar leer con diferentes encodings
-            for encoding in encodings_to_try:
-                try:
-                    with open(filepath, 'r', encoding=encoding, errors='replace') as f:
-                        content = f.read()
-                        used_encoding = encoding
-                        break
-                except Exception as e:
-                    continue
-            
-            if content is None:
-                print(f"   ✗ ERROR: No se pudo leer el archivo con ningún encoding")
-                continue
-            
-            # Parsear los documentos JSON
-            try:
-                documents = self.parse_multi_json_file(content)
-                
-                if documents:
-                    self.all_documents.extend(documents)
-                    print(f"   ✓ Cargados {len(documents)} documentos (encoding: {used_encoding})")
-                else:
-                    print(f"   ⚠️  No se encontraron documentos válidos en el archivo")
-                    
-            except Exception as e:
-                print(f"   ✗ ERROR al parsear: {e}")
-        
-        print(f"\n{'='*80}")
-        print(f"TOTAL DE DOCUMENTOS CARGADOS: {len(self.all_documents)}")
-        print(f"{'='*80}\n")
-        
-    def analyze_ids(self):
-        """Analiza los identificadores únicos"""
-        print("\n" + "=" * 80)
-        print("1. ANÁLISIS DE IDENTIFICADORES (_id)")
-        print("=" * 80)
-        
-        ids = []
-        ids_sin_campo = 0
-        formatos_id = defaultdict(int)
-        
-        for idx, doc in enumerate(self.all_documents):
-            if '_id' not in doc:
-                ids_sin_campo += 1
-                self.quality_issues['valores_ausentes']['_id'].append(idx)
+            if filename in cached:
+                result = cached[filename]
+                print(f"   ♻️  Sin cambios: resultado recuperado de la caché")
             else:
-                id_val = doc['_id']
-                ids.append(id_val)
-                
-                # Analizar formato del ID
-                if isinstance(id_val, str):
-                    patron = re.sub(r'\d+', 'N', id_val)
-                    formatos_id[patron] += 1
-        
-        # Detectar duplicados
-        id_counts = Counter(ids)
-        duplicados = {id_val: count for id_val, count in id_counts.items() if count > 1}
-        
-        print(f"\n📊 Estadísticas de IDs:")
-        print(f"   • Total de documentos: {len(self.all_documents)}")
-        print(f"   • Documentos sin _id: {ids_sin_campo}")
-        print(f"   • IDs únicos: {len(set(ids))}")
-        print(f"   • IDs duplicados: {len(duplicados)}")
-        
-        if duplicados:
-            print(f"\n⚠️  PROBLEMA: IDs DUPLICADOS DETECTADOS")
-            for id_val, count in list(duplicados.items())[:5]:
-                print(f"      - '{id_val}': {count} veces")
-                self.quality_issues['duplicados'].append(id_val)
-            if len(duplicados) > 5:
-                print(f"      ... y {len(duplicados) - 5} más")
-        
-        print(f"\n📋 Formatos de ID encontrados:")
-        for patron, count in sorted(formatos_id.items(), key=lambda x: -x[1])[:10]:
-            print(f"   • {patron}: {count} documentos")
-    
-    def analyze_dates(self):
-        """Analiza todos los campos de fecha"""
-        print("\n" + "=" * 80)
-        print("2. ANÁLISIS DE FECHAS")
-        print("=" * 80)
-        
-        date_fields = ['charge date', 'dump date', 'billing']
-        
-        for field in date_fields:
-            print(f"\n📅 Campo: '{field}'")
-            formatos = defaultdict(int)
-            valores_ausentes = 0
-            ejemplos = []
-            
-            for idx, doc in enumerate(self.all_documents):
-                if field not in doc:
-                    valores_ausentes += 1
-                    self.quality_issues['valores_ausentes'][field].append(idx)
+                if filename in analyzed:
+                    result, error = analyzed[filename]
                 else:
-                    valor = doc[field]
-                    if valor is None:
-                        valores_ausentes += 1
-                    else:
-                        formato = self._detect_date_format(valor)
-                        formatos[formato] += 1
-                        self.quality_issues['formatos_fecha'][field].add(formato)
-                        
-                        if len(ejemplos) < 3:
-                            ejemplos.append(valor)
-            
-            print(f"   • Valores ausentes/nulos: {valores_ausentes}")
-            print(f"   • Formatos detectados: {len(formatos)}")
-            
-            if formatos:
-                print(f"   • Distribución de formatos:")
-                for formato, count in sorted(formatos.items(), key=lambda x: -x[1]):
-                    print(f"      - {formato}: {count} documentos")
-            
-            if ejemplos:
-                print(f"   • Ejemplos: {ejemplos}")
+                    result, error = self._analyze_and_store(filename, signature)
+                if error:
+                    print(f"   ✗ ERROR: {error}")
+                    continue
             
-            if len(formatos) > 1:
-                print(f"   ⚠️  PROBLEMA: Formatos de fecha heterogéneos")
-    
-    def analyze_client_structure(self):
-        """Analiza la estructura del cliente"""
-        print("\n" + "=" * 80)
-        print("3. ANÁLISIS DE ESTRUCTURA - CLIENT")
-        print("=" * 80)
-        
-        client_fields = set()
-        field_types = defaultdict(lambda: defaultdict(int))
-        missing_client = 0
-        
-        for idx, doc in enumerate(self.all_documents):
-            if 'Client' not in doc:
-                missing_client += 1
-                self.quality_issues['valores_ausentes']['Client'].append(idx)
-            elif doc['Client'] is None:
-                missing_client += 1
-            else:
-                client = doc['Client']
-                if isinstance(client, dict):
-                    client_fields.update(client.keys())
-                    
-                    for key, value in client.items():
-                        tipo = type(value).__name__
-                        field_types[key][tipo] += 1
+            self._merge_result(result)
+            if result.encoding != 'utf-8' or result.fallback_objects:
+                fallback_files.append(result)
+        
+        if fallback_files:
+            print(f"\n⚠️  Archivos que necesitaron un encoding alternativo a UTF-8:")
+            for result in fallback_files:
+                if result.encoding != 'utf-8':
+                    print(f"   • {result.filename}: archivo completo en {result.encoding}")
                 else:
-                    self.quality_issues['inconsistencias_estructura'].append(
-                        f"Doc {idx}: 'Client' no es un diccionario: {type(client).__name__}"
-                    )
-        
-        print(f"\n📊 Estadísticas de Client:")
-        print(f"   • Documentos sin Client: {missing_client}")
-        print(f"   • Campos únicos encontrados: {len(client_fields)}")
-        
-        print(f"\n📋 Campos en Client:")
-        for field in sorted(client_fields):
-            print(f"   • {field}")
-            tipos = field_types[field]
-            if len(tipos) > 1:
-                print(f"      ⚠️  PROBLEMA: Tipos mixtos detectados")
-                for tipo, count in tipos.items():
-                    print(f"         - {tipo}: {count} documentos")
-                self.quality_issues['tipos_datos_mixtos'][f'Client.{field}'].update(tipos.keys())
-    
-    def analyze_contract_structure(self):
-        """Analiza la estructura del contrato"""
-        print("\n" + "=" * 80)
-        print("4. ANÁLISIS DE ESTRUCTURA - CONTRACT")
-        print("=" * 80)
-        
-        contract_fields = set()
-        product_fields = set()
-        missing_contract = 0
-        missing_product = 0
-        
-        for idx, doc in enumerate(self.all_documents):
-            if 'contract' not in doc:
-                missing_contract += 1
-                self.quality_issues['valores_ausentes']['contract'].append(idx)
-            elif doc['contract'] is None:
-                missing_contract += 1
-            else:
-                contract = doc['contract']
-                if isinstance(contract, dict):
-                    contract_fields.update(contract.keys())
-                    
-                    if 'product' in contract:
-                        product = contract['product']
-                        if isinstance(product, dict):
-                            product_fields.update(product.keys())
-                        elif product is None:
-                            missing_product += 1
-                    else:
-                        missing_product += 1
-        
-        print(f"\n📊 Estadísticas de Contract:")
-        print(f"   • Documentos sin contract: {missing_contract}")
-        print(f"   • Campos únicos en contract: {len(contract_fields)}")
-        print(f"   • Documentos sin product: {missing_product}")
-        print(f"   • Campos únicos en product: {len(product_fields)}")
-        
-        print(f"\n📋 Campos en Contract:")
-        for field in sorted(contract_fields):
-            print(f"   • {field}")
-        
-        if product_fields:
-            print(f"\n📋 Campos en Product:")
-            for field in sorted(product_fields):
-                print(f"   • {field}")
-    
-    def analyze_movies_series(self):
-        """Analiza la estructura de películas y series"""
-        print("\n" + "=" * 80)
-        print("5. ANÁLISIS DE CONTENIDOS - MOVIES & SERIES")
-        print("=" * 80)
-        
-        total_movies = 0
-        total_series = 0
-        docs_sin_movies = 0
-        docs_sin_series = 0
-        
-        movie_fields = set()
-        series_fields = set()
+                    print(f"   • {result.filename}: {result.fallback_objects} objetos no UTF-8 "
+                          f"({', '.join(result.fallback_encodings)})")
         
-        for idx, doc in enumerate(self.all_documents):
-            if 'Movies' not in doc:
-                docs_sin_movies += 1
-            elif doc['Movies'] is None:
-                docs_sin_movies += 1
-            else:
-                movies = doc['Movies']
-                if isinstance(movies, list):
-                    total_movies += len(movies)
-                    for movie in movies:
-                        if isinstance(movie, dict):
-                            movie_fields.update(movie.keys())
-            
-            if 'Series' not in doc:
-                docs_sin_series += 1
-            elif doc['Series'] is None:
-                docs_sin_series += 1
-            else:
-                series = doc['Series']
-                if isinstance(series, list):
-                    total_series += len(series)
-                    for serie in series:
-                        if isinstance(serie, dict):
-                            series_fields.update(serie.keys())
-        
-        print(f"\n🎬 Estadísticas de Movies:")
-        print(f"   • Documentos sin Movies: {docs_sin_movies}")
-        print(f"   • Total de películas: {total_movies}")
-        if (len(self.all_documents) - docs_sin_movies) > 0:
-            print(f"   • Promedio por documento: {total_movies / (len(self.all_documents) - docs_sin_movies):.2f}")
-        print(f"   • Campos únicos: {len(movie_fields)}")
+        if self.cache:
+            print(f"\n♻️  Caché: {self.cache.hits} archivos reutilizados, {self.cache.misses} analizados")
         
-        print(f"\n📺 Estadísticas de Series:")
-        print(f"   • Documentos sin Series: {docs_sin_series}")
-        print(f"   • Total de series: {total_series}")
-        if (len(self.all_documents) - docs_sin_series) > 0:
-            print(f"   • Promedio por documento: {total_series / (len(self.all_documents) - docs_sin_series):.2f}")
-        print(f"   • Campos únicos: {len(series_fields)}")
-        
-        if movie_fields:
-            print(f"\n📋 Campos en Movies:")
-            for field in sorted(movie_fields):
-                print(f"   • {field}")
-        
-        if series_fields:
-            print(f"\n📋 Campos en Series:")
-            for field in sorted(series_fields):
-                print(f"   • {field}")
-    
-    def analyze_numeric_fields(self):
-        """Analiza campos numéricos y detecta anomalías"""
-        print("\n" + "=" * 80)
-        print("6. ANÁLISIS DE CAMPOS NUMÉRICOS")
-        print("=" * 80)
-        
-        numeric_fields = ['TOTAL']
+        print(f"\n{'='*80}")
+        print(f"TOTAL DE DOCUMENTOS CARGADOS: {self.documents_loaded}")
+        print(f"{'='*80}\n")
         
-        for field in numeric_fields:
-            print(f"\n💰 Campo: '{field}'")
-            valores = []
-            tipos = defaultdict(int)
-            ausentes = 0
-            
-            for idx, doc in enumerate(self.all_documents):
-                if field not in doc:
-                    ausentes += 1
-                elif doc[field] is None:
-                    ausentes += 1
-                else:
-                    valor = doc[field]
-                    tipos[type(valor).__name__] += 1
-                    
-                    try:
-                        num_val = float(valor)
-                        valores.append(num_val)
-                    except (ValueError, TypeError):
-                        self.quality_issues['valores_anomalos'].append(
-                            f"{field} en doc {idx}: valor no numérico '{valor}'"
-                        )
-            
-            print(f"   • Valores ausentes: {ausentes}")
-            print(f"   • Tipos de datos encontrados:")
-            for tipo, count in tipos.items():
-                print(f"      - {tipo}: {count}")
-            
-            if valores:
-                print(f"   • Estadísticas:")
-                print(f"      - Mínimo: {min(valores):.2f}")
-                print(f"      - Máximo: {max(valores):.2f}")
-                print(f"      - Promedio: {sum(valores)/len(valores):.2f}")
-                
-                negativos = [v for v in valores if v < 0]
-                ceros = [v for v in valores if v == 0]
-                
-                if negativos:
-                    print(f"   ⚠️  ADVERTENCIA: {len(negativos)} valores negativos")
-                if ceros:
-                    print(f"   ⚠️  ADVERTENCIA: {len(ceros)} valores en cero")
-    
     def generate_summary_report(self):
         """Genera un resumen de problemas detectados"""
         print("\n" + "=" * 80)
@@ -457,6 +292,8 @@ class DataExplorer:
                 print(f"      • {field}: {len(formatos)} formatos diferentes")
                 for fmt in formatos:
                     print(f"         - {fmt}")
+        for field, count in self.quality_issues['fechas_no_convertibles'].items():
+            print(f"      • {field}: {count} valores no convertibles a fecha")
         print(f"      • Acción requerida: Normalizar a formato ISO 8601")
         
         if self.quality_issues['tipos_datos_mixtos']:
@@ -486,8 +323,9 @@ class DataExplorer:
    - Usar $dateFromString con manejo de errores
    
 2. GESTIÓN DE DUPLICADOS
-   - Identificar criterio de unicidad real
-   - Eliminar o consolidar duplicados
+   - Identificar criterio de unicidad real (deduplicacion.py: contenido y
+     cliente + contrato + mes de facturación + TOTAL)
+   - Eliminar o consolidar duplicados (--plan-dedup al convertir o cargar)
    
 3. VALORES AUSENTES
    - Definir política de nulos por campo
@@ -504,45 +342,71 @@ class DataExplorer:
     
     def _detect_date_format(self, date_value):
         """Detecta el formato de una fecha"""
-        if not isinstance(date_value, str):
-            return f"tipo_{type(date_value).__name__}"
-        
-        patterns = [
-            (r'^\d{2}/\d{2}/\d{4}$', 'DD/MM/YYYY'),
-            (r'^\d{2}/\d{2}/\d{2}$', 'DD/MM/YY'),
-            (r'^\d{4}-\d{2}-\d{2}$', 'YYYY-MM-DD (ISO)'),
-            (r'^[A-Za-z]+ \d{4}$', 'Month YYYY'),
-            (r'^\d{2}/\d{2}/\d{2,4}$', 'DD/MM/YY(YY)'),
-        ]
-        
-        for pattern, formato in patterns:
-            if re.match(pattern, date_value):
-                return formato
-        
-        return f"otro: '{date_value[:20]}...'" if len(date_value) > 20 else f"otro: '{date_value}'"
+        return detect_date_format(date_value)
     
     def run_full_analysis(self):
-        """Ejecuta el análisis completo"""
-        self.load_all_files()
+        """Ejecuta el análisis completo en una sola pasada sobre los documentos"""
+        with self.metrics.phase("load"):
+            self.load_all()
+            self.metrics.add(docs=self.documents_loaded)
         
-        if not self.all_documents:
+        if not self.documents_loaded:
             print("\n❌ No se pudieron cargar documentos. Verifica la ruta.")
             return
         
-        self.analyze_ids()
-        self.analyze_dates()
-        self.analyze_client_structure()
-        self.analyze_contract_structure()
-        self.analyze_movies_series()
-        self.analyze_numeric_fields()
-        self.generate_summary_report()
+        try:
+            for analyzer in self.analyzers:
+                with self.metrics.phase(f"report_{type(analyzer).__name__}"):
+                    analyzer.report(self.quality_issues)
+            with self.metrics.phase("summary_report"):
+                self.generate_summary_report()
+        finally:
+            for analyzer in self.analyzers:
+                analyzer.close()
         
         print("\n✅ Análisis exploratorio completado.")
         print(f"📄 Revisar este informe antes de proceder con la importación a MongoDB.\n")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Análisis exploratorio de los volcados de facturas")
+    parser.add_argument('--sin-cache', action='store_true',
+                        help="analizar todos los archivos sin leer ni escribir la caché")
+    parser.add_argument('--invalidar-cache', action='store_true',
+                        help="borrar la caché y volver a analizar todos los archivos")
+    parser.add_argument('--cache-hash', action='store_true',
+                        help="validar la caché por hash SHA-256 del contenido en vez de tamaño y fecha")
+    parser.add_argument('--cache-dir', default=None,
+                        help=f"directorio de la caché (por defecto: <datos>/{CACHE_DIRNAME})")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="procesos para analizar archivos en paralelo (0 = todos los núcleos)")
+    parser.add_argument('--precision-cuantiles', type=float, default=DEFAULT_RELATIVE_ACCURACY,
+                        help="error relativo de los percentiles (por defecto: %(default)s)")
+    parser.add_argument('--precision-hll', type=int, default=DEFAULT_HLL_PRECISION,
+                        help="precisión de HyperLogLog, 2^p registros (por defecto: %(default)s)")
+    parser.add_argument('--max-ids-memoria', type=int, default=DEFAULT_MAX_EXACT,
+                        help="_id distintos en memoria antes de volcar a disco (por defecto: %(default)s)")
+    parser.add_argument('--columnar', action='store_true',
+                        help="análisis vectorizado de fechas, contenidos y numéricos sobre la caché columnar (numpy)")
+    parser.add_argument('--reconstruir-columnar', action='store_true',
+                        help="reconstruir la caché columnar aunque los volcados no hayan cambiado")
+    parser.add_argument('--muestra', type=float, metavar='FRACCION', default=None,
+                        help="análisis aproximado: leer solo esta fracción de los bytes en objetos al azar")
+    parser.add_argument('--muestra-docs', type=int, metavar='N', default=None,
+                        help="análisis aproximado: muestrear N documentos al azar")
+    parser.add_argument('--semilla', type=int, default=None,
+                        help="semilla del muestreo, para repetir la misma muestra")
+    parser.add_argument('--confianza', type=float, default=DEFAULT_CONFIDENCE,
+                        help="nivel de confianza de los intervalos del muestreo (por defecto: %(default)s)")
+    add_metrics_arguments(parser)
+    backend_json.add_backend_argument(parser)
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
     DATA_DIR = "./datafiles"
+    args = parse_args()
+    backend_json.set_backend(args.backend_json)
     
     print("""
 ╔══════════════════════════════════════════════════════════════════════════════╗
@@ -551,5 +415,49 @@ if __name__ == "__main__":
 ╚══════════════════════════════════════════════════════════════════════════════╝
     """)
     
-    explorer = DataExplorer(DATA_DIR)
-    explorer.run_full_analysis()
+    metrics = Metrics("analisis_exploratorio", profile_dir=args.perfilar)
+    export_metrics = args.metricas or args.metricas_prom or args.perfilar
+    
+    if args.muestra is not None or args.muestra_docs is not None:
+        try:
+            with metrics.phase("sample"):
+                run_sampled_analysis(DATA_DIR, fraction=args.muestra, size=args.muestra_docs,
+                                     seed=args.semilla, confidence=args.confianza)
+        except ValueError as e:
+            print(f"❌ {e}")
+        if export_metrics:
+            metrics.export(args.metricas, args.metricas_prom)
+        raise SystemExit
+    
+    if args.columnar:
+        from cache_columnar import run_columnar_analysis
+        try:
+            with metrics.phase("columnar"):
+                run_columnar_analysis(DATA_DIR, rebuild=args.reconstruir_columnar)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+        if export_metrics:
+            metrics.export(args.metricas, args.metricas_prom)
+        raise SystemExit
+    
+    cache = None
+    if not args.sin_cache:
+        cache = AnalysisCache(args.cache_dir or os.path.join(DATA_DIR, CACHE_DIRNAME), use_hash=args.cache_hash)
+        if args.invalidar_cache:
+            print(f"🗑️  Caché invalidada: {cache.clear()} entradas eliminadas\n")
+    
+    # Sin caché los volcados de cada archivo no se reutilizan: se escriben
+    # en un directorio temporal que se borra al terminar
+    with tempfile.TemporaryDirectory(prefix='eda_spill_') as spill_tmp:
+        analyzers = default_analyzers(
+            relative_accuracy=args.precision_cuantiles,
+            hll_precision=args.precision_hll,
+            max_exact_ids=args.max_ids_memoria,
+            spill_dir=cache.spill_dir if cache else spill_tmp,
+        )
+        
+        explorer = DataExplorer(DATA_DIR, analyzers=analyzers, cache=cache, workers=args.workers, metrics=metrics,
+                                timed_analyzers=bool(export_metrics))
+        explorer.run_full_analysis()
+    if export_metrics:
+        metrics.export(args.metricas, args.metricas_prom)
@@ -0,0 +1,590 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Acumuladores del Análisis Exploratorio de Datos (EDA)
+Descripción: Cada análisis es un acumulador que recibe los documentos uno a uno
+(update), puede combinarse con otro acumulador parcial (merge) y al final
+imprime su sección del informe (report). Así todos los análisis se calculan
+en una sola pasada sin mantener el corpus en memoria.
+"""
+
+import re
+from collections import Counter, defaultdict, namedtuple
+
+from estadisticas import (DEFAULT_HLL_PRECISION, DEFAULT_MAX_EXACT, DEFAULT_RELATIVE_ACCURACY,
+                          DuplicateDetector, HyperLogLog, QuantileSketch, RunningStats)
+from fechas import classify_date, date_cache_info
+
+
+class DocRef(namedtuple('DocRef', ['archivo', 'offset'])):
+    """
+    Referencia a un documento: archivo y offset en bytes del objeto. No
+    depende de los demás archivos, así que los resultados parciales de cada
+    volcado (caché o procesos del pool) se combinan sin renumerar, y el
+    offset permite localizar el documento en el volcado original.
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        return f"{self.archivo}@{self.offset}"
+
+
+class Analyzer:
+    """
+    Base de los acumuladores del EDA.
+
+    Para añadir un análisis sobre un campo nuevo basta con heredar de esta
+    clase, implementar los tres métodos y registrarlo con
+    DataExplorer.register_analyzer(). ref identifica el documento (DocRef)
+    y se usa para reportar problemas de calidad. El estado debe ser
+    serializable con pickle para poder guardarse en la caché del EDA.
+    Los parámetros de precisión se guardan en settings para que fresh()
+    cree acumuladores parciales compatibles.
+    """
+
+    settings = {}
+
+    def fresh(self):
+        """Devuelve un acumulador vacío del mismo tipo (uno por archivo)"""
+        return type(self)(**self.settings)
+
+    def update(self, doc, ref=None):
+        """Procesa un documento"""
+        raise NotImplementedError
+
+    def finish(self):
+        """Se llama una vez tras el último documento de cada archivo (opcional)"""
+
+    def merge(self, other):
+        """Incorpora los resultados parciales de otro acumulador del mismo tipo"""
+        raise NotImplementedError
+
+    def spill_files(self):
+        """Archivos temporales que el acumulador ha escrito en disco (opcional)"""
+        return []
+
+    def close(self):
+        """Libera los archivos temporales tras el informe (opcional)"""
+
+    def report(self, quality_issues=None):
+        """Imprime la sección del informe y registra los problemas detectados"""
+        raise NotImplementedError
+
+
+class IdAnalyzer(Analyzer):
+    """Analiza los identificadores únicos"""
+
+    def __init__(self, max_exact=DEFAULT_MAX_EXACT, spill_dir=None):
+        self.settings = {'max_exact': max_exact, 'spill_dir': spill_dir}
+        self.total = 0
+        self.id_counts = DuplicateDetector(max_exact, spill_dir)
+        self.missing = []
+        self.formatos_id = Counter()
+
+    def update(self, doc, ref=None):
+        self.total += 1
+        if '_id' not in doc:
+            self.missing.append(ref)
+        else:
+            id_val = doc['_id']
+            self.id_counts.add(id_val)
+
+            # Analizar formato del ID
+            if isinstance(id_val, str):
+                patron = re.sub(r'\d+', 'N', id_val)
+                self.formatos_id[patron] += 1
+
+    def merge(self, other):
+        self.total += other.total
+        self.id_counts.merge(other.id_counts)
+        self.missing.extend(other.missing)
+        self.formatos_id.update(other.formatos_id)
+
+    def spill_files(self):
+        return self.id_counts.spill_files()
+
+    def close(self):
+        # Solo los volcados de la combinación: los de cada archivo pertenecen
+        # a su entrada de la caché (o al directorio temporal sin caché)
+        self.id_counts.cleanup()
+
+    def report(self, quality_issues=None):
+        print("\n" + "=" * 80)
+        print("1. ANÁLISIS DE IDENTIFICADORES (_id)")
+        print("=" * 80)
+
+        unicos, n_duplicados, duplicados = self.id_counts.summary()
+
+        print(f"\n📊 Estadísticas de IDs:")
+        print(f"   • Total de documentos: {self.total}")
+        print(f"   • Documentos sin _id: {len(self.missing)}")
+        print(f"   • IDs únicos: {unicos}")
+        print(f"   • IDs duplicados: {n_duplicados}")
+        if self.id_counts.spilled:
+            print(f"   • Conteo exacto con volcado a disco ({len(self.id_counts.spills)} volcados)")
+
+        if quality_issues is not None and self.missing:
+            quality_issues['valores_ausentes']['_id'].extend(self.missing)
+
+        if duplicados:
+            print(f"\n⚠️  PROBLEMA: IDs DUPLICADOS DETECTADOS")
+            for id_val, count in duplicados:
+                print(f"      - '{id_val}': {count} veces")
+                if quality_issues is not None:
+                    quality_issues['duplicados'].append(id_val)
+            if n_duplicados > 5:
+                print(f"      ... y {n_duplicados - 5} más")
+
+        print(f"\n📋 Formatos de ID encontrados:")
+        for patron, count in sorted(self.formatos_id.items(), key=lambda x: -x[1])[:10]:
+            print(f"   • {patron}: {count} documentos")
+
+
+class DateAnalyzer(Analyzer):
+    """Analiza todos los campos de fecha"""
+
+    date_fields = ['charge date', 'dump date', 'billing']
+
+    def __init__(self):
+        self.formatos = {field: Counter() for field in self.date_fields}
+        self.ausentes = {field: 0 for field in self.date_fields}
+        self.missing = {field: [] for field in self.date_fields}
+        self.ejemplos = {field: [] for field in self.date_fields}
+        self.no_convertibles = {field: Counter() for field in self.date_fields}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache_inicio = None
+
+    def update(self, doc, ref=None):
+        if self._cache_inicio is None:
+            self._cache_inicio = date_cache_info()
+        for field in self.date_fields:
+            if field not in doc:
+                self.ausentes[field] += 1
+                self.missing[field].append(ref)
+            else:
+                valor = doc[field]
+                if valor is None:
+                    self.ausentes[field] += 1
+                else:
+                    formato, fecha = classify_date(valor)
+                    self.formatos[field][formato] += 1
+                    if fecha is None:
+                        self.no_convertibles[field][formato] += 1
+                    if len(self.ejemplos[field]) < 3:
+                        self.ejemplos[field].append(valor)
+
+    def finish(self):
+        # Aciertos de la caché de fechas durante este archivo (por proceso)
+        if self._cache_inicio is not None:
+            info = date_cache_info()
+            self.cache_hits += info.hits - self._cache_inicio.hits
+            self.cache_misses += info.misses - self._cache_inicio.misses
+            self._cache_inicio = None
+
+    def merge(self, other):
+        for field in self.date_fields:
+            self.formatos[field].update(other.formatos[field])
+            self.ausentes[field] += other.ausentes[field]
+            self.missing[field].extend(other.missing[field])
+            self.ejemplos[field].extend(other.ejemplos[field][:3 - len(self.ejemplos[field])])
+            self.no_convertibles[field].update(other.no_convertibles[field])
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+
+    def report(self, quality_issues=None):
+        print("\n" + "=" * 80)
+        print("2. ANÁLISIS DE FECHAS")
+        print("=" * 80)
+
+        for field in self.date_fields:
+            print(f"\n📅 Campo: '{field}'")
+            formatos = self.formatos[field]
+            ejemplos = self.ejemplos[field]
+            no_convertibles = self.no_convertibles[field]
+
+            if quality_issues is not None:
+                if self.missing[field]:
+                    quality_issues['valores_ausentes'][field].extend(self.missing[field])
+                quality_issues['formatos_fecha'][field].update(formatos.keys())
+                if no_convertibles:
+                    quality_issues['fechas_no_convertibles'][field] += sum(no_convertibles.values())
+
+            print(f"   • Valores ausentes/nulos: {self.ausentes[field]}")
+            print(f"   • Formatos detectados: {len(formatos)}")
+
+            if formatos:
+                print(f"   • Distribución de formatos:")
+                for formato, count in sorted(formatos.items(), key=lambda x: -x[1]):
+                    print(f"      - {formato}: {count} documentos")
+
+            if ejemplos:
+                print(f"   • Ejemplos: {ejemplos}")
+
+            print(f"   • Valores no convertibles a fecha: {sum(no_convertibles.values())}")
+            for formato, count in sorted(no_convertibles.items(), key=lambda x: -x[1])[:5]:
+                print(f"      - {formato}: {count} documentos")
+
+            if len(formatos) > 1:
+                print(f"   ⚠️  PROBLEMA: Formatos de fecha heterogéneos")
+
+        consultas = self.cache_hits + self.cache_misses
+        if consultas:
+            print(f"\n🔎 Caché de fechas: {consultas} consultas, "
+                  f"{self.cache_hits / consultas:.1%} aciertos, {self.cache_misses} valores calculados")
+
+
+class ClientAnalyzer(Analyzer):
+    """Analiza la estructura del cliente"""
+
+    def __init__(self, hll_precision=DEFAULT_HLL_PRECISION):
+        self.settings = {'hll_precision': hll_precision}
+        self.client_fields = set()
+        self.field_types = defaultdict(Counter)
+        self.missing_client = 0
+        self.missing = []
+        self.not_dict = []
+        self.customer_codes = HyperLogLog(hll_precision)
+
+    def update(self, doc, ref=None):
+        if 'Client' not in doc:
+            self.missing_client += 1
+            self.missing.append(ref)
+        elif doc['Client'] is None:
+            self.missing_client += 1
+        else:
+            client = doc['Client']
+            if isinstance(client, dict):
+                self.client_fields.update(client.keys())
+
+                for key, value in client.items():
+                    self.field_types[key][type(value).__name__] += 1
+
+                code = client.get('customer code')
+                if code is not None:
+                    self.customer_codes.add(code)
+            else:
+                self.not_dict.append((ref, type(client).__name__))
+
+    def merge(self, other):
+        self.client_fields.update(other.client_fields)
+        for key, tipos in other.field_types.items():
+            self.field_types[key].update(tipos)
+        self.missing_client += other.missing_client
+        self.missing.extend(other.missing)
+        self.not_dict.extend(other.not_dict)
+        self.customer_codes.merge(other.customer_codes)
+
+    def report(self, quality_issues=None):
+        print("\n" + "=" * 80)
+        print("3. ANÁLISIS DE ESTRUCTURA - CLIENT")
+        print("=" * 80)
+
+        if quality_issues is not None:
+            if self.missing:
+                quality_issues['valores_ausentes']['Client'].extend(self.missing)
+            for ref, tipo in self.not_dict:
+                quality_issues['inconsistencias_estructura'].append(
+                    f"Doc {ref}: 'Client' no es un diccionario: {tipo}"
+                )
+
+        print(f"\n📊 Estadísticas de Client:")
+        print(f"   • Documentos sin Client: {self.missing_client}")
+        print(f"   • Campos únicos encontrados: {len(self.client_fields)}")
+        print(f"   • Clientes distintos (customer code, aprox. ±{self.customer_codes.standard_error:.1%}): "
+              f"{self.customer_codes.estimate()}")
+
+        print(f"\n📋 Campos en Client:")
+        for field in sorted(self.client_fields):
+            print(f"   • {field}")
+            tipos = self.field_types[field]
+            if len(tipos) > 1:
+                print(f"      ⚠️  PROBLEMA: Tipos mixtos detectados")
+                for tipo, count in tipos.items():
+                    print(f"         - {tipo}: {count} documentos")
+                if quality_issues is not None:
+                    quality_issues['tipos_datos_mixtos'][f'Client.{field}'].update(tipos.keys())
+
+
+class ContractAnalyzer(Analyzer):
+    """Analiza la estructura del contrato"""
+
+    def __init__(self):
+        self.contract_fields = set()
+        self.product_fields = set()
+        self.missing_contract = 0
+        self.missing_product = 0
+        self.missing = []
+
+    def update(self, doc, ref=None):
+        if 'contract' not in doc:
+            self.missing_contract += 1
+            self.missing.append(ref)
+        elif doc['contract'] is None:
+            self.missing_contract += 1
+        else:
+            contract = doc['contract']
+            if isinstance(contract, dict):
+                self.contract_fields.update(contract.keys())
+
+                if 'product' in contract:
+                    product = contract['product']
+                    if isinstance(product, dict):
+                        self.product_fields.update(product.keys())
+                    elif product is None:
+                        self.missing_product += 1
+                else:
+                    self.missing_product += 1
+
+    def merge(self, other):
+        self.contract_fields.update(other.contract_fields)
+        self.product_fields.update(other.product_fields)
+        self.missing_contract += other.missing_contract
+        self.missing_product += other.missing_product
+        self.missing.extend(other.missing)
+
+    def report(self, quality_issues=None):
+        print("\n" + "=" * 80)
+        print("4. ANÁLISIS DE ESTRUCTURA - CONTRACT")
+        print("=" * 80)
+
+        if quality_issues is not None and self.missing:
+            quality_issues['valores_ausentes']['contract'].extend(self.missing)
+
+        print(f"\n📊 Estadísticas de Contract:")
+        print(f"   • Documentos sin contract: {self.missing_contract}")
+        print(f"   • Campos únicos en contract: {len(self.contract_fields)}")
+        print(f"   • Documentos sin product: {self.missing_product}")
+        print(f"   • Campos únicos en product: {len(self.product_fields)}")
+
+        print(f"\n📋 Campos en Contract:")
+        for field in sorted(self.contract_fields):
+            print(f"   • {field}")
+
+        if self.product_fields:
+            print(f"\n📋 Campos en Product:")
+            for field in sorted(self.product_fields):
+                print(f"   • {field}")
+
+
+class ContentAnalyzer(Analyzer):
+    """Analiza la estructura de películas y series"""
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, hll_precision=DEFAULT_HLL_PRECISION):
+        self.settings = {'relative_accuracy': relative_accuracy, 'hll_precision': hll_precision}
+        self.total_docs = 0
+        self.total_movies = 0
+        self.total_series = 0
+        self.docs_sin_movies = 0
+        self.docs_sin_series = 0
+        self.movie_fields = set()
+        self.series_fields = set()
+        self.movie_titles = HyperLogLog(hll_precision)
+        self.series_titles = HyperLogLog(hll_precision)
+        self.movie_viewing = QuantileSketch(relative_accuracy)
+        self.series_viewing = QuantileSketch(relative_accuracy)
+
+    def update(self, doc, ref=None):
+        self.total_docs += 1
+
+        movies = doc.get('Movies')
+        if movies is None:
+            self.docs_sin_movies += 1
+        elif isinstance(movies, list):
+            self.total_movies += len(movies)
+            for movie in movies:
+                if isinstance(movie, dict):
+                    self.movie_fields.update(movie.keys())
+                    self._add_item(movie, self.movie_titles, self.movie_viewing)
+
+        series = doc.get('Series')
+        if series is None:
+            self.docs_sin_series += 1
+        elif isinstance(series, list):
+            self.total_series += len(series)
+            for serie in series:
+                if isinstance(serie, dict):
+                    self.series_fields.update(serie.keys())
+                    self._add_item(serie, self.series_titles, self.series_viewing)
+
+    @staticmethod
+    def _add_item(item, titles, viewing):
+        # El título aparece como 'title' o 'Title' según el volcado
+        title = item.get('title') or item.get('Title')
+        if isinstance(title, str) and title.strip():
+            titles.add(title.strip())
+
+        pct = item.get('Viewing PCT')
+        if isinstance(pct, (int, float)) and not isinstance(pct, bool):
+            viewing.update(pct)
+
+    def merge(self, other):
+        self.total_docs += other.total_docs
+        self.total_movies += other.total_movies
+        self.total_series += other.total_series
+        self.docs_sin_movies += other.docs_sin_movies
+        self.docs_sin_series += other.docs_sin_series
+        self.movie_fields.update(other.movie_fields)
+        self.series_fields.update(other.series_fields)
+        self.movie_titles.merge(other.movie_titles)
+        self.series_titles.merge(other.series_titles)
+        self.movie_viewing.merge(other.movie_viewing)
+        self.series_viewing.merge(other.series_viewing)
+
+    def report(self, quality_issues=None):
+        print("\n" + "=" * 80)
+        print("5. ANÁLISIS DE CONTENIDOS - MOVIES & SERIES")
+        print("=" * 80)
+
+        print(f"\n🎬 Estadísticas de Movies:")
+        print(f"   • Documentos sin Movies: {self.docs_sin_movies}")
+        print(f"   • Total de películas: {self.total_movies}")
+        if (self.total_docs - self.docs_sin_movies) > 0:
+            print(f"   • Promedio por documento: {self.total_movies / (self.total_docs - self.docs_sin_movies):.2f}")
+        print(f"   • Campos únicos: {len(self.movie_fields)}")
+        self._print_item_stats(self.movie_titles, self.movie_viewing)
+
+        print(f"\n📺 Estadísticas de Series:")
+        print(f"   • Documentos sin Series: {self.docs_sin_series}")
+        print(f"   • Total de series: {self.total_series}")
+        if (self.total_docs - self.docs_sin_series) > 0:
+            print(f"   • Promedio por documento: {self.total_series / (self.total_docs - self.docs_sin_series):.2f}")
+        print(f"   • Campos únicos: {len(self.series_fields)}")
+        self._print_item_stats(self.series_titles, self.series_viewing)
+
+        if self.movie_fields:
+            print(f"\n📋 Campos en Movies:")
+            for field in sorted(self.movie_fields):
+                print(f"   • {field}")
+
+        if self.series_fields:
+            print(f"\n📋 Campos en Series:")
+            for field in sorted(self.series_fields):
+                print(f"   • {field}")
+
+
+    @staticmethod
+    def _print_item_stats(titles, viewing):
+        print(f"   • Títulos distintos (aprox. ±{titles.standard_error:.1%}): {titles.estimate()}")
+        if viewing.count:
+            print(f"   • Viewing PCT p50/p95/p99: {viewing.quantile(0.5):.1f} / "
+                  f"{viewing.quantile(0.95):.1f} / {viewing.quantile(0.99):.1f}")
+
+
+class NumericAnalyzer(Analyzer):
+    """Analiza campos numéricos y detecta anomalías"""
+
+    numeric_fields = ['TOTAL']
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.settings = {'relative_accuracy': relative_accuracy}
+        self.stats = {field: _NumericFieldStats(relative_accuracy) for field in self.numeric_fields}
+
+    def update(self, doc, ref=None):
+        for field in self.numeric_fields:
+            self.stats[field].update(doc.get(field), field in doc, ref)
+
+    def merge(self, other):
+        for field in self.numeric_fields:
+            self.stats[field].merge(other.stats[field])
+
+    def report(self, quality_issues=None):
+        print("\n" + "=" * 80)
+        print("6. ANÁLISIS DE CAMPOS NUMÉRICOS")
+        print("=" * 80)
+
+        for field in self.numeric_fields:
+            print(f"\n💰 Campo: '{field}'")
+            stats = self.stats[field]
+
+            if quality_issues is not None:
+                for ref, valor in stats.anomalos:
+                    quality_issues['valores_anomalos'].append(
+                        f"{field} en doc {ref}: valor no numérico '{valor}'"
+                    )
+
+            print(f"   • Valores ausentes: {stats.ausentes}")
+            print(f"   • Tipos de datos encontrados:")
+            for tipo, count in stats.tipos.items():
+                print(f"      - {tipo}: {count}")
+
+            if stats.valores.count:
+                valores = stats.valores
+                cuantiles = stats.cuantiles
+                print(f"   • Estadísticas:")
+                print(f"      - Mínimo: {valores.minimo:.2f}")
+                print(f"      - Máximo: {valores.maximo:.2f}")
+                print(f"      - Promedio: {valores.mean:.2f}")
+                print(f"      - Desviación típica: {valores.stdev:.2f}")
+                print(f"      - p50/p95/p99 (±{cuantiles.relative_accuracy:.0%}): {cuantiles.quantile(0.5):.2f} / "
+                      f"{cuantiles.quantile(0.95):.2f} / {cuantiles.quantile(0.99):.2f}")
+
+                if stats.negativos:
+                    print(f"   ⚠️  ADVERTENCIA: {stats.negativos} valores negativos")
+                if stats.ceros:
+                    print(f"   ⚠️  ADVERTENCIA: {stats.ceros} valores en cero")
+
+
+class _NumericFieldStats:
+    """Estadísticas acumuladas de un campo numérico sin guardar los valores"""
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY):
+        self.ausentes = 0
+        self.tipos = Counter()
+        self.valores = RunningStats()
+        self.cuantiles = QuantileSketch(relative_accuracy)
+        self.negativos = 0
+        self.ceros = 0
+        self.anomalos = []
+
+    def update(self, valor, present, ref):
+        if not present or valor is None:
+            self.ausentes += 1
+            return
+
+        self.tipos[type(valor).__name__] += 1
+        try:
+            num_val = float(valor)
+        except (ValueError, TypeError):
+            self.anomalos.append((ref, valor))
+            return
+
+        self.valores.update(num_val)
+        self.cuantiles.update(num_val)
+        if num_val < 0:
+            self.negativos += 1
+        elif num_val == 0:
+            self.ceros += 1
+
+    def merge(self, other):
+        self.ausentes += other.ausentes
+        self.tipos.update(other.tipos)
+        self.valores.merge(other.valores)
+        self.cuantiles.merge(other.cuantiles)
+        self.negativos += other.negativos
+        self.ceros += other.ceros
+        self.anomalos.extend(other.anomalos)
+
+
+# Análisis que ejecuta DataExplorer por defecto, en el orden del informe
+DEFAULT_ANALYZERS = [
+    IdAnalyzer,
+    DateAnalyzer,
+    ClientAnalyzer,
+    ContractAnalyzer,
+    ContentAnalyzer,
+    NumericAnalyzer,
+]
+
+
+def default_analyzers(relative_accuracy=DEFAULT_RELATIVE_ACCURACY, hll_precision=DEFAULT_HLL_PRECISION,
+                      max_exact_ids=DEFAULT_MAX_EXACT, spill_dir=None):
+    """Instancia los análisis por defecto con la precisión indicada"""
+    return [
+        IdAnalyzer(max_exact_ids, spill_dir),
+        DateAnalyzer(),
+        ClientAnalyzer(hll_precision),
+        ContractAnalyzer(),
+        ContentAnalyzer(relative_accuracy, hll_precision),
+        NumericAnalyzer(relative_accuracy),
+    ]
@@ -0,0 +1,569 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Asesor de índices según la carga de consultas
+Descripción: Repite con explain los pipelines de Q1 - Q8 (extraídos del
+script de mongosh igual que benchmark_agregaciones.py), cruza los índices
+que usan con los accesos registrados en $indexStats y clasifica cada índice
+de las colecciones implicadas:
+  - usado: lo elige algún plan de Q1 - Q8 o tiene accesos en $indexStats
+  - restricción: único o parcial, se conserva aunque no se use
+  - redundante: sus claves son prefijo de otro índice que puede servirlo
+  - sin uso: ni las consultas ni $indexStats lo usan
+Además propone los índices que faltan: el $match/$sort inicial de un
+pipeline que recorre la colección completa (regla igualdad-orden-rango) y
+el foreignField de un $lookup sin índice. Cada índice se acompaña de su
+tamaño (collStats) y de su coste de escritura: claves que añade cada
+inserción, medidas sobre una muestra (los índices sobre arrays escriben una
+clave por elemento).
+
+Los accesos de $indexStats cuentan desde el último reinicio del servidor y
+solo se analiza la carga de Q1 - Q8: un índice "sin uso" puede servir a
+otros procesos (p. ej. dumpdate_id_idx al reestructurar en incremental).
+
+El plan elegido (--salida) se construye con --construir después de la
+carga: un solo createIndexes por colección, que lee la colección una vez
+para todos sus índices, y las colecciones en paralelo.
+
+Uso:
+    python3 asesor_indices.py [--consultas Q1,Q3] [--muestra 1000] [--salida plan_indices.json]
+    python3 asesor_indices.py --construir plan_indices.json [--eliminar]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from bson import json_util
+from pymongo import IndexModel, MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+from benchmark_agregaciones import (AGGREGATIONS_SCRIPT, QUERIES, explain_pipeline, extract_pipelines,
+                                    read_run_toggles)
+
+# Configuración
+MONGO_URI = "mongodb://localhost:27017/"
+DATABASE_NAME = "streamit_db"
+
+# Documentos muestreados por colección para estimar las claves por inserción
+DEFAULT_SAMPLE = 1000
+
+# Por debajo de estos documentos examinados no se propone un índice nuevo
+MIN_DOCS_FOR_INDEX = 1000
+
+# Etapas de explain que leen un índice
+INDEX_STAGES = ("IXSCAN", "EXPRESS_IXSCAN", "DISTINCT_SCAN", "COUNT_SCAN", "TEXT_MATCH", "IDHACK")
+
+# Operadores de $match que sirven como rango (van al final del índice)
+RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte"}
+
+# Índice existente: claves [(campo, dirección)], opciones y estadísticas
+IndexInfo = namedtuple('IndexInfo', ['name', 'keys', 'options', 'size', 'accesses'])
+
+# Índice propuesto: colección, claves, motivo y consulta que lo pide
+Suggestion = namedtuple('Suggestion', ['collection', 'keys', 'reason', 'query'])
+
+
+def connect(uri):
+    return MongoClient(uri)
+
+
+# ----------------------------------------------------------------------
+# Índices existentes
+# ----------------------------------------------------------------------
+
+def _index_keys(spec):
+    """Claves de un índice de list_indexes(); los de texto se expresan por sus campos"""
+    keys = list(spec["key"].items())
+    if any(field == "_fts" for field, _ in keys):
+        return [(field, "text") for field in spec.get("weights", {})]
+    return keys
+
+
+def read_indexes(db, collection):
+    """IndexInfo de cada índice de la colección, con tamaño y accesos si se pueden leer"""
+    try:
+        sizes = db.command("collstats", collection).get("indexSizes", {})
+    except (OperationFailure, NotImplementedError):
+        sizes = {}
+    try:
+        accesses = {s["name"]: s["accesses"]["ops"] for s in db[collection].aggregate([{"$indexStats": {}}])}
+    except (OperationFailure, NotImplementedError):
+        accesses = {}
+    indexes = []
+    for spec in db[collection].list_indexes():
+        options = {k: v for k, v in spec.items()
+                   if k in ("unique", "sparse", "partialFilterExpression", "collation", "weights",
+                            "default_language", "expireAfterSeconds")}
+        indexes.append(IndexInfo(spec["name"], _index_keys(spec), options,
+                                 sizes.get(spec["name"]), accesses.get(spec["name"])))
+    return indexes
+
+
+def is_constraint(index):
+    return index.name == "_id_" or index.options.get("unique") or "expireAfterSeconds" in index.options
+
+
+def can_serve(longer, shorter):
+    """longer puede sustituir a shorter: shorter es prefijo suyo con las mismas restricciones"""
+    if len(shorter.keys) >= len(longer.keys) or longer.keys[:len(shorter.keys)] != shorter.keys:
+        return False
+    if any(d not in (1, -1) for _, d in shorter.keys):
+        return False
+    for option in ("partialFilterExpression", "sparse", "collation"):
+        if longer.options.get(option) != shorter.options.get(option):
+            return False
+    return True
+
+
+# ----------------------------------------------------------------------
+# Uso de los índices en los planes
+# ----------------------------------------------------------------------
+
+def used_indexes(explain, collection):
+    """{(colección, índice)} que usa un explain; los de $lookup se atribuyen a 'from'"""
+    used = set()
+
+    def visit(node, coll):
+        if isinstance(node, list):
+            for value in node:
+                visit(value, coll)
+            return
+        if not isinstance(node, dict):
+            return
+        lookup = node.get("$lookup")
+        if isinstance(lookup, dict) and "from" in lookup:
+            for name in node.get("indexesUsed") or []:
+                used.add((lookup["from"], name))
+            return
+        if node.get("stage") == "EQ_LOOKUP":
+            # Motor SBE: el $lookup aparece en el plan con la colección ajena
+            foreign = str(node.get("foreignCollection", "")).split(".", 1)[-1]
+            if node.get("indexName"):
+                used.add((foreign, node["indexName"]))
+        elif node.get("indexName") and node.get("stage") in INDEX_STAGES:
+            used.add((coll, node["indexName"]))
+        for key, value in node.items():
+            if key != "command":
+                visit(value, coll)
+
+    visit(explain, collection)
+    return used
+
+
+def _walk_stages(pipeline):
+    """Etapas del pipeline, incluidas las de $facet y sub-pipelines de $lookup"""
+    for stage in pipeline:
+        yield stage
+        for name, spec in stage.items():
+            if name == "$facet":
+                for sub in spec.values():
+                    yield from _walk_stages(sub)
+            elif name == "$lookup" and isinstance(spec, dict) and "pipeline" in spec:
+                yield from _walk_stages(spec["pipeline"])
+
+
+def leading_index(pipeline):
+    """
+    Índice que serviría al $match/$sort inicial del pipeline, con la regla
+    igualdad, orden, rango. None si el pipeline no empieza filtrando u ordenando.
+    """
+    equality, ranges, sort = [], [], []
+    for stage in pipeline:
+        if "$match" in stage:
+            for field, cond in stage["$match"].items():
+                if field.startswith("$"):
+                    continue
+                if isinstance(cond, dict) and any(k.startswith("$") for k in cond):
+                    if set(cond) <= {"$eq", "$in"}:
+                        equality.append(field)
+                    elif set(cond) & RANGE_OPERATORS:
+                        ranges.append(field)
+                else:
+                    equality.append(field)
+        elif "$sort" in stage:
+            sort = list(stage["$sort"].items())
+            break
+        else:
+            break
+    keys = [(f, 1) for f in equality]
+    keys += [(f, d) for f, d in sort if f not in equality]
+    keys += [(f, 1) for f in ranges if f not in equality and all(f != s for s, _ in sort)]
+    return keys or None
+
+
+def _covered(keys, indexes):
+    """Algún índice existente empieza por el primer campo propuesto"""
+    return any(index.keys and index.keys[0][0] == keys[0][0] for index in indexes)
+
+
+def suggest(pipeline, collection, explain, indexes_by_collection, query, min_docs=MIN_DOCS_FOR_INDEX):
+    """Índices que faltan para un pipeline según su plan"""
+    suggestions = []
+    stats = explain.get("executionStats")
+    if stats is None:
+        for stage in explain.get("stages") or []:
+            if "$cursor" in stage:
+                stats = stage["$cursor"].get("executionStats")
+                break
+    examined = (stats or {}).get("totalDocsExamined") or 0
+    collscan = any(n.get("stage") == "COLLSCAN" for n in _walk_explain(explain))
+
+    keys = leading_index(pipeline)
+    if keys and collscan and examined >= min_docs and not _covered(keys, indexes_by_collection.get(collection, [])):
+        suggestions.append(Suggestion(collection, keys, f"$match/$sort inicial recorre {examined} documentos", query))
+
+    for stage in _walk_stages(pipeline):
+        lookup = stage.get("$lookup")
+        if not isinstance(lookup, dict) or "foreignField" not in lookup:
+            continue
+        foreign, field = lookup["from"], lookup["foreignField"]
+        if field == "_id" or _covered([(field, 1)], indexes_by_collection.get(foreign, [])):
+            continue
+        suggestions.append(Suggestion(foreign, [(field, 1)], f"foreignField de $lookup desde '{collection}'", query))
+    return suggestions
+
+
+def _walk_explain(node):
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk_explain(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk_explain(value)
+
+
+# ----------------------------------------------------------------------
+# Coste de escritura
+# ----------------------------------------------------------------------
+
+def _values_at(doc, path):
+    """Valores de una ruta con punto, desenrollando arrays como hace un índice multikey"""
+    values = [doc]
+    for part in path.split("."):
+        nxt = []
+        for value in values:
+            if isinstance(value, list):
+                value = [v.get(part) for v in value if isinstance(v, dict)]
+                nxt.extend(value)
+            elif isinstance(value, dict):
+                nxt.append(value.get(part))
+            else:
+                nxt.append(None)
+        values = nxt
+    flat = []
+    for value in values:
+        flat.extend(value if isinstance(value, list) else [value])
+    return flat
+
+
+def keys_per_document(index, docs):
+    """Claves de índice que escribe de media una inserción (distintas por documento)"""
+    if not docs:
+        return None
+    total = 0
+    for doc in docs:
+        if any(d == "text" for _, d in index.keys):
+            words = set()
+            for field, _ in index.keys:
+                for value in _values_at(doc, field):
+                    if isinstance(value, str):
+                        words.update(value.lower().split())
+            total += max(1, len(words))
+            continue
+        keys = 1
+        for field, _ in index.keys:
+            values = _values_at(doc, field)
+            keys *= max(1, len({json_util.dumps(v) for v in values}))
+        if index.options.get("sparse") and all(v is None for f, _ in index.keys for v in _values_at(doc, f)):
+            keys = 0
+        total += keys
+    return total / len(docs)
+
+
+def sample_documents(db, collection, size):
+    try:
+        return list(db[collection].aggregate([{"$sample": {"size": size}}]))
+    except (OperationFailure, NotImplementedError):
+        return list(db[collection].find().limit(size))
+
+
+# ----------------------------------------------------------------------
+# Análisis completo
+# ----------------------------------------------------------------------
+
+class IndexAdvisor:
+    """Cruza los planes de Q1 - Q8 con los índices de cada colección"""
+
+    def __init__(self, db, pipelines, collections=None, sample=DEFAULT_SAMPLE, min_docs=MIN_DOCS_FOR_INDEX):
+        self.db = db
+        self.pipelines = pipelines
+        self.sample = sample
+        self.min_docs = min_docs
+        if collections is None:
+            collections = []
+            for _, collection, pipeline in pipelines:
+                for name in [collection] + [s["$lookup"]["from"] for s in _walk_stages(pipeline)
+                                            if isinstance(s.get("$lookup"), dict) and "from" in s["$lookup"]]:
+                    if name not in collections:
+                        collections.append(name)
+        existing = set(db.list_collection_names())
+        self.collections = [c for c in collections if c in existing]
+        self.indexes = {}
+        self.used_by = {}           # (colección, índice) -> consultas
+        self.suggestions = []
+        self.errors = []
+        self.keys_per_doc = {}
+
+    def analyze(self):
+        # $indexStats antes de repetir las consultas: explain también cuenta accesos
+        for collection in self.collections:
+            self.indexes[collection] = read_indexes(self.db, collection)
+
+        for query, collection, pipeline in self.pipelines:
+            try:
+                explain = explain_pipeline(self.db, collection, pipeline)
+            except PyMongoError as e:
+                self.errors.append((query, collection, str(e)))
+                continue
+            for used in used_indexes(explain, collection):
+                self.used_by.setdefault(used, set()).add(query)
+            for suggestion in suggest(pipeline, collection, explain, self.indexes, query, self.min_docs):
+                if all(s.collection != suggestion.collection or s.keys != suggestion.keys
+                       for s in self.suggestions):
+                    self.suggestions.append(suggestion)
+
+        for collection in self.collections:
+            docs = sample_documents(self.db, collection, self.sample)
+            for index in self.indexes[collection]:
+                self.keys_per_doc[(collection, index.name)] = keys_per_document(index, docs)
+            for suggestion in self.suggestions:
+                if suggestion.collection == collection:
+                    probe = IndexInfo("", suggestion.keys, {}, None, None)
+                    self.keys_per_doc[(collection, index_name(suggestion.keys))] = keys_per_document(probe, docs)
+        return self
+
+    def _usage(self, collection, index):
+        """Veredicto por uso, sin tener en cuenta los demás índices (None = sin uso)"""
+        if index.name == "_id_":
+            return "obligatorio"
+        queries = self.used_by.get((collection, index.name))
+        if queries:
+            return f"usado por {', '.join(sorted(queries))}"
+        if index.accesses:
+            return f"usado ({index.accesses} accesos en $indexStats)"
+        if is_constraint(index) or "partialFilterExpression" in index.options:
+            return "restricción (sin uso en consultas)"
+        return None
+
+    def verdict(self, collection, index):
+        """(veredicto, se propone eliminar)"""
+        usage = self._usage(collection, index)
+        if not is_constraint(index):
+            # Solo cuenta como redundante frente a un índice que se conserva
+            for other in self.indexes[collection]:
+                if other is not index and can_serve(other, index) and self._usage(collection, other):
+                    return f"redundante con {other.name}", True
+        if usage:
+            return usage, False
+        return "sin uso", True
+
+    def report(self):
+        print(f"{'Índice':<30} {'Claves':<42} {'MB':>7} {'accesos':>8} {'claves/doc':>10}  Veredicto")
+        for collection in self.collections:
+            print(f"\n📁 {collection}")
+            print("-" * 120)
+            total_keys = dropped_keys = total_size = dropped_size = 0
+            for index in self.indexes[collection]:
+                verdict, drop = self.verdict(collection, index)
+                kpd = self.keys_per_doc.get((collection, index.name))
+                total_keys += kpd or 0
+                total_size += index.size or 0
+                if drop:
+                    dropped_keys += kpd or 0
+                    dropped_size += index.size or 0
+                size = "?" if index.size is None else f"{index.size / 1024 / 1024:.2f}"
+                accesses = "?" if index.accesses is None else index.accesses
+                mark = "⚠️ " if drop else "  "
+                print(f"{mark}{index.name:<28} {_format_keys(index.keys):<42} {size:>7} {accesses:>8} "
+                      f"{'?' if kpd is None else f'{kpd:.1f}':>10}  {verdict}")
+            if dropped_keys and total_keys:
+                print(f"   Eliminando los marcados: {dropped_size / 1024 / 1024:.2f} de "
+                      f"{total_size / 1024 / 1024:.2f} MB menos y "
+                      f"{dropped_keys:.1f} de {total_keys:.1f} claves menos por inserción "
+                      f"({dropped_keys / total_keys:.0%} del coste de escritura en índices)")
+
+        print("\n💡 Índices que faltan")
+        print("-" * 120)
+        if not self.suggestions:
+            print("   Ninguno")
+        for s in self.suggestions:
+            kpd = self.keys_per_doc.get((s.collection, index_name(s.keys)))
+            coste = "" if kpd is None else f", {kpd:.1f} claves por inserción"
+            print(f"   {s.collection}: {_format_keys(s.keys)} ({s.query}: {s.reason}{coste})")
+        for query, collection, error in self.errors:
+            print(f"   ❌ {query} en '{collection}': {error[:80]}")
+
+    def plan(self):
+        """Plan elegido: índices a conservar y crear por colección y los que se eliminarían"""
+        colecciones = {}
+        for collection in self.collections:
+            entry = colecciones[collection] = {"indices": [], "eliminar": []}
+            for index in self.indexes[collection]:
+                if index.name == "_id_":
+                    continue
+                if self.verdict(collection, index)[1]:
+                    entry["eliminar"].append(index.name)
+                else:
+                    entry["indices"].append(index_spec(index.name, index.keys, index.options))
+        for s in self.suggestions:
+            entry = colecciones.setdefault(s.collection, {"indices": [], "eliminar": []})
+            entry["indices"].append(index_spec(index_name(s.keys), s.keys, {}))
+        return colecciones
+
+
+def index_name(keys):
+    """Nombre por defecto de MongoDB para unas claves ('year_1_month_1')"""
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+def _format_keys(keys):
+    return "{" + ", ".join(f"{field}: {direction}" for field, direction in keys) + "}"
+
+
+# ----------------------------------------------------------------------
+# Plan de índices y construcción tras la carga
+# ----------------------------------------------------------------------
+
+def index_spec(name, keys, options):
+    """Entrada JSON de un índice del plan"""
+    spec = {"name": name, "key": [[field, direction] for field, direction in keys]}
+    spec.update(json.loads(json_util.dumps(options)))
+    return spec
+
+
+def load_plan(path, collections=None):
+    """{colección: [IndexModel]} de un plan guardado (opcionalmente solo de collections)"""
+    with open(path, encoding="utf-8") as f:
+        plan = json_util.loads(f.read())
+    models = {}
+    for collection, entry in plan["colecciones"].items():
+        if collections is not None and collection not in collections:
+            continue
+        models[collection] = [
+            IndexModel([tuple(k) for k in spec["key"]], **{k: v for k, v in spec.items() if k != "key"})
+            for spec in entry["indices"]
+        ]
+    return models
+
+
+def build_indexes(db, plan, threads=None):
+    """
+    Crea los índices de plan ({colección: [IndexModel]}) con un createIndexes
+    por colección (una sola lectura de la colección para todos sus índices)
+    y las colecciones en paralelo. Devuelve {colección: (nombres, segundos)}.
+    """
+    def build(collection):
+        start = time.perf_counter()
+        names = db[collection].create_indexes(plan[collection]) if plan[collection] else []
+        return collection, (names, time.perf_counter() - start)
+
+    collections = list(plan)
+    if not collections:
+        return {}
+    with ThreadPoolExecutor(max_workers=threads or len(collections)) as pool:
+        return dict(pool.map(build, collections))
+
+
+def drop_planned(db, path):
+    """Elimina los índices marcados en el plan (tras construir los nuevos)"""
+    with open(path, encoding="utf-8") as f:
+        plan = json_util.loads(f.read())
+    dropped = []
+    for collection, entry in plan["colecciones"].items():
+        existing = {spec["name"] for spec in db[collection].list_indexes()}
+        for name in entry.get("eliminar", []):
+            if name in existing:
+                db[collection].drop_index(name)
+                dropped.append(f"{collection}.{name}")
+    return dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asesor de índices según las consultas Q1 - Q8")
+    parser.add_argument('--uri', default=MONGO_URI, help="URI de MongoDB (por defecto: %(default)s)")
+    parser.add_argument('--db', default=DATABASE_NAME, help="base de datos (por defecto: %(default)s)")
+    parser.add_argument('--script', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                         AGGREGATIONS_SCRIPT),
+                        help="script de consultas de mongosh")
+    parser.add_argument('--consultas', default=None,
+                        help="consultas a analizar separadas por comas (por defecto: las activadas en RUN)")
+    parser.add_argument('--colecciones', default=None,
+                        help="colecciones a revisar (por defecto: las que usan las consultas)")
+    parser.add_argument('--muestra', type=int, default=DEFAULT_SAMPLE,
+                        help="documentos por colección para estimar las claves por inserción (por defecto: %(default)s)")
+    parser.add_argument('--min-examinados', type=int, default=MIN_DOCS_FOR_INDEX,
+                        help="documentos examinados para proponer un índice (por defecto: %(default)s)")
+    parser.add_argument('--salida', default=None, help="guardar el plan de índices elegido en este JSON")
+    parser.add_argument('--construir', metavar='PLAN', default=None,
+                        help="construir los índices de un plan guardado en lugar de analizar")
+    parser.add_argument('--eliminar', action='store_true',
+                        help="con --construir, eliminar después los índices marcados en el plan")
+    parser.add_argument('--hilos', type=int, default=0,
+                        help="colecciones construidas a la vez (0 = todas)")
+    parser.add_argument('--node', default="node", help="ejecutable de node (por defecto: %(default)s)")
+    args = parser.parse_args()
+
+    client = connect(args.uri)
+    try:
+        db = client[args.db]
+        if args.construir:
+            print(f"🔨 Construyendo los índices de '{args.construir}'...")
+            start = time.perf_counter()
+            for collection, (names, seconds) in build_indexes(db, load_plan(args.construir),
+                                                              args.hilos or None).items():
+                print(f"   '{collection}': {len(names)} índices en {seconds:.2f} s")
+            if args.eliminar:
+                for name in drop_planned(db, args.construir):
+                    print(f"   🗑️  {name}")
+            print(f"\n✅ Hecho en {time.perf_counter() - start:.2f} s")
+            return
+
+        with open(args.script, encoding="utf-8") as f:
+            queries = read_run_toggles(f.read())
+        if args.consultas:
+            queries = [q.strip().upper() for q in args.consultas.split(",") if q.strip()]
+            if any(q not in QUERIES for q in queries):
+                print(f"❌ Consultas desconocidas: {', '.join(q for q in queries if q not in QUERIES)}")
+                sys.exit(2)
+        try:
+            pipelines = extract_pipelines(db, args.script, queries, args.node)
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"❌ No se pudieron extraer los pipelines: {e}")
+            sys.exit(2)
+
+        collections = [c.strip() for c in args.colecciones.split(",")] if args.colecciones else None
+        advisor = IndexAdvisor(db, pipelines, collections, args.muestra, args.min_examinados).analyze()
+        print(f"📋 {len(pipelines)} pipelines de {', '.join(queries)} sobre "
+              f"{', '.join(advisor.collections)}\n")
+        advisor.report()
+    finally:
+        client.close()
+
+    if args.salida:
+        plan = {"meta": {"fecha": datetime.now().isoformat(timespec="seconds"), "baseDatos": args.db,
+                         "consultas": queries},
+                "colecciones": advisor.plan()}
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(json_util.dumps(plan, indent=2, ensure_ascii=False))
+        print(f"\n💾 Plan guardado en '{args.salida}' (construir con --construir {args.salida})")
+
+
+if __name__ == "__main__":
+    main()
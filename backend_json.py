@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Backend intercambiable de decodificación/codificación JSON
+Descripción: Usa orjson o msgspec si están instalados y json de la
+biblioteca estándar si no. El resultado es siempre el mismo que el de json:
+loads() devuelve los mismos objetos que json.loads() y dumps() el mismo texto
+que json.dumps(obj, ensure_ascii=False, separators=(',', ':')) o, con
+indent=2, que json.dumps(obj, ensure_ascii=False, indent=2).
+
+Los casos en los que los backends rápidos difieren de json se detectan y se
+resuelven con json:
+  - enteros de más de 64 bits (orjson los convierte en float) y surrogates
+    escapados (orjson rechaza los sueltos): se buscan en el texto de entrada;
+  - floats que repr() escribe con exponente (1e+16, 1e-05): orjson los
+    formatea de otra manera, así que se buscan en la salida;
+  - NaN e Infinity, que orjson escribe como null;
+  - cualquier error del backend rápido (se repite con json, que da el mismo
+    resultado o el mismo error que hasta ahora).
+
+El backend se elige con la variable de entorno MIGRACION_JSON_BACKEND o con
+set_backend() (--backend-json en los scripts). Los procesos worker heredan la
+variable de entorno y con ella la elección.
+"""
+
+import json
+import math
+import os
+import re
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se prueba msgspec
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # msgspec es opcional: sin él se usa json
+    msgspec = None
+
+# Backends en orden de preferencia para la elección automática
+BACKENDS = ('orjson', 'msgspec', 'stdlib')
+
+# Variable de entorno con el backend elegido ('auto' o uno de BACKENDS)
+ENV_VAR = 'MIGRACION_JSON_BACKEND'
+
+# Entrada que los backends rápidos no decodifican igual que json: enteros de
+# 19 dígitos o más (pueden no caber en 64 bits) y surrogates escapados.
+# Sobre bytes se buscan con translate() + find, mucho más rápido que la regex.
+_DECODE_RISK = re.compile(r'\d{19}|\\u[dD][89a-fA-F]')
+_SURROGATE = re.compile(rb'\\u[dD][89a-fA-F]')
+_DIGITS = bytes.maketrans(b'123456789', b'000000000')
+_DIGIT_RUN = b'0' * 19
+
+# Salida cuyo formato de floats puede diferir de repr(): exponente (1e16,
+# 1e-7) o ceros iniciales que repr() escribiría con exponente (0.00001).
+# Tras translate() basta buscar '0e' y '0.0000'; los falsos positivos
+# (exponentes dentro de strings, 1.00001) solo cuestan usar json.
+_FLOAT_DIGITS = bytes.maketrans(b'123456789E', b'000000000e')
+
+# Estado del backend activo (lo fija set_backend)
+_active = None
+_fast_loads = None
+_fast_dumps = None
+_fast_dumps_indent = None
+
+
+def available_backends():
+    """Backends instalados en este entorno, en orden de preferencia"""
+    installed = {'orjson': orjson is not None, 'msgspec': msgspec is not None, 'stdlib': True}
+    return [name for name in BACKENDS if installed[name]]
+
+
+def _has_non_finite(obj):
+    """True si obj contiene algún float NaN o infinito (recorrido iterativo)"""
+    pending = [obj]
+    while pending:
+        value = pending.pop()
+        kind = type(value)
+        if kind is dict:
+            pending.extend(value.values())
+        elif kind is list:
+            pending.extend(value)
+        elif kind is str or kind is int or kind is bool or value is None:
+            continue
+        elif isinstance(value, float):
+            if not math.isfinite(value):
+                return True
+        elif isinstance(value, dict):
+            pending.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+    return False
+
+
+def _decode_risk(data):
+    """True si data puede decodificarse distinto con el backend rápido"""
+    if isinstance(data, str):
+        return _DECODE_RISK.search(data) is not None
+    data = bytes(data)
+    return _DIGIT_RUN in data.translate(_DIGITS) or (b'\\u' in data and _SURROGATE.search(data) is not None)
+
+
+def _encode_risk(out):
+    """True si los floats de out pueden estar escritos distinto que en json"""
+    digits = out.translate(_FLOAT_DIGITS)
+    return b'0e' in digits or b'0.0000' in digits
+
+
+def _stdlib_dumps(obj, indent=None):
+    if indent is None:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+    return json.dumps(obj, ensure_ascii=False, indent=indent)
+
+
+def _orjson_functions():
+    # Sin estas opciones orjson serializaría datetime, dataclasses y
+    # subclases que json rechaza o escribe de otra forma
+    option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_SUBCLASS
+    indent_option = option | orjson.OPT_INDENT_2
+
+    def encode(obj):
+        return orjson.dumps(obj, option=option)
+
+    def encode_indent(obj):
+        return orjson.dumps(obj, option=indent_option)
+
+    return orjson.loads, encode, encode_indent
+
+
+def _msgspec_functions():
+    # Decodificación sin tipos: los volcados mezclan formas (Surname string o
+    # lista, TOTAL número o string, grafías alternativas de las claves) y un
+    # Struct tipado perdería o rechazaría esas variantes. msgspec no indenta
+    # con el mismo formato que json: indent=2 queda en json.
+    decoder = msgspec.json.Decoder()
+    encoder = msgspec.json.Encoder()
+    return decoder.decode, encoder.encode, None
+
+
+def set_backend(name='auto'):
+    """
+    Activa un backend ('auto' elige el primero instalado de BACKENDS).
+    Devuelve el nombre del backend activo.
+    """
+    global _active, _fast_loads, _fast_dumps, _fast_dumps_indent
+    if name in (None, '', 'auto'):
+        name = available_backends()[0]
+    if name not in BACKENDS:
+        raise ValueError(f"Backend JSON desconocido: {name}")
+    if name not in available_backends():
+        raise ValueError(f"El backend JSON '{name}' no está instalado")
+
+    if name == 'orjson':
+        _fast_loads, _fast_dumps, _fast_dumps_indent = _orjson_functions()
+    elif name == 'msgspec':
+        _fast_loads, _fast_dumps, _fast_dumps_indent = _msgspec_functions()
+    else:
+        _fast_loads = _fast_dumps = _fast_dumps_indent = None
+    _active = name
+    os.environ[ENV_VAR] = name
+    return name
+
+
+def active_backend():
+    """Nombre del backend activo"""
+    return _active
+
+
+def loads(data, fallback=json.loads):
+    """
+    Decodifica un documento JSON (bytes UTF-8 o str) con el mismo resultado
+    que json.loads(). Si el backend rápido no es aplicable o falla se llama a
+    fallback(data), que da el resultado o el error de referencia.
+    """
+    if _fast_loads is not None and not _decode_risk(data):
+        try:
+            return _fast_loads(data)
+        except Exception:
+            pass
+    return fallback(data)
+
+
+def dumps(obj, indent=None):
+    """
+    Codifica obj igual que json.dumps(obj, ensure_ascii=False) con
+    separadores compactos, o con indent si se indica. Devuelve str.
+    """
+    fast = _fast_dumps if indent is None else (_fast_dumps_indent if indent == 2 else None)
+    if fast is not None:
+        try:
+            out = fast(obj)
+        except Exception:
+            out = None
+        if out is not None and not _encode_risk(out) and not (b'null' in out and _has_non_finite(obj)):
+            return out.decode('utf-8')
+    return _stdlib_dumps(obj, indent)
+
+
+def add_backend_argument(parser):
+    """Añade --backend-json a un argparse.ArgumentParser"""
+    parser.add_argument('--backend-json', choices=('auto',) + BACKENDS, default='auto',
+                        help="backend JSON; el resultado es idéntico con todos "
+                             "(por defecto: auto, el más rápido instalado)")
+
+
+try:
+    set_backend(os.environ.get(ENV_VAR, 'auto'))
+except ValueError:  # variable de entorno con un backend no disponible
+    set_backend('auto')
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de las consultas de agregación (Q1 - Q8)
+Descripción: Ejecuta contra una base de datos real los pipelines de
+PO22_05_07_4_agregaciones.txt, con los mismos interruptores RUN, y registra
+por pipeline el tiempo de reloj y las métricas de explain("executionStats"):
+documentos examinados frente a devueltos, índices usados, etapas $lookup y
+si alguna etapa se ha volcado a disco. Los resultados se guardan en JSON y
+se comparan con una línea base guardada, de modo que un cambio de índices o
+de esquema aparece como regresión.
+
+Los pipelines no se copian aquí: el script de mongosh se evalúa con node
+sobre un 'db' simulado que anota cada aggregate() sin ejecutarlo. Las
+lecturas pequeñas que deciden las ramas (getCollectionNames, findOne,
+find().sort().limit()) se resuelven contra la base de datos real, así se
+miden exactamente las variantes (resúmenes, referencias embebidas) que
+ejecutaría mongosh.
+
+Uso:
+    python3 benchmark_agregaciones.py [--consultas Q3,Q5] [--repeticiones 5]
+                                      [--salida resultados.json]
+                                      [--baseline baseline.json] [--umbral 1.25]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from bson import json_util
+from bson.json_util import JSONOptions, JSONMode
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+# Configuración
+MONGO_URI = "mongodb://localhost:27017/"
+DATABASE_NAME = "streamit_db"
+AGGREGATIONS_SCRIPT = "PO22_05_07_4_agregaciones.txt"
+QUERIES = ("Q1", "Q2", "Q3", "Q4", "Q5", "Q6", "Q7", "Q8")
+
+# Pasadas de extracción: cada una puede descubrir lecturas de ramas nuevas
+MAX_EXTRACTION_PASSES = 5
+
+# Por debajo de esta diferencia un cambio de tiempo se considera ruido
+MIN_TIME_DELTA_MS = 5.0
+
+EJSON = JSONOptions(json_mode=JSONMode.RELAXED)
+
+# Evalúa el script de mongosh con un 'db' que solo anota. Recibe la ruta del
+# script y la de las respuestas ya conocidas ({clave de lectura: valor EJSON})
+EXTRACTOR_JS = r"""
+const vm = require("vm");
+const fs = require("fs");
+const [scriptPath, answersPath] = process.argv.slice(2);
+const answers = JSON.parse(fs.readFileSync(answersPath, "utf8"));
+const pipelines = [];
+const reads = {};
+let current = null;
+
+// Date y RegExp del contexto no pasan instanceof: se reconocen por su etiqueta
+function replacer(key, value) {
+  const raw = this[key];
+  const tag = Object.prototype.toString.call(raw);
+  if (tag === "[object Date]") return { $date: raw.toISOString() };
+  if (tag === "[object RegExp]") return { $regularExpression: { pattern: raw.source, options: raw.flags } };
+  return value;
+}
+const encode = value => JSON.stringify(value === undefined ? null : value, replacer);
+
+const context = vm.createContext({});
+const CtxDate = vm.runInContext("Date", context);
+function revive(value) {
+  if (Array.isArray(value)) return value.map(revive);
+  if (value && typeof value === "object") {
+    if (typeof value.$date === "string") return new CtxDate(value.$date);
+    const out = {};
+    for (const [k, v] of Object.entries(value)) out[k] = revive(v);
+    return out;
+  }
+  return value;
+}
+
+function read(call, fallback) {
+  const key = encode(call);
+  if (key in answers) return revive(answers[key]);
+  reads[key] = call;
+  return fallback;
+}
+
+function emptyCursor() {
+  return {
+    forEach() {}, toArray: () => [], map: () => [], hasNext: () => false,
+    next: () => null, itcount: () => 0
+  };
+}
+
+function findCursor(collection, filter, projection) {
+  const spec = { op: "find", collection, filter: filter || {}, projection: projection || null, sort: null, limit: 0 };
+  const cursor = {
+    sort(s) { spec.sort = s; return cursor; },
+    limit(n) { spec.limit = n; return cursor; },
+    toArray: () => read(spec, []),
+    forEach(fn) { cursor.toArray().forEach(fn); },
+    map(fn) { return cursor.toArray().map(fn); },
+    count: () => cursor.toArray().length
+  };
+  return cursor;
+}
+
+function collectionStub(name) {
+  return {
+    getName: () => name,
+    aggregate(pipeline, options) {
+      pipelines.push({ query: current, collection: name, pipeline: JSON.parse(encode(pipeline)) });
+      return emptyCursor();
+    },
+    find: (filter, projection) => findCursor(name, filter, projection),
+    findOne: (filter, projection) =>
+      read({ op: "findOne", collection: name, filter: filter || {}, projection: projection || null }, null),
+    countDocuments: filter => read({ op: "countDocuments", collection: name, filter: filter || {} }, 0),
+    estimatedDocumentCount: () => read({ op: "countDocuments", collection: name, filter: {} }, 0)
+  };
+}
+
+const db = new Proxy({}, {
+  get(target, prop) {
+    if (prop === "getCollectionNames") return () => read({ op: "getCollectionNames" }, []);
+    if (prop === "getCollection") return collectionStub;
+    if (prop === "getName") return () => "streamit_db";
+    if (typeof prop !== "string") return undefined;
+    return collectionStub(prop);
+  }
+});
+
+Object.assign(context, {
+  db,
+  print(...args) {
+    const m = typeof args[0] === "string" && args[0].match(/^(Q\d+):/);
+    if (m) current = m[1];
+  },
+  printjson() {},
+  ISODate: s => new CtxDate(s),
+  ObjectId: s => ({ $oid: s }),
+  NumberDecimal: s => ({ $numberDecimal: String(s) }),
+  NumberInt: n => n,
+  NumberLong: n => n
+});
+
+vm.runInContext(fs.readFileSync(scriptPath, "utf8"), context, { filename: scriptPath });
+process.stdout.write(JSON.stringify({ pipelines, reads: Object.entries(reads) }));
+"""
+
+
+def connect(uri):
+    return MongoClient(uri)
+
+
+# ----------------------------------------------------------------------
+# Extracción de los pipelines del script de mongosh
+# ----------------------------------------------------------------------
+
+def apply_run_toggles(source, queries):
+    """Reescribe la constante RUN del script para ejecutar solo 'queries'"""
+    toggles = ", ".join(f"{q}:{'true' if q in queries else 'false'}" for q in QUERIES)
+    source, n = re.subn(r"const RUN = \{[^}]*\};", f"const RUN = {{ {toggles} }};", source, count=1)
+    if not n:
+        raise ValueError("el script no define 'const RUN = { ... };'")
+    return source
+
+
+def read_run_toggles(source):
+    """Consultas activadas en la constante RUN del script"""
+    match = re.search(r"const RUN = \{([^}]*)\};", source)
+    if not match:
+        raise ValueError("el script no define 'const RUN = { ... };'")
+    return [q for q, value in re.findall(r"(Q\d+)\s*:\s*(true|false)", match.group(1)) if value == "true"]
+
+
+def answer_read(db, call):
+    """Ejecuta contra la base de datos real una lectura anotada por el extractor"""
+    op = call["op"]
+    if op == "getCollectionNames":
+        return db.list_collection_names()
+    collection = db[call["collection"]]
+    filter_ = json_util.loads(json.dumps(call.get("filter") or {}))
+    projection = call.get("projection")
+    if op == "findOne":
+        return collection.find_one(filter_, projection)
+    if op == "countDocuments":
+        return collection.count_documents(filter_)
+    cursor = collection.find(filter_, projection)
+    if call.get("sort"):
+        cursor = cursor.sort(list(call["sort"].items()))
+    if call.get("limit"):
+        cursor = cursor.limit(call["limit"])
+    return list(cursor)
+
+
+def extract_pipelines(db, script_path, queries, node="node"):
+    """
+    [(consulta, colección, pipeline)] en el orden en que el script los ejecuta.
+    Repite la evaluación mientras aparezcan lecturas sin respuesta.
+    """
+    with open(script_path, encoding="utf-8") as f:
+        source = apply_run_toggles(f.read(), queries)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {name: os.path.join(tmp, name) for name in ("extractor.js", "script.js", "answers.json")}
+        with open(paths["extractor.js"], "w", encoding="utf-8") as f:
+            f.write(EXTRACTOR_JS)
+        with open(paths["script.js"], "w", encoding="utf-8") as f:
+            f.write(source)
+
+        answers = {}
+        for _ in range(MAX_EXTRACTION_PASSES):
+            with open(paths["answers.json"], "w", encoding="utf-8") as f:
+                json.dump(answers, f)
+            proc = subprocess.run([node, paths["extractor.js"], paths["script.js"], paths["answers.json"]],
+                                  capture_output=True, text=True)
+            if proc.returncode != 0:
+                raise RuntimeError(f"node no pudo evaluar el script:\n{proc.stderr.strip()}")
+            result = json.loads(proc.stdout)
+            if not result["reads"]:
+                break
+            for key, call in result["reads"]:
+                answers[key] = json.loads(json_util.dumps(answer_read(db, call), json_options=EJSON))
+        else:
+            raise RuntimeError("las lecturas del script no se estabilizan")
+
+    return [(p["query"], p["collection"], json_util.loads(json.dumps(p["pipeline"])))
+            for p in result["pipelines"] if p["query"] in queries]
+
+
+# ----------------------------------------------------------------------
+# Métricas de explain("executionStats")
+# ----------------------------------------------------------------------
+
+def _walk(node):
+    """Todos los dicts anidados de un documento de explain"""
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def count_lookups(pipeline):
+    """Etapas $lookup del pipeline, incluidas las de $facet y sub-pipelines"""
+    total = 0
+    for node in _walk(pipeline):
+        total += "$lookup" in node
+    return total
+
+
+def plan_metrics(explain):
+    """Resume un explain("executionStats") de un aggregate"""
+    stats = explain.get("executionStats")
+    lookup_docs = 0
+    for stage in explain.get("stages") or []:
+        if "$cursor" in stage and stats is None:
+            stats = stage["$cursor"].get("executionStats")
+        if "$lookup" in stage:
+            lookup_docs += stage.get("totalDocsExamined") or 0
+    stats = stats or {}
+
+    indexes, collscan, spilled = set(), False, False
+    for node in _walk(explain):
+        stage = node.get("stage")
+        if stage == "COLLSCAN":
+            collscan = True
+        if node.get("indexName") and stage in ("IXSCAN", "EXPRESS_IXSCAN", "DISTINCT_SCAN", "COUNT_SCAN", None):
+            indexes.add(node["indexName"])
+        for name in node.get("indexesUsed") or []:
+            indexes.add(name)
+        if node.get("usedDisk") is True or (node.get("spills") or 0) > 0:
+            spilled = True
+
+    return {
+        "docsExamined": stats.get("totalDocsExamined"),
+        "keysExamined": stats.get("totalKeysExamined"),
+        "lookupDocsExamined": lookup_docs,
+        "indexes": sorted(indexes),
+        "collscan": collscan,
+        "spilled": spilled,
+        "explainMs": stats.get("executionTimeMillis"),
+    }
+
+
+def explain_pipeline(db, collection, pipeline):
+    return db.command({
+        "explain": {"aggregate": collection, "pipeline": pipeline, "cursor": {}, "allowDiskUse": True},
+        "verbosity": "executionStats",
+    })
+
+
+# ----------------------------------------------------------------------
+# Medida y comparación
+# ----------------------------------------------------------------------
+
+def run_pipeline(db, collection, pipeline, repeticiones):
+    """Tiempos (ms) de ejecutar el pipeline leyendo el cursor completo"""
+    tiempos, devueltos = [], 0
+    list(db[collection].aggregate(pipeline, allowDiskUse=True))  # calentamiento
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        devueltos = len(list(db[collection].aggregate(pipeline, allowDiskUse=True)))
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return tiempos, devueltos
+
+
+def benchmark(db, pipelines, repeticiones):
+    """Resultado por pipeline; la clave 'Qn#i' es estable entre ejecuciones"""
+    resultados = {}
+    por_consulta = {}
+    for query, collection, pipeline in pipelines:
+        i = por_consulta[query] = por_consulta.get(query, 0) + 1
+        key = f"{query}#{i}"
+        entry = {"query": query, "collection": collection, "stages": len(pipeline),
+                 "lookups": count_lookups(pipeline)}
+        try:
+            tiempos, devueltos = run_pipeline(db, collection, pipeline, repeticiones)
+            entry.update({"medianMs": round(statistics.median(tiempos), 3),
+                          "minMs": round(min(tiempos), 3), "returned": devueltos})
+            entry.update(plan_metrics(explain_pipeline(db, collection, pipeline)))
+        except PyMongoError as e:
+            entry["error"] = str(e)
+        resultados[key] = entry
+        print(format_row(key, entry))
+    return resultados
+
+
+def format_row(key, e):
+    if "error" in e:
+        return f"{key:<6} {e['collection']:<22} ❌ {e['error'][:60]}"
+    index = ",".join(e["indexes"]) or ("COLLSCAN" if e["collscan"] else "-")
+    examinados = "?" if e["docsExamined"] is None else e["docsExamined"]
+    return (f"{key:<6} {e['collection']:<22} {e['medianMs']:>10.1f} {examinados:>10} {e['returned']:>8} "
+            f"{e['lookups']:>3} {'sí' if e['spilled'] else 'no':>5}  {index}")
+
+
+def compare(actual, baseline, umbral):
+    """Lista de (clave, motivo) de las regresiones respecto a la línea base"""
+    regresiones = []
+    for key, cur in actual.items():
+        base = baseline.get(key)
+        if base is None or "error" in base:
+            continue
+        if "error" in cur:
+            regresiones.append((key, f"falla: {cur['error'][:60]}"))
+            continue
+        if cur["medianMs"] > base["medianMs"] * umbral and cur["medianMs"] - base["medianMs"] > MIN_TIME_DELTA_MS:
+            regresiones.append((key, f"tiempo {base['medianMs']:.1f} -> {cur['medianMs']:.1f} ms"))
+        if (cur["docsExamined"] or 0) > (base["docsExamined"] or 0) * umbral:
+            regresiones.append((key, f"docs examinados {base['docsExamined']} -> {cur['docsExamined']}"))
+        if (cur["lookupDocsExamined"] or 0) > (base["lookupDocsExamined"] or 0) * umbral:
+            regresiones.append((key, f"docs examinados por $lookup {base['lookupDocsExamined']} -> "
+                                     f"{cur['lookupDocsExamined']}"))
+        if set(base["indexes"]) - set(cur["indexes"]):
+            regresiones.append((key, f"índices {base['indexes']} -> {cur['indexes'] or 'ninguno'}"))
+        if cur["collscan"] and not base["collscan"]:
+            regresiones.append((key, "ahora recorre la colección completa (COLLSCAN)"))
+        if cur["lookups"] > base["lookups"]:
+            regresiones.append((key, f"etapas $lookup {base['lookups']} -> {cur['lookups']}"))
+        if cur["spilled"] and not base["spilled"]:
+            regresiones.append((key, "ahora vuelca a disco"))
+        if cur["returned"] != base["returned"]:
+            regresiones.append((key, f"documentos devueltos {base['returned']} -> {cur['returned']}"))
+    for key in baseline:
+        if key not in actual and baseline[key]["query"] in {e["query"] for e in actual.values()}:
+            regresiones.append((key, "el pipeline ya no se ejecuta"))
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de las consultas de agregación Q1 - Q8")
+    parser.add_argument('--uri', default=MONGO_URI, help="URI de MongoDB (por defecto: %(default)s)")
+    parser.add_argument('--db', default=DATABASE_NAME, help="base de datos (por defecto: %(default)s)")
+    parser.add_argument('--script', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                         AGGREGATIONS_SCRIPT),
+                        help="script de consultas de mongosh")
+    parser.add_argument('--consultas', default=None,
+                        help="consultas a medir separadas por comas (por defecto: las activadas en RUN)")
+    parser.add_argument('--repeticiones', type=int, default=5,
+                        help="ejecuciones medidas por pipeline; se guarda la mediana (por defecto: %(default)s)")
+    parser.add_argument('--salida', default=None, help="fichero JSON donde guardar los resultados")
+    parser.add_argument('--baseline', default=None, help="resultados JSON anteriores con los que comparar")
+    parser.add_argument('--umbral', type=float, default=1.25,
+                        help="factor a partir del cual un aumento es regresión (por defecto: %(default)s)")
+    parser.add_argument('--node', default="node", help="ejecutable de node (por defecto: %(default)s)")
+    args = parser.parse_args()
+
+    with open(args.script, encoding="utf-8") as f:
+        queries = read_run_toggles(f.read())
+    if args.consultas:
+        queries = [q.strip().upper() for q in args.consultas.split(",") if q.strip()]
+        desconocidas = [q for q in queries if q not in QUERIES]
+        if desconocidas:
+            print(f"❌ Consultas desconocidas: {', '.join(desconocidas)}")
+            sys.exit(2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    client = connect(args.uri)
+    try:
+        db = client[args.db]
+        try:
+            pipelines = extract_pipelines(db, args.script, queries, args.node)
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"❌ No se pudieron extraer los pipelines: {e}")
+            sys.exit(2)
+        print(f"📋 {len(pipelines)} pipelines de {', '.join(queries)} en '{args.db}'\n")
+
+        print(f"{'Clave':<6} {'Colección':<22} {'mediana ms':>10} {'examin.':>10} {'devuel.':>8} "
+              f"{'lk':>3} {'disco':>5}  índices")
+        print("-" * 90)
+        resultados = benchmark(db, pipelines, args.repeticiones)
+        try:
+            version = client.server_info().get("version")
+        except PyMongoError:
+            version = None
+    finally:
+        client.close()
+
+    informe = {
+        "meta": {"fecha": datetime.now().isoformat(timespec="seconds"), "servidor": version,
+                 "baseDatos": args.db, "consultas": queries, "repeticiones": args.repeticiones},
+        "pipelines": resultados,
+    }
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(informe, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Resultados guardados en '{args.salida}'")
+
+    if baseline is not None:
+        regresiones = compare(resultados, baseline["pipelines"], args.umbral)
+        print(f"\nComparación con '{args.baseline}' ({baseline['meta']['fecha']}, umbral x{args.umbral}):")
+        if not regresiones:
+            print("✅ Sin regresiones")
+        for key, motivo in regresiones:
+            print(f"   ⚠️  {key}: {motivo}")
+        if regresiones:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark del canonicalizador
+Descripción: Compara, sobre los elementos Movies/Series reales de los
+volcados, la ruta anterior del reestructurador (g() probando todas las
+grafías y conversores en cada acceso) con los esquemas compilados por forma
+de canonicalizador.py. Antes de medir comprueba que las dos rutas producen
+exactamente los mismos valores.
+
+Uso:
+    python3 benchmark_canonicalizador.py [--directorio ./datafiles] [--repeticiones 5]
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import time
+from importlib.machinery import SourceFileLoader
+
+from bson import Decimal128
+
+from canonicalizador import MOVIE_ITEM, SERIES_ITEM
+from lector_json import MappedDump
+
+RESTRUCTURER_SCRIPT = "PO22_05_07_2_reestructuracion.txt"
+
+
+def load_restructurer():
+    """DataRestructurer sin conectar a MongoDB (el script es un .txt)"""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), RESTRUCTURER_SCRIPT)
+    loader = SourceFileLoader("reestructuracion", path)
+    spec = importlib.util.spec_from_loader("reestructuracion", loader)
+    module = importlib.util.module_from_spec(spec)
+    loader.exec_module(module)
+    cls = module.DataRestructurer
+    return cls.__new__(cls)
+
+
+class LegacyPath:
+    """Ruta anterior: g() con las grafías alternativas en cada acceso"""
+
+    @staticmethod
+    def g(obj, *keys):
+        if not isinstance(obj, dict):
+            return None
+        for k in keys:
+            v = obj.get(k)
+            if v is not None and v != "":
+                return v
+        return None
+
+    @staticmethod
+    def normalize_string(text):
+        if text is None:
+            return ""
+        s = str(text).strip()
+        if not s:
+            return ""
+        return " ".join(w.capitalize() for w in s.split())
+
+    @staticmethod
+    def to_int(value, default=0):
+        try:
+            if value is None:
+                return default
+            if isinstance(value, Decimal128):
+                return int(value.to_decimal())
+            return int(value)
+        except Exception:
+            return default
+
+    @staticmethod
+    def to_float(value, default=0.0):
+        try:
+            if value is None:
+                return default
+            if isinstance(value, Decimal128):
+                return float(value.to_decimal())
+            return float(value)
+        except Exception:
+            return default
+
+    def movie_key(self, m):
+        title = self.normalize_string(self.g(m, "title", "Title"))
+        if not title:
+            return None
+        details = self.g(m, "details", "Details") or {}
+        year = self.to_int(self.g(details, "year", "Year"), 0)
+        movie_key = f"{title.lower()}|{year}" if year > 0 else title.lower()
+        return title, details, year, movie_key
+
+    def movie_item(self, m):
+        """Lo que hace _build_invoice con cada elemento Movies: clave y consumo"""
+        return self.movie_key(m), self.movie_entry(m)
+
+    def movie_entry(self, m):
+        return {
+            "date": self.g(m, "date", "Date"),
+            "time": self.g(m, "time", "Time"),
+            "viewingPct": self.to_int(self.g(m, "viewingPct", "Viewing PCT"), 0),
+            "license": self.g(m, "license", "License") or {},
+        }
+
+    def series_entry(self, s):
+        title = self.normalize_string(self.g(s, "title", "Title"))
+        return {
+            "title": title,
+            "season": self.to_int(self.g(s, "season", "Season"), 0),
+            "episode": self.to_int(self.g(s, "episode", "Episode"), 0),
+            "date": self.g(s, "date", "Date"),
+            "time": self.g(s, "time", "Time"),
+            "viewingPct": self.to_int(self.g(s, "viewingPct", "Viewing PCT"), 0),
+            "license": self.g(s, "license", "License") or {},
+        }
+
+    def movie_details(self, details):
+        director_block = self.g(details, "director", "Director") or {}
+        director_name = ""
+        director_fb = 0
+        if isinstance(director_block, dict):
+            director_name = self.normalize_string(self.g(director_block, "name", "Name") or "")
+            director_fb = self.to_int(self.g(director_block, "facebookLikes", "Facebook likes"), 0)
+        elif isinstance(director_block, str):
+            director_name = self.normalize_string(director_block)
+
+        cast_block = self.g(details, "cast", "Cast") or {}
+        cast_fb = 0
+        stars_out = []
+        if isinstance(cast_block, dict):
+            cast_fb = self.to_int(self.g(cast_block, "facebookLikes", "Facebook likes"), 0)
+            stars_in = self.g(cast_block, "stars", "Stars") or []
+            if isinstance(stars_in, list):
+                for st in stars_in:
+                    if isinstance(st, dict):
+                        nm = self.normalize_string(self.g(st, "player", "Player") or "")
+                        fb = self.to_int(self.g(st, "facebookLikes", "Facebook likes"), 0)
+                        if nm:
+                            stars_out.append({"name": nm, "facebookLikes": fb})
+
+        genres = self.g(details, "genres", "Genres") or []
+        if isinstance(genres, list):
+            genres = [self.normalize_string(g) for g in genres if g]
+
+        keywords = self.g(details, "keywords", "Keywords") or []
+        if isinstance(keywords, list):
+            keywords = [self.normalize_string(k) for k in keywords if k]
+
+        return {
+            "country": self.normalize_string(self.g(details, "country", "Country") or ""),
+            "color": self.g(details, "color", "Color") or "",
+            "aspectRatio": self.to_float(self.g(details, "aspectRatio", "Aspect ratio"), 0.0),
+            "contentRating": self.g(details, "contentRating", "Content Rating") or "",
+            "budget": self.g(details, "budget", "Budget") or Decimal128("0"),
+            "gross": self.g(details, "gross", "Gross") or Decimal128("0"),
+            "language": self.g(details, "language", "Language") or "",
+            "duration": self.to_int(self.g(details, "duration", "Duration"), 0),
+            "imdbScore": self.to_float(self.g(details, "imdbScore", "IMDB score"), 0.0),
+            "imdbLink": self.g(details, "imdbLink", "IMDB link") or "",
+            "criticReviews": self.to_int(self.g(details, "criticReviews", "Critic reviews"), 0),
+            "userReviews": self.to_int(self.g(details, "userReviews", "User reviews"), 0),
+            "votedUsers": self.to_int(self.g(details, "votedUsers", "Voted users"), 0),
+            "facebookLikes": self.to_int(self.g(details, "facebookLikes", "Facebook likes"), 0),
+            "facesInPoster": self.to_int(self.g(details, "facesInPoster", "Faces in poster"), 0),
+            "genres": genres,
+            "keywords": keywords,
+            "director": {"name": director_name, "facebookLikes": director_fb},
+            "cast": {"facebookLikes": cast_fb, "stars": stars_out},
+        }
+
+
+class CompiledPath:
+    """Ruta nueva: los mismos pasos con los esquemas de canonicalizador.py"""
+
+    def __init__(self, restructurer):
+        self.r = restructurer
+
+    def movie_key(self, m):
+        return self.r._movie_key(MOVIE_ITEM(m))
+
+    def movie_item(self, m):
+        item = MOVIE_ITEM(m)
+        return self.r._movie_key(item), self._entry(item)
+
+    def movie_entry(self, m):
+        return self._entry(MOVIE_ITEM(m))
+
+    @staticmethod
+    def _entry(item):
+        return {
+            "date": item["date"],
+            "time": item["time"],
+            "viewingPct": item["viewingPct"],
+            "license": item["license"],
+        }
+
+    def series_entry(self, s):
+        item = SERIES_ITEM(s)
+        return {
+            "title": item["title"],
+            "season": item["season"],
+            "episode": item["episode"],
+            "date": item["date"],
+            "time": item["time"],
+            "viewingPct": item["viewingPct"],
+            "license": item["license"],
+        }
+
+    def movie_details(self, details):
+        doc = self.r._build_movie_doc("", details, 0)["details"]
+        doc.pop("year", None)
+        return doc
+
+
+def load_blocks(directory, limit=None):
+    """Elementos Movies y Series de los volcados (hasta limit facturas)"""
+    movies, series = [], []
+    invoices = 0
+    for filename in sorted(f for f in os.listdir(directory) if f.endswith('.json')):
+        for doc in MappedDump(os.path.join(directory, filename)):
+            movies.extend(doc.get("Movies") or [])
+            series.extend(doc.get("Series") or [])
+            invoices += 1
+            if limit and invoices >= limit:
+                return movies, series, invoices
+    return movies, series, invoices
+
+
+def workloads(path, movies, series):
+    """(nombre, función sin argumentos) de cada carga medida"""
+    def movie_items():
+        for m in movies:
+            path.movie_item(m)
+
+    def series_items():
+        for s in series:
+            path.series_entry(s)
+
+    def catalog():
+        for m in movies:
+            parsed = path.movie_key(m)
+            if parsed is not None:
+                path.movie_details(parsed[1])
+
+    return [
+        ("Elementos Movies (clave + consumo)", movie_items, len(movies)),
+        ("Elementos Series (consumo)", series_items, len(series)),
+        ("Details de películas (catálogo)", catalog, len(movies)),
+    ]
+
+
+def check_parity(legacy, compiled, movies, series):
+    """Devuelve la lista de diferencias entre las dos rutas (vacía si coinciden)"""
+    diferencias = []
+    for i, m in enumerate(movies):
+        a, b = legacy.movie_key(m), compiled.movie_key(m)
+        if (a and a[::2]) != (b and b[::2]) or legacy.movie_entry(m) != compiled.movie_entry(m):
+            diferencias.append(f"Movies[{i}]")
+        elif a and legacy.movie_details(a[1]) != compiled.movie_details(b[1]):
+            diferencias.append(f"Movies[{i}].details")
+    for i, s in enumerate(series):
+        if legacy.series_entry(s) != compiled.series_entry(s):
+            diferencias.append(f"Series[{i}]")
+    return diferencias
+
+
+def best_time(func, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        func()
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara g() con los esquemas compilados por forma")
+    parser.add_argument('--directorio', default="./datafiles",
+                        help="directorio con los volcados JSON (por defecto: %(default)s)")
+    parser.add_argument('--repeticiones', type=int, default=5,
+                        help="repeticiones por medida; se toma la mejor (por defecto: %(default)s)")
+    parser.add_argument('--limite', type=int, default=None,
+                        help="máximo de facturas a cargar")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directorio):
+        print(f"❌ No existe el directorio '{args.directorio}'")
+        sys.exit(1)
+
+    movies, series, invoices = load_blocks(args.directorio, args.limite)
+    print(f"📂 {invoices} facturas: {len(movies)} elementos Movies, {len(series)} elementos Series\n")
+
+    legacy = LegacyPath()
+    compiled = CompiledPath(load_restructurer())
+
+    diferencias = check_parity(legacy, compiled, movies, series)
+    if diferencias:
+        print(f"❌ Las rutas difieren en {len(diferencias)} elementos: {', '.join(diferencias[:10])}")
+        sys.exit(1)
+    print("✅ Paridad: la ruta compilada produce los mismos valores que g()\n")
+
+    print(f"{'Carga':<38} {'g()':>10} {'compilada':>10} {'mejora':>8}")
+    print("-" * 70)
+    for (nombre, old, n), (_, new, _) in zip(workloads(legacy, movies, series),
+                                              workloads(compiled, movies, series)):
+        t_old = best_time(old, args.repeticiones)
+        t_new = best_time(new, args.repeticiones)
+        print(f"{nombre:<38} {t_old * 1e6 / max(n, 1):>8.2f}µs {t_new * 1e6 / max(n, 1):>8.2f}µs "
+              f"{t_old / t_new if t_new else float('inf'):>7.1f}x")
+    print("\n(tiempo por elemento, mejor de las repeticiones)")
+
+
+if __name__ == "__main__":
+    main()
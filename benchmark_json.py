@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de los backends JSON
+Descripción: Compara, sobre los volcados reales, la decodificación y la
+codificación de cada backend instalado de backend_json.py (orjson, msgspec,
+json de la biblioteca estándar). Antes de medir comprueba que todos producen
+exactamente los mismos documentos y el mismo texto que json.
+
+Uso:
+    python3 benchmark_json.py [--directorio ./datafiles] [--repeticiones 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import backend_json
+from lector_json import MappedDump, _ObjectScanner, decode_object, detect_encoding
+
+
+def load_objects(directory, limit=None):
+    """
+    Fragmentos de bytes de cada objeto de los volcados (hasta limit) y la
+    lista de archivos. Los archivos que no son UTF-8 se recodifican para que
+    todos los backends reciban la misma entrada.
+    """
+    raws, files = [], []
+    for filename in sorted(f for f in os.listdir(directory) if f.endswith('.json')):
+        path = os.path.join(directory, filename)
+        files.append(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        encoding = detect_encoding(data[:1 << 16])
+        for start, end in _ObjectScanner().scan(data):
+            raw = data[start:end]
+            if encoding != 'utf-8':
+                raw = raw.decode(encoding, 'replace').encode('utf-8')
+            raws.append(raw)
+            if limit and len(raws) >= limit:
+                return raws, files
+    return raws, files
+
+
+def decode_all(raws):
+    """Documentos decodificables (los objetos inválidos se omiten)"""
+    docs = []
+    for raw in raws:
+        try:
+            docs.append(decode_object(raw))
+        except ValueError:
+            pass
+    return docs
+
+
+def workloads(raws, docs, files):
+    """(nombre, función sin argumentos, unidades) de cada carga medida"""
+    def read_dumps():
+        for path in files:
+            for _ in MappedDump(path):
+                pass
+
+    def decode():
+        for raw in raws:
+            try:
+                decode_object(raw)
+            except ValueError:
+                pass
+
+    def encode():
+        for doc in docs:
+            backend_json.dumps(doc)
+
+    def encode_indent():
+        for doc in docs:
+            backend_json.dumps(doc, indent=2)
+
+    return [
+        ("Lectura de volcados (MappedDump)", read_dumps, len(raws)),
+        ("Decodificación de objetos", decode, len(raws)),
+        ("Codificación compacta", encode, len(docs)),
+        ("Codificación indentada (indent=2)", encode_indent, len(docs)),
+    ]
+
+
+def check_parity(backend, raws, reference_docs):
+    """Devuelve la lista de diferencias del backend frente a json (vacía si coinciden)"""
+    backend_json.set_backend('stdlib')
+    reference_text = [(backend_json.dumps(d), backend_json.dumps(d, indent=2)) for d in reference_docs]
+
+    backend_json.set_backend(backend)
+    diferencias = []
+    docs = decode_all(raws)
+    if len(docs) != len(reference_docs):
+        diferencias.append(f"{len(docs)} documentos en lugar de {len(reference_docs)}")
+        return diferencias
+    for i, (doc, ref, (compact, indented)) in enumerate(zip(docs, reference_docs, reference_text)):
+        # repr() distingue 1 de 1.0 y True de 1, que == considera iguales
+        if repr(doc) != repr(ref):
+            diferencias.append(f"decodificación[{i}]")
+        elif backend_json.dumps(doc) != compact:
+            diferencias.append(f"codificación[{i}]")
+        elif backend_json.dumps(doc, indent=2) != indented:
+            diferencias.append(f"indentación[{i}]")
+    return diferencias
+
+
+def best_time(func, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        func()
+        mejor = min(mejor, time.perf_counter() - t0)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara los backends JSON sobre los volcados reales")
+    parser.add_argument('--directorio', default="./datafiles",
+                        help="directorio con los volcados JSON (por defecto: %(default)s)")
+    parser.add_argument('--repeticiones', type=int, default=5,
+                        help="repeticiones por medida; se toma la mejor (por defecto: %(default)s)")
+    parser.add_argument('--limite', type=int, default=None,
+                        help="máximo de objetos a cargar")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directorio):
+        print(f"❌ No existe el directorio '{args.directorio}'")
+        sys.exit(1)
+
+    raws, files = load_objects(args.directorio, args.limite)
+    size = sum(len(raw) for raw in raws)
+    print(f"📂 {len(files)} volcados: {len(raws)} objetos, {size / 1024 / 1024:.1f} MB")
+
+    backends = backend_json.available_backends()
+    print(f"🧩 Backends instalados: {', '.join(backends)}\n")
+
+    backend_json.set_backend('stdlib')
+    reference_docs = decode_all(raws)
+    for backend in backends:
+        if backend == 'stdlib':
+            continue
+        diferencias = check_parity(backend, raws, reference_docs)
+        if diferencias:
+            print(f"❌ {backend} difiere de json en {len(diferencias)} documentos: {', '.join(diferencias[:10])}")
+            sys.exit(1)
+        print(f"✅ Paridad: {backend} produce los mismos documentos y el mismo texto que json")
+    print()
+
+    tiempos = {}
+    for backend in backends:
+        backend_json.set_backend(backend)
+        tiempos[backend] = [(nombre, best_time(func, args.repeticiones), n)
+                            for nombre, func, n in workloads(raws, reference_docs, files)]
+
+    print(f"{'Carga':<36}" + "".join(f"{b:>12}" for b in backends) + f"{'mejora':>9}")
+    print("-" * (45 + 12 * len(backends)))
+    for i, (nombre, t_ref, n) in enumerate(tiempos['stdlib']):
+        fila = [tiempos[b][i][1] for b in backends]
+        mejor = min(fila)
+        print(f"{nombre:<36}" + "".join(f"{t * 1e6 / max(n, 1):>10.2f}µs" for t in fila)
+              + f"{t_ref / mejor if mejor else float('inf'):>8.1f}x")
+    print("\n(tiempo por objeto, mejor de las repeticiones; mejora del backend más rápido frente a json)")
+
+
+if __name__ == "__main__":
+    main()
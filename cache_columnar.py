@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché columnar del corpus para el EDA (requiere numpy)
+Descripción: Guarda los volcados ya parseados como columnas en disco:
+  - arrays numéricos tipados (TOTAL, Viewing PCT) con NaN para ausentes
+  - fechas codificadas por diccionario y convertidas a datetime64[D]
+  - strings codificados por diccionario (país, tipo de producto, títulos)
+  - arrays de offsets para las listas anidadas Movies / Series
+Las columnas se cargan con np.load(mmap_mode='r'), así que recargar el
+corpus es casi instantáneo, y los análisis de fechas, contenidos y campos
+numéricos se calculan con operaciones vectorizadas.
+"""
+
+import json
+import os
+import shutil
+import time
+from array import array
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:  # numpy es opcional: solo lo necesita este modo
+    np = None
+
+from fechas import classify_date
+from lector_json import MappedDump
+
+# Directorio de la caché columnar, dentro del directorio de datos
+COLUMNAR_DIRNAME = '.eda_columnar'
+
+# Cambiar al modificar las columnas o su codificación
+COLUMNAR_VERSION = 1
+
+DATE_FIELDS = ['charge date', 'dump date', 'billing']
+
+# Códigos especiales de las columnas codificadas por diccionario
+AUSENTE = -1
+NULO = -2
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("La caché columnar necesita numpy: pip install numpy")
+
+
+def _slug(field):
+    return field.replace(' ', '_')
+
+
+class _Dictionary:
+    """Codificación por diccionario: cada valor distinto recibe un entero"""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, value):
+        if value is None:
+            return NULO
+        # Clave JSON para admitir también valores no hashables (listas, dicts)
+        key = value if isinstance(value, str) else ('json', json.dumps(value, sort_keys=True))
+        code = self.codes.get(key)
+        if code is None:
+            code = self.codes[key] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class _ColumnBuilder:
+    """Acumula las columnas de todos los documentos en arrays compactos"""
+
+    def __init__(self):
+        self.total = array('d')
+        self.total_tipo = array('i')
+        self.fechas = {field: array('i') for field in DATE_FIELDS}
+        self.country = array('i')
+        self.product_type = array('i')
+        self.items = {
+            'movies': {'offsets': array('q', [0]), 'nulos': array('b'), 'title': array('i'), 'viewing': array('f')},
+            'series': {'offsets': array('q', [0]), 'nulos': array('b'), 'title': array('i'), 'viewing': array('f')},
+        }
+        self.item_fields = {'movies': set(), 'series': set()}
+        self.dicts = {name: _Dictionary() for name in ('fecha', 'tipo', 'country', 'product_type', 'title')}
+
+    def add(self, doc):
+        d = self.dicts
+
+        # TOTAL: valor numérico (NaN si no convertible) y tipo original
+        if doc.get('TOTAL') is None:
+            self.total.append(float('nan'))
+            self.total_tipo.append(AUSENTE)
+        else:
+            valor = doc['TOTAL']
+            self.total_tipo.append(d['tipo'].encode(type(valor).__name__))
+            try:
+                self.total.append(float(valor))
+            except (ValueError, TypeError):
+                self.total.append(float('nan'))
+
+        for field in DATE_FIELDS:
+            self.fechas[field].append(d['fecha'].encode(doc[field]) if field in doc else AUSENTE)
+
+        contract = doc.get('contract')
+        contract = contract if isinstance(contract, dict) else {}
+        product = contract.get('product')
+        product = product if isinstance(product, dict) else {}
+        self.country.append(d['country'].encode(contract.get('country')))
+        self.product_type.append(d['product_type'].encode(product.get('type')))
+
+        for name, key in (('movies', 'Movies'), ('series', 'Series')):
+            cols = self.items[name]
+            lista = doc.get(key)
+            cols['nulos'].append(lista is None)
+            if isinstance(lista, list):
+                for item in lista:
+                    if isinstance(item, dict):
+                        self.item_fields[name].update(item.keys())
+                        title = item.get('title') or item.get('Title')
+                        title = title.strip() if isinstance(title, str) and title.strip() else None
+                        cols['title'].append(AUSENTE if title is None else d['title'].encode(title))
+                        pct = item.get('Viewing PCT')
+                        valido = isinstance(pct, (int, float)) and not isinstance(pct, bool)
+                        cols['viewing'].append(pct if valido else float('nan'))
+                    else:
+                        cols['title'].append(AUSENTE)
+                        cols['viewing'].append(float('nan'))
+            cols['offsets'].append(len(cols['title']))
+
+    def columns(self):
+        """Devuelve {nombre: ndarray} con las columnas finales"""
+        cols = {
+            'total': np.frombuffer(self.total, dtype=np.float64),
+            'total_tipo': np.frombuffer(self.total_tipo, dtype=np.int32).astype(np.int8),
+            'country': np.frombuffer(self.country, dtype=np.int32),
+            'product_type': np.frombuffer(self.product_type, dtype=np.int32),
+        }
+        for field in DATE_FIELDS:
+            cols[f"fecha_{_slug(field)}"] = np.frombuffer(self.fechas[field], dtype=np.int32)
+        for name, items in self.items.items():
+            cols[f"{name}_offsets"] = np.frombuffer(items['offsets'], dtype=np.int64)
+            cols[f"{name}_nulos"] = np.frombuffer(items['nulos'], dtype=np.int8).astype(bool)
+            cols[f"{name}_title"] = np.frombuffer(items['title'], dtype=np.int32)
+            cols[f"{name}_viewing"] = np.frombuffer(items['viewing'], dtype=np.float32)
+        return cols
+
+
+def _source_files(data_directory):
+    files = {}
+    for filename in sorted(f for f in os.listdir(data_directory) if f.endswith('.json')):
+        st = os.stat(os.path.join(data_directory, filename))
+        files[filename] = [st.st_size, st.st_mtime_ns]
+    return files
+
+
+def build_columnar_cache(data_directory, cache_dir):
+    """Parsea todos los volcados y escribe la caché columnar (reemplazo atómico)"""
+    _require_numpy()
+    builder = _ColumnBuilder()
+    sources = _source_files(data_directory)
+
+    for filename in sources:
+        for doc in MappedDump(os.path.join(data_directory, filename)):
+            builder.add(doc)
+
+    tmp_dir = cache_dir + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = builder.columns()
+    for name, values in columns.items():
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), values)
+
+    vocab = {name: d.values for name, d in builder.dicts.items()}
+    with open(os.path.join(tmp_dir, 'vocab.json'), 'w', encoding='utf-8') as f:
+        json.dump(vocab, f, ensure_ascii=False)
+
+    manifest = {
+        'version': COLUMNAR_VERSION,
+        'documents': len(columns['total']),
+        'sources': sources,
+        'item_fields': {name: sorted(fields) for name, fields in builder.item_fields.items()},
+    }
+    with open(os.path.join(tmp_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+
+
+def is_up_to_date(data_directory, cache_dir):
+    """True si la caché existe y corresponde a los volcados actuales"""
+    try:
+        with open(os.path.join(cache_dir, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return manifest.get('version') == COLUMNAR_VERSION and manifest.get('sources') == _source_files(data_directory)
+
+
+class ColumnarCorpus:
+    """Corpus cargado desde la caché columnar (arrays mapeados en memoria)"""
+
+    def __init__(self, cache_dir):
+        _require_numpy()
+        with open(os.path.join(cache_dir, 'manifest.json'), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        with open(os.path.join(cache_dir, 'vocab.json'), encoding='utf-8') as f:
+            self.vocab = json.load(f)
+
+        self.columns = {}
+        for name in sorted(os.listdir(cache_dir)):
+            if name.endswith('.npy'):
+                self.columns[name[:-4]] = np.load(os.path.join(cache_dir, name), mmap_mode='r')
+
+        # Formato y fecha de cada valor distinto (el vocabulario es pequeño)
+        clasificados = [classify_date(v) for v in self.vocab['fecha']]
+        self.fecha_formatos = [formato for formato, _ in clasificados]
+        self.fecha_dias = np.array(
+            [np.datetime64(fecha.date(), 'D') if fecha else np.datetime64('NaT') for _, fecha in clasificados],
+            dtype='datetime64[D]',
+        )
+
+    def __len__(self):
+        return self.manifest['documents']
+
+    @property
+    def nbytes(self):
+        return sum(col.nbytes for col in self.columns.values())
+
+    def dates(self, field):
+        """Fechas convertidas del campo como datetime64[D] (NaT si ausente o no convertible)"""
+        codes = np.asarray(self.columns[f"fecha_{_slug(field)}"])
+        result = np.full(len(codes), np.datetime64('NaT'), dtype='datetime64[D]')
+        valid = codes >= 0
+        result[valid] = self.fecha_dias[codes[valid]]
+        return result
+
+    def item_counts(self, name):
+        """Número de elementos de Movies/Series por documento"""
+        return np.diff(self.columns[f"{name}_offsets"])
+
+    # ------------------------------------------------------------------
+    # Análisis vectorizados
+    # ------------------------------------------------------------------
+
+    def report_dates(self):
+        print("\n" + "=" * 80)
+        print("2. ANÁLISIS DE FECHAS (columnar)")
+        print("=" * 80)
+
+        n_vocab = len(self.vocab['fecha'])
+        for field in DATE_FIELDS:
+            print(f"\n📅 Campo: '{field}'")
+            codes = np.asarray(self.columns[f"fecha_{_slug(field)}"])
+            counts = np.bincount(codes[codes >= 0], minlength=n_vocab)
+
+            formatos = Counter()
+            no_convertibles = Counter()
+            for code in np.flatnonzero(counts):
+                formatos[self.fecha_formatos[code]] += int(counts[code])
+                if np.isnat(self.fecha_dias[code]):
+                    no_convertibles[self.fecha_formatos[code]] += int(counts[code])
+
+            print(f"   • Valores ausentes/nulos: {int(np.count_nonzero(codes < 0))}")
+            print(f"   • Formatos detectados: {len(formatos)}")
+            if formatos:
+                print(f"   • Distribución de formatos:")
+                for formato, count in sorted(formatos.items(), key=lambda x: -x[1]):
+                    print(f"      - {formato}: {count} documentos")
+            print(f"   • Valores no convertibles a fecha: {sum(no_convertibles.values())}")
+            for formato, count in sorted(no_convertibles.items(), key=lambda x: -x[1])[:5]:
+                print(f"      - {formato}: {count} documentos")
+
+            dias = self.dates(field)
+            dias = dias[~np.isnat(dias)]
+            if len(dias):
+                print(f"   • Rango: {dias.min()} → {dias.max()}")
+
+    def report_content(self):
+        print("\n" + "=" * 80)
+        print("5. ANÁLISIS DE CONTENIDOS - MOVIES & SERIES (columnar)")
+        print("=" * 80)
+
+        for name, label, emoji in (('movies', 'Movies', '🎬'), ('series', 'Series', '📺')):
+            counts = self.item_counts(name)
+            sin_lista = int(np.count_nonzero(self.columns[f"{name}_nulos"]))
+            total = int(counts.sum())
+            con_lista = len(counts) - sin_lista
+
+            print(f"\n{emoji} Estadísticas de {label}:")
+            print(f"   • Documentos sin {label}: {sin_lista}")
+            print(f"   • Total de {'películas' if name == 'movies' else 'series'}: {total}")
+            if con_lista > 0:
+                print(f"   • Promedio por documento: {total / con_lista:.2f}")
+            print(f"   • Campos únicos: {len(self.manifest['item_fields'][name])}")
+
+            titles = np.asarray(self.columns[f"{name}_title"])
+            print(f"   • Títulos distintos: {len(np.unique(titles[titles >= 0]))}")
+
+            viewing = np.asarray(self.columns[f"{name}_viewing"])
+            viewing = viewing[~np.isnan(viewing)]
+            if len(viewing):
+                p50, p95, p99 = np.percentile(viewing, [50, 95, 99])
+                print(f"   • Viewing PCT p50/p95/p99: {p50:.1f} / {p95:.1f} / {p99:.1f}")
+
+        for column, label in (('country', 'país'), ('product_type', 'tipo de producto')):
+            codes = np.asarray(self.columns[column])
+            counts = np.bincount(codes[codes >= 0], minlength=len(self.vocab[column]))
+            print(f"\n📋 Documentos por {label}:")
+            for code in np.argsort(-counts, kind='stable')[:5]:
+                if counts[code]:
+                    print(f"   • {self.vocab[column][code]}: {int(counts[code])}")
+
+    def report_numeric(self):
+        print("\n" + "=" * 80)
+        print("6. ANÁLISIS DE CAMPOS NUMÉRICOS (columnar)")
+        print("=" * 80)
+
+        print(f"\n💰 Campo: 'TOTAL'")
+        tipos = np.asarray(self.columns['total_tipo'])
+        total = np.asarray(self.columns['total'])
+        valores = total[~np.isnan(total)]
+
+        print(f"   • Valores ausentes: {int(np.count_nonzero(tipos == AUSENTE))}")
+        print(f"   • Tipos de datos encontrados:")
+        counts = np.bincount(tipos[tipos >= 0], minlength=len(self.vocab['tipo']))
+        for code in np.flatnonzero(counts):
+            print(f"      - {self.vocab['tipo'][code]}: {int(counts[code])}")
+
+        anomalos = int(np.count_nonzero(tipos >= 0)) - len(valores)
+        if anomalos:
+            print(f"   ⚠️  {anomalos} valores no numéricos")
+
+        if len(valores):
+            p50, p95, p99 = np.percentile(valores, [50, 95, 99])
+            print(f"   • Estadísticas:")
+            print(f"      - Mínimo: {valores.min():.2f}")
+            print(f"      - Máximo: {valores.max():.2f}")
+            print(f"      - Promedio: {valores.mean():.2f}")
+            print(f"      - Desviación típica: {valores.std(ddof=1) if len(valores) > 1 else 0.0:.2f}")
+            print(f"      - p50/p95/p99: {p50:.2f} / {p95:.2f} / {p99:.2f}")
+
+            negativos = int(np.count_nonzero(valores < 0))
+            ceros = int(np.count_nonzero(valores == 0))
+            if negativos:
+                print(f"   ⚠️  ADVERTENCIA: {negativos} valores negativos")
+            if ceros:
+                print(f"   ⚠️  ADVERTENCIA: {ceros} valores en cero")
+
+
+def run_columnar_analysis(data_directory, cache_dir=None, rebuild=False):
+    """Carga (o reconstruye) la caché columnar y ejecuta los análisis vectorizados"""
+    _require_numpy()
+    cache_dir = cache_dir or os.path.join(data_directory, COLUMNAR_DIRNAME)
+
+    print("=" * 80)
+    print("CACHÉ COLUMNAR")
+    print("=" * 80)
+
+    if rebuild or not is_up_to_date(data_directory, cache_dir):
+        inicio = time.perf_counter()
+        build_columnar_cache(data_directory, cache_dir)
+        print(f"\n🔨 Caché construida en {time.perf_counter() - inicio:.2f} s: {cache_dir}")
+
+    inicio = time.perf_counter()
+    corpus = ColumnarCorpus(cache_dir)
+    elapsed = time.perf_counter() - inicio
+
+    print(f"\n⚡ Cargados {len(corpus)} documentos en {elapsed * 1000:.1f} ms")
+    print(f"   • Columnas: {len(corpus.columns)} ({corpus.nbytes / 1024:.1f} KiB)")
+
+    if not len(corpus):
+        print("\n❌ No se pudieron cargar documentos. Verifica la ruta.")
+        return corpus
+
+    corpus.report_dates()
+    corpus.report_content()
+    corpus.report_numeric()
+    return corpus
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caché incremental del Análisis Exploratorio de Datos (EDA)
+Descripción: Guarda en disco el resultado parcial de cada volcado (los
+acumuladores de analizadores.py ya actualizados con sus documentos) para que
+en la siguiente ejecución solo se vuelvan a parsear los archivos nuevos o
+modificados. Cada entrada se valida por tamaño y fecha de modificación o,
+opcionalmente, por el hash SHA-256 del contenido.
+
+La caché usa pickle: solo debe cargarse desde un directorio de confianza.
+"""
+
+import hashlib
+import os
+import pickle
+import shutil
+from collections import namedtuple
+
+from estadisticas import remove_files
+
+# Directorio de caché por defecto, dentro del directorio de datos
+CACHE_DIRNAME = '.eda_cache'
+
+# Subdirectorio para los volcados a disco del detector de duplicados
+SPILL_DIRNAME = 'spill'
+
+# Cambiar al modificar el formato de FileResult o de los acumuladores
+CACHE_VERSION = 6
+
+_HASH_BLOCK = 1 << 20
+
+# Resultado parcial del análisis de un volcado
+FileResult = namedtuple('FileResult', [
+    'filename',            # Nombre del archivo analizado
+    'documents',           # Documentos cargados
+    'encoding',            # Encoding detectado
+    'fallback_objects',    # Objetos que necesitaron un encoding alternativo
+    'fallback_encodings',  # Encodings alternativos usados (ordenados)
+    'malformed',           # Lista de lector_json.MalformedObject
+    'analyzers',           # Acumuladores con los datos de este archivo
+])
+
+
+def file_sha256(path):
+    """Hash SHA-256 del contenido del archivo, leído por bloques"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def analyzers_signature(analyzers):
+    """
+    Identifica el conjunto de análisis y su precisión: una entrada solo sirve
+    para los mismos (el directorio de volcado no afecta al resultado)
+    """
+    return tuple(
+        (f"{type(a).__module__}.{type(a).__qualname__}",
+         tuple(sorted((k, v) for k, v in a.settings.items() if k != 'spill_dir')))
+        for a in analyzers
+    )
+
+
+class AnalysisCache:
+    """
+    Caché de resultados parciales, un archivo .pkl por volcado.
+    Con use_hash=True la validez se decide por el contenido (sobrevive a
+    copias o a un touch); si no, por tamaño y mtime, que es inmediato.
+    Cada entrada apunta a los archivos que sus acumuladores volcaron en
+    spill_dir; al reemplazarla se borran.
+    """
+
+    def __init__(self, directory, use_hash=False):
+        self.directory = directory
+        self.use_hash = use_hash
+        self.hits = 0
+        self.misses = 0
+        self._keys = {}
+        self._stale_spills = {}
+
+    def _entry_path(self, filename):
+        return os.path.join(self.directory, filename + '.pkl')
+
+    def _file_key(self, path):
+        st = os.stat(path)
+        key = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+        if self.use_hash:
+            key['sha256'] = file_sha256(path)
+        return key
+
+    def _is_valid(self, stored, current):
+        if stored['size'] != current['size']:
+            return False
+        if self.use_hash:
+            return stored.get('sha256') == current['sha256']
+        return stored['mtime_ns'] == current['mtime_ns']
+
+    def load(self, path, signature):
+        """Devuelve el FileResult guardado para path o None si no es válido"""
+        filename = os.path.basename(path)
+        try:
+            # La clave calculada se reutiliza en store() (evita un segundo hash)
+            key = self._keys[path] = self._file_key(path)
+            with open(self._entry_path(filename), 'rb') as f:
+                entry = pickle.load(f)
+            valid = (
+                entry['version'] == CACHE_VERSION
+                and entry['signature'] == signature
+                and self._is_valid(entry['key'], key)
+            )
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, KeyError, TypeError):
+            entry, valid = None, False
+
+        if not valid:
+            # store() borrará los volcados de la entrada obsoleta
+            self._stale_spills[path] = entry.get('spills', []) if isinstance(entry, dict) else []
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._keys.pop(path, None)
+        return entry['result']
+
+    def store(self, path, signature, result):
+        """Guarda el resultado parcial de path (escritura atómica)"""
+        os.makedirs(self.directory, exist_ok=True)
+        entry = {
+            'version': CACHE_VERSION,
+            'signature': signature,
+            'key': self._keys.pop(path, None) or self._file_key(path),
+            'result': result,
+            'spills': [p for analyzer in result.analyzers for p in analyzer.spill_files()],
+        }
+        target = self._entry_path(os.path.basename(path))
+        stale = self._stale_spills.pop(path, None)
+        if stale is None:
+            stale = self._entry_spills(target)
+        tmp = target + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, target)
+        remove_files(stale)
+
+    def _entry_spills(self, target):
+        """Volcados de la entrada guardada en target ([] si no hay o no se puede leer)"""
+        try:
+            with open(target, 'rb') as f:
+                return pickle.load(f).get('spills', [])
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError):
+            return []
+
+    @property
+    def spill_dir(self):
+        return os.path.join(self.directory, SPILL_DIRNAME)
+
+    def clear(self):
+        """Elimina todas las entradas y sus volcados; devuelve cuántas había"""
+        if not os.path.isdir(self.directory):
+            return 0
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+        removed = 0
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl') or name.endswith('.pkl.tmp'):
+                os.remove(os.path.join(self.directory, name))
+                removed += 1
+        return removed
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Canonicalización de subdocumentos por forma
+Descripción: Los volcados escriben el mismo campo con varias grafías
+('title'/'Title', 'IMDB score'/'imdbScore', 'Facebook likes'/'facebookLikes'...).
+En lugar de probar todas las alternativas en cada acceso, un Schema agrupa
+los subdocumentos por su forma (la tupla de sus claves) y compila una sola
+vez por forma qué clave real aporta cada campo canónico y con qué conversor.
+Cada subdocumento se reasigna después en un solo paso.
+
+La semántica es la de DataRestructurer.g(): gana la primera grafía con un
+valor distinto de None y de "", y un valor que no es un dict se trata como
+un documento vacío.
+"""
+
+from collections import namedtuple
+from functools import lru_cache
+
+from bson import Decimal128
+
+# Formas distintas compiladas por esquema (los volcados usan muy pocas)
+MAX_SHAPES = 1024
+
+# Cadenas normalizadas memorizadas (títulos, géneros, países... se repiten mucho)
+STRING_CACHE_SIZE = 65536
+
+
+# Decimal128 es inmutable: se comparte en lugar de construir uno por documento
+DECIMAL_ZERO = Decimal128("0")
+
+# Campo canónico: nombre, grafías en orden de prioridad y conversor opcional
+Field = namedtuple('Field', ['name', 'aliases', 'convert'], defaults=[None])
+
+
+# ----------------------------------------------------------------------
+# Conversores (mismas reglas que los métodos estáticos del reestructurador)
+# ----------------------------------------------------------------------
+
+@lru_cache(maxsize=STRING_CACHE_SIZE)
+def _normalize_str(s):
+    s = s.strip()
+    if not s:
+        return ""
+    return " ".join(w.capitalize() for w in s.split())
+
+
+def normalize_string(text):
+    """Quita espacios sobrantes y capitaliza cada palabra ("" si no hay texto)"""
+    if text is None:
+        return ""
+    if type(text) is str:
+        return _normalize_str(text)
+    return _normalize_str(str(text))
+
+
+def normalize_or_empty(value):
+    """Como normalize_string(value or ''): un valor falso (0, False...) da cadena vacía"""
+    return normalize_string(value or "")
+
+
+def to_int(value, default=0):
+    if type(value) is int:
+        return value
+    try:
+        if value is None:
+            return default
+        if isinstance(value, Decimal128):
+            return int(value.to_decimal())
+        return int(value)
+    except Exception:
+        return default
+
+
+def to_float(value, default=0.0):
+    if type(value) is float:
+        return value
+    try:
+        if value is None:
+            return default
+        if isinstance(value, Decimal128):
+            return float(value.to_decimal())
+        return float(value)
+    except Exception:
+        return default
+
+
+def or_empty_string(value):
+    return value or ""
+
+
+def or_empty_dict(value):
+    return value or {}
+
+
+def or_empty_list(value):
+    return value or []
+
+
+def or_decimal_zero(value):
+    return value or DECIMAL_ZERO
+
+
+# ----------------------------------------------------------------------
+# Esquemas compilados por forma
+# ----------------------------------------------------------------------
+
+class Schema:
+    """
+    Conjunto de campos canónicos de un tipo de subdocumento.
+    schema(obj) devuelve un dict {nombre canónico: valor convertido} con
+    todos los campos del esquema, estén o no en obj.
+
+    Para cada forma nueva se genera y compila una función que lee
+    directamente la clave presente de cada campo, sin probar las grafías
+    ausentes. Los conversores deben tratar "" igual que None (todos los de
+    este módulo lo hacen); los campos sin conversor convierten "" en None.
+    """
+
+    def __init__(self, *fields, max_shapes=MAX_SHAPES):
+        self.fields = fields
+        self.max_shapes = max_shapes
+        self._plans = {}
+
+    def _compile(self, shape):
+        present = set(shape)
+        namespace = {"_first": _first}
+        lines = ["def remap(obj):", "    return {"]
+        for i, field in enumerate(self.fields):
+            keys = tuple(k for k in field.aliases if k in present)
+            if field.convert is not None:
+                namespace[f"c{i}"] = field.convert
+            if not keys:
+                value = "None"
+            elif len(keys) > 1:
+                value = f"_first(obj, {keys!r})"
+            elif field.convert is not None:
+                value = f"obj[{keys[0]!r}]"
+            else:
+                value = f"(v if (v := obj[{keys[0]!r}]) != '' else None)"
+            if field.convert is not None:
+                value = f"c{i}({value})"
+            lines.append(f"        {field.name!r}: {value},")
+        lines.append("    }")
+        exec("\n".join(lines), namespace)
+        return namespace["remap"]
+
+    def plan(self, obj):
+        """Función compilada para la forma de obj (un dict)"""
+        shape = tuple(obj)
+        remap = self._plans.get(shape)
+        if remap is None:
+            remap = self._compile(shape)
+            if len(self._plans) < self.max_shapes:
+                self._plans[shape] = remap
+        return remap
+
+    def __call__(self, obj):
+        if type(obj) is not dict and not isinstance(obj, dict):
+            obj = {}
+        remap = self._plans.get(tuple(obj))
+        if remap is None:
+            remap = self.plan(obj)
+        return remap(obj)
+
+    @property
+    def shapes(self):
+        """Formas distintas compiladas hasta ahora"""
+        return len(self._plans)
+
+
+def _first(obj, keys):
+    """Primer valor distinto de None y de "" entre las claves presentes"""
+    for key in keys:
+        v = obj[key]
+        if v is not None and v != "":
+            return v
+    return None
+
+
+# ----------------------------------------------------------------------
+# Esquemas de los volcados de StreamIt
+# ----------------------------------------------------------------------
+
+MOVIE_ITEM = Schema(
+    Field("title", ("title", "Title"), normalize_string),
+    Field("details", ("details", "Details"), or_empty_dict),
+    Field("date", ("date", "Date")),
+    Field("time", ("time", "Time")),
+    Field("viewingPct", ("viewingPct", "Viewing PCT"), to_int),
+    Field("license", ("license", "License"), or_empty_dict),
+)
+
+MOVIE_YEAR = Schema(
+    Field("year", ("year", "Year"), to_int),
+)
+
+MOVIE_DETAILS = Schema(
+    Field("country", ("country", "Country"), normalize_or_empty),
+    Field("color", ("color", "Color"), or_empty_string),
+    Field("aspectRatio", ("aspectRatio", "Aspect ratio"), to_float),
+    Field("contentRating", ("contentRating", "Content Rating"), or_empty_string),
+    Field("budget", ("budget", "Budget"), or_decimal_zero),
+    Field("gross", ("gross", "Gross"), or_decimal_zero),
+    Field("language", ("language", "Language"), or_empty_string),
+    Field("duration", ("duration", "Duration"), to_int),
+    Field("imdbScore", ("imdbScore", "IMDB score"), to_float),
+    Field("imdbLink", ("imdbLink", "IMDB link"), or_empty_string),
+    Field("criticReviews", ("criticReviews", "Critic reviews"), to_int),
+    Field("userReviews", ("userReviews", "User reviews"), to_int),
+    Field("votedUsers", ("votedUsers", "Voted users"), to_int),
+    Field("facebookLikes", ("facebookLikes", "Facebook likes"), to_int),
+    Field("facesInPoster", ("facesInPoster", "Faces in poster"), to_int),
+    Field("genres", ("genres", "Genres"), or_empty_list),
+    Field("keywords", ("keywords", "Keywords"), or_empty_list),
+    Field("director", ("director", "Director"), or_empty_dict),
+    Field("cast", ("cast", "Cast"), or_empty_dict),
+)
+
+DIRECTOR = Schema(
+    Field("name", ("name", "Name"), normalize_or_empty),
+    Field("facebookLikes", ("facebookLikes", "Facebook likes"), to_int),
+)
+
+CAST = Schema(
+    Field("facebookLikes", ("facebookLikes", "Facebook likes"), to_int),
+    Field("stars", ("stars", "Stars"), or_empty_list),
+)
+
+STAR = Schema(
+    Field("name", ("player", "Player"), normalize_or_empty),
+    Field("facebookLikes", ("facebookLikes", "Facebook likes"), to_int),
+)
+
+SERIES_ITEM = Schema(
+    Field("title", ("title", "Title"), normalize_string),
+    Field("totalSeasons", ("totalSeasons", "Total Seasons"), to_int),
+    Field("totalEpisodes", ("totalEpisodes", "Total Episodes"), to_int),
+    Field("avgDuration", ("avgDuration", "Avg duration"), to_int),
+    Field("season", ("season", "Season"), to_int),
+    Field("episode", ("episode", "Episode"), to_int),
+    Field("date", ("date", "Date")),
+    Field("time", ("time", "Time")),
+    Field("viewingPct", ("viewingPct", "Viewing PCT"), to_int),
+    Field("license", ("license", "License"), or_empty_dict),
+)
+
+PRODUCT = Schema(
+    Field("zapping", ("zapping", "Zapping"), to_int),
+    Field("promotion", ("promotion", "Promotion"), to_int),
+)
@@ -0,0 +1,825 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Carga limpia de los volcados en MongoDB
+Descripción: Sustituye la cadena convertir_json.py -> mongoimport ->
+PO22_05_07_1_limpieza.txt. Los volcados se leen en streaming, cada factura se
+limpia en memoria con las mismas transformaciones que el script de mongosh
+(renombrados, fechas, tipos, strings y campos calculados) y se escribe una
+sola vez, ya limpia, en streamit_db.invoices. Los índices del script se crean
+al terminar la carga.
+
+Se reproducen también las particularidades del script de mongosh:
+  - createDateConversion toma siempre dos dígitos de año ($substr 6,2), así
+    que un DD/MM/YYYY de 2016 queda en 2020 y uno de 1999 en 2019
+  - billing con un mes desconocido se convierte a enero
+  - details.imdbLink queda vacío (el repaso 6B reconstruye details sin él)
+  - Client.age es la diferencia de años naturales ($dateDiff con unit year)
+  - $trim, $toLower/$toUpper, $toString y $toDecimal con la semántica de MongoDB
+Donde mongosh abortaría el updateMany (p. ej. $toInt de un texto no numérico)
+el valor queda en null y se cuenta como incidencia.
+
+Con --verificar-paridad COLECCION no se escribe nada: se comparan los
+documentos limpiados en memoria con los de una colección ya limpiada por el
+script de mongosh.
+"""
+
+import argparse
+import math
+import os
+import re
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+
+import bson
+from bson import Decimal128, ObjectId
+from pymongo import MongoClient, ASCENDING, TEXT, IndexModel
+
+import backend_json
+from asesor_indices import build_indexes, load_plan
+from deduplicacion import load_checked_plan
+from escritor_bulk import MAX_BATCH_BYTES, BulkWriter
+from fechas import MONTHS, YEAR_PIVOT
+from lector_json import MappedDump
+from metricas import Metrics, add_metrics_arguments
+
+# Configuración
+MONGO_URI = "mongodb://localhost:27017/"
+DATABASE_NAME = "streamit_db"
+COLLECTION = "invoices"
+DATA_DIR = "./datafiles"
+
+# Versión del script de limpieza que se reproduce (_metadata.version)
+CLEANING_VERSION = "4.1"
+
+# Renombrados del PASO 1 (origen -> destino)
+ROOT_RENAMES = {"TOTAL": "total", "charge date": "chargeDate", "dump date": "dumpDate"}
+CLIENT_RENAMES = {
+    "customer code": "customerCode", "DNI": "dni", "Name": "name", "Surname": "surname",
+    "Birth date": "birthDate", "Phone": "phone", "Email": "email",
+}
+CONTRACT_RENAMES = {
+    "contract ID": "contractId", "start date": "startDate", "end date": "endDate", "ZIP": "zip",
+}
+PRODUCT_RENAMES = {
+    "Reference": "reference", "monthly fee": "monthlyFee", "cost per content": "costPerContent",
+    "cost per minute": "costPerMinute", "cost per day": "costPerDay",
+}
+PRODUCT_FEES = ("monthlyFee", "costPerContent", "costPerMinute", "costPerDay")
+
+# Índices de los PASOS 7 y 7B
+INDEXES = [
+    [("Client.customerCode", ASCENDING)],
+    [("Client.email", ASCENDING)],
+    [("Client.dni", ASCENDING)],
+    [("contract.contractId", ASCENDING)],
+    [("chargeDate", ASCENDING)],
+    [("billing", ASCENDING)],
+    [("Client.customerCode", ASCENDING), ("chargeDate", ASCENDING)],
+    [("Movies.date", ASCENDING)],
+    [("Series.date", ASCENDING)],
+    [("billing", ASCENDING), ("Client.customerCode", ASCENDING)],
+    [("Movies.title", TEXT), ("Series.title", TEXT)],
+]
+
+# Validaciones simples del script de mongosh (nombre, consulta)
+VALIDATIONS = [
+    ("Fechas nulas críticas", {"$or": [{"chargeDate": None}, {"dumpDate": None}, {"billing": None}]}),
+    ("total no Decimal128", {"total": {"$not": {"$type": "decimal"}}}),
+    ("Surname en array", {"Client.surname": {"$type": "array"}}),
+    ("Emails inválidos (sin @)", {"Client.email": {"$exists": True, "$ne": "", "$not": re.compile("@")}}),
+    ("DNIs faltantes", {"$or": [{"Client.dni": ""}, {"Client.dni": None}]}),
+    ("Teléfonos con caracteres no numéricos", {"Client.phone": {"$type": "string", "$regex": "[^0-9]"}}),
+    ("Movies con fechas string", {"Movies.date": {"$type": "string"}}),
+    ("Series con fechas string", {"Series.date": {"$type": "string"}}),
+    ("Movies sin título", {"Movies": {"$elemMatch": {"$or": [{"title": None}, {"title": ""}]}}}),
+    ("Series sin título", {"Series": {"$elemMatch": {"$or": [{"title": None}, {"title": ""}]}}}),
+]
+
+# Caracteres que elimina $trim por defecto
+MONGO_WHITESPACE = (
+    "\u0000 \u0009\u000a\u000b\u000c\u000d\u00a0\u1680"
+    "\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a"
+    "\u2028\u2029\u202f\u205f\u3000"
+)
+
+# $toLower / $toUpper solo cambian letras ASCII
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+_ASCII_UPPER = str.maketrans("abcdefghijklmnopqrstuvwxyz", "ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+_INT_STRING = re.compile(r"-?\d+")
+_NUMBER_STRING = re.compile(r"[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?")
+_YMD = re.compile(r"(\d{4})-(\d{2})-(\d{2})")
+_INT32_MIN, _INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+MONTH_NUMBERS = {name: f"{number:02d}" for name, number in MONTHS.items()}
+
+
+def connect():
+    return MongoClient(MONGO_URI)
+
+
+class ConversionError(ValueError):
+    """Conversión que en mongosh abortaría el updateMany"""
+
+
+# Valor ausente (distinto de null: en un objeto de agregación no se escribe)
+MISSING = object()
+
+
+# ----------------------------------------------------------------------
+# Operadores de agregación de MongoDB usados por el script
+# ----------------------------------------------------------------------
+
+def if_null(value, default):
+    return default if value is None or value is MISSING else value
+
+
+def path(obj, *keys):
+    """"$$obj.a.b": MISSING si algún nivel no es un documento o no tiene la clave"""
+    for key in keys:
+        if not isinstance(obj, dict):
+            return MISSING
+        obj = obj.get(key, MISSING)
+    return obj
+
+
+def mongo_trim(value):
+    if not isinstance(value, str):
+        raise ConversionError(f"$trim de {type(value).__name__}")
+    return value.strip(MONGO_WHITESPACE)
+
+
+def mongo_lower(value):
+    return value.translate(_ASCII_LOWER)
+
+
+def mongo_upper(value):
+    return value.translate(_ASCII_UPPER)
+
+
+def mongo_to_string(value):
+    if value is None or value is MISSING:
+        return None
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "Infinity" if value > 0 else "-Infinity"
+        return format(value, ".15g")
+    if isinstance(value, (Decimal128, ObjectId)):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%S.") + f"{value.microsecond // 1000:03d}Z"
+    raise ConversionError(f"$toString de {type(value).__name__}")
+
+
+def mongo_to_int(value):
+    if value is None or value is MISSING:
+        return None
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        result = value
+    elif isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            raise ConversionError(f"$toInt de {value}")
+        result = int(value)
+    elif isinstance(value, str):
+        if not _INT_STRING.fullmatch(value):
+            raise ConversionError(f"$toInt de '{value}'")
+        result = int(value)
+    elif isinstance(value, Decimal128):
+        dec = value.to_decimal()
+        if not dec.is_finite():
+            raise ConversionError(f"$toInt de {value}")
+        result = int(dec)
+    else:
+        raise ConversionError(f"$toInt de {type(value).__name__}")
+    if not _INT32_MIN <= result <= _INT32_MAX:
+        raise ConversionError(f"$toInt fuera de rango: {value}")
+    return result
+
+
+def mongo_to_double(value):
+    if value is None or value is MISSING:
+        return None
+    if isinstance(value, (bool, int, float)):
+        return float(value)
+    if isinstance(value, str):
+        if not _NUMBER_STRING.fullmatch(value):
+            raise ConversionError(f"$toDouble de '{value}'")
+        return float(value)
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    raise ConversionError(f"$toDouble de {type(value).__name__}")
+
+
+def mongo_to_decimal(value):
+    if value is None or value is MISSING:
+        return None
+    if isinstance(value, Decimal128):
+        return value
+    if isinstance(value, bool):
+        return Decimal128("1" if value else "0")
+    if isinstance(value, int):
+        return Decimal128(str(value))
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            raise ConversionError(f"$toDecimal de {value}")
+        if value == 0:
+            return Decimal128("0")
+        # MongoDB redondea los double a 15 cifras significativas (2.5 -> 2.50000000000000)
+        return Decimal128(Decimal(f"{value:.14e}"))
+    if isinstance(value, str):
+        if not _NUMBER_STRING.fullmatch(value):
+            raise ConversionError(f"$toDecimal de '{value}'")
+        try:
+            return Decimal128(Decimal(value))
+        except (InvalidOperation, ValueError):
+            raise ConversionError(f"$toDecimal de '{value}'")
+    raise ConversionError(f"$toDecimal de {type(value).__name__}")
+
+
+def parse_ymd(text):
+    """$dateFromString con format '%Y-%m-%d' y onError: null"""
+    match = _YMD.fullmatch(text)
+    if not match:
+        return None
+    try:
+        return datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    except ValueError:
+        return None
+
+
+def legacy_date(value):
+    """createDateConversion: siempre DD/MM/YY con pivote de siglo"""
+    day, month, year = value[0:2], value[3:5], value[6:8]
+    prefix = "19" if mongo_to_int(year) > YEAR_PIVOT else "20"
+    return parse_ymd(f"{prefix}{year}-{month}-{day}")
+
+
+def content_date(value):
+    """Fechas de Movies/Series y de su License (PASOS 2.7 y 2.8)"""
+    s = mongo_to_string(if_null(value, ""))
+    n = len(s)
+    if n < 8:
+        return None
+    if n == 10:
+        prefix, year = "", s[6:10]
+    else:
+        year = s[6:8]
+        prefix = "19" if mongo_to_int(year) > YEAR_PIVOT else "20"
+    return parse_ymd(f"{prefix}{year}-{s[3:5]}-{s[0:2]}")
+
+
+def billing_date(value):
+    """'Month YYYY' -> primer día del mes; un mes desconocido se toma como enero"""
+    parts = mongo_trim(value).split(" ")
+    if len(parts) < 2:
+        return None
+    month = MONTH_NUMBERS.get(mongo_lower(parts[0]), "01")
+    return parse_ymd(f"{parts[1]}-{month}-01")
+
+
+def join_surname(parts):
+    """$reduce del PASO 3.1: separa con espacio solo si lo acumulado no está vacío"""
+    result = ""
+    for part in parts:
+        if not isinstance(part, str):
+            raise ConversionError(f"$concat de {type(part).__name__}")
+        result = result + ("" if result == "" else " ") + part
+    return result
+
+
+def _rename(obj, renames):
+    # $rename procesa los campos en orden lexicográfico y deja el destino al final
+    for source in sorted(renames):
+        if source in obj:
+            obj[renames[source]] = obj.pop(source)
+
+
+def _subdocument(doc, key):
+    """$set de "key.campo": crea (o sustituye si no es un documento) el subdocumento"""
+    value = doc.get(key)
+    if not isinstance(value, dict):
+        value = doc[key] = {}
+    return value
+
+
+# ----------------------------------------------------------------------
+# Limpieza de una factura
+# ----------------------------------------------------------------------
+
+class InvoiceCleaner:
+    """
+    Aplica a cada factura el resultado acumulado de todos los pasos de
+    PO22_05_07_1_limpieza.txt. now hace de new Date() en cleanedAt y en la
+    edad cuando no hay chargeDate.
+    """
+
+    def __init__(self, now=None):
+        self.now = now or datetime.now(timezone.utc)
+        self.incidencias = Counter()
+
+    def _safe(self, campo, func, *args, default=None):
+        try:
+            return func(*args)
+        except ConversionError:
+            self.incidencias[campo] += 1
+            return default
+
+    def clean(self, doc):
+        """Limpia doc en el sitio y lo devuelve"""
+        # PASO 1: renombrados
+        _rename(doc, ROOT_RENAMES)
+        client = doc.get("Client")
+        if isinstance(client, dict):
+            _rename(client, CLIENT_RENAMES)
+        contract = doc.get("contract")
+        if isinstance(contract, dict):
+            _rename(contract, CONTRACT_RENAMES)
+            product = contract.get("product")
+            if isinstance(product, dict):
+                _rename(product, PRODUCT_RENAMES)
+
+        # PASO 2: fechas
+        for field in ("chargeDate", "dumpDate"):
+            if isinstance(doc.get(field), str):
+                doc[field] = self._safe(field, legacy_date, doc[field])
+        if isinstance(doc.get("billing"), str):
+            doc["billing"] = self._safe("billing", billing_date, doc["billing"])
+        if isinstance(client, dict) and isinstance(client.get("birthDate"), str):
+            client["birthDate"] = self._safe("Client.birthDate", legacy_date, client["birthDate"])
+        if isinstance(contract, dict):
+            for field in ("startDate", "endDate"):
+                if isinstance(contract.get(field), str):
+                    contract[field] = self._safe(f"contract.{field}", legacy_date, contract[field])
+
+        # PASOS 1.4-6C sobre los arrays de contenidos
+        for key, clean_item in (("Movies", self._clean_movie), ("Series", self._clean_series)):
+            items = doc.get(key)
+            if items is None:
+                continue
+            if not isinstance(items, list):
+                self.incidencias[key] += 1
+                continue
+            doc[key] = [clean_item(item) for item in items]
+
+        # PASO 3: tipos
+        if isinstance(client, dict) and isinstance(client.get("surname"), list):
+            client["surname"] = self._safe("Client.surname", join_surname, client["surname"])
+        client = _subdocument(doc, "Client")
+        phone = self._safe("Client.phone", mongo_to_string, if_null(client.get("phone"), ""), default="")
+        client["phone"] = "".join(ch for ch in phone if ch in "0123456789")
+
+        doc["total"] = self._safe("total", mongo_to_decimal, if_null(doc.get("total"), "0"))
+        product = _subdocument(_subdocument(doc, "contract"), "product")
+        for field in PRODUCT_FEES:
+            product[field] = self._safe(f"contract.product.{field}", mongo_to_decimal,
+                                        if_null(product.get(field), "0"))
+
+        # PASO 5: strings
+        contract = doc["contract"]
+        client["name"] = self._trimmed(client, "name", "Client.name")
+        client["surname"] = self._trimmed(client, "surname", "Client.surname")
+        email = self._trimmed(client, "email", "Client.email")
+        client["email"] = mongo_lower(email) if isinstance(email, str) else email
+        dni = self._trimmed(client, "dni", "Client.dni")
+        client["dni"] = mongo_upper(dni) if isinstance(dni, str) else dni
+        for field in ("address", "town", "country"):
+            contract[field] = self._trimmed(contract, field, f"contract.{field}")
+
+        # PASO 6: campos calculados
+        birth = client.get("birthDate")
+        if isinstance(birth, datetime):
+            end = if_null(doc.get("chargeDate"), self.now)
+            if isinstance(end, datetime):
+                client["age"] = end.year - birth.year
+            else:
+                self.incidencias["Client.age"] += 1
+
+        movies, series = if_null(doc.get("Movies"), []), if_null(doc.get("Series"), [])
+        if isinstance(movies, list) and isinstance(series, list):
+            doc["contentStats"] = {
+                "totalMovies": len(movies),
+                "totalSeries": len(series),
+                "totalContent": len(movies) + len(series),
+            }
+        else:
+            self.incidencias["contentStats"] += 1
+
+        metadata = _subdocument(doc, "_metadata")
+        metadata["cleanedAt"] = self.now
+        metadata["version"] = CLEANING_VERSION
+        return doc
+
+    def _trimmed(self, obj, field, campo):
+        return self._safe(campo, mongo_trim, if_null(obj.get(field), ""))
+
+    def _title(self, item, campo):
+        """title de PASOS 1.4/1.5: 'title' si no está vacío, si no 'Title', recortado"""
+        lo = if_null(path(item, "title"), "")
+        up = if_null(path(item, "Title"), "")
+        try:
+            return mongo_trim(lo if mongo_trim(lo) != "" else up)
+        except ConversionError:
+            self.incidencias[campo] += 1
+            return None
+
+    def _int(self, value, campo):
+        """$toInt con $ifNull a 0; tras una incidencia los repasos de 6B dejan 0"""
+        return self._safe(campo, mongo_to_int, if_null(value, 0), default=0)
+
+    def _viewing_pct(self, item, campo):
+        pct = self._int(if_null(path(item, "Viewing PCT"), 0), campo)
+        return min(100, max(0, pct))
+
+    def _license(self, item, campo):
+        license_doc = path(item, "License")
+        return {
+            "date": self._safe(f"{campo}.license.date", content_date, path(license_doc, "Date")),
+            "time": if_null(path(license_doc, "Time"), ""),
+        }
+
+    def _clean_movie(self, m):
+        out = {"date": self._safe("Movies.date", content_date, path(m, "Date"))}
+        time_value = path(m, "Time")
+        if time_value is not MISSING:
+            out["time"] = time_value
+        out["title"] = self._title(m, "Movies.title")
+        out["viewingPct"] = self._viewing_pct(m, "Movies.viewingPct")
+        out["license"] = self._license(m, "Movies")
+        out["details"] = self._movie_details(path(m, "Details"))
+        return out
+
+    def _movie_details(self, d):
+        """details del PASO 4 con el orden y los tipos del repaso 6B y el imdbLink de 6C"""
+        def decimal(key):
+            value = self._safe("Movies.details." + key, mongo_to_string, path(d, key))
+            return self._safe("Movies.details." + key, mongo_to_decimal, if_null(value, "0"),
+                              default=Decimal128("0"))
+
+        def double(key):
+            return self._safe("Movies.details." + key, mongo_to_double, if_null(path(d, key), 0),
+                              default=0.0)
+
+        stars_in = if_null(path(d, "Cast", "Stars"), [])
+        if not isinstance(stars_in, list):
+            self.incidencias["Movies.details.cast.stars"] += 1
+            stars_in = []
+
+        return {
+            "year": self._int(path(d, "Year"), "Movies.details.year"),
+            "duration": self._int(path(d, "Duration"), "Movies.details.duration"),
+            "criticReviews": self._int(path(d, "Critic reviews"), "Movies.details.criticReviews"),
+            "userReviews": self._int(path(d, "User reviews"), "Movies.details.userReviews"),
+            "votedUsers": self._int(path(d, "Voted users"), "Movies.details.votedUsers"),
+            "facebookLikes": self._int(path(d, "Facebook likes"), "Movies.details.facebookLikes"),
+            "facesInPoster": self._int(path(d, "Faces in poster"), "Movies.details.facesInPoster"),
+            "budget": decimal("Budget"),
+            "gross": decimal("Gross"),
+            "imdbScore": double("IMDB score"),
+            "aspectRatio": double("Aspect ratio"),
+            "country": if_null(path(d, "Country"), ""),
+            "color": if_null(path(d, "Color"), ""),
+            "contentRating": if_null(path(d, "Content Rating"), ""),
+            "language": if_null(path(d, "Language"), ""),
+            "genres": if_null(path(d, "Genres"), []),
+            "keywords": if_null(path(d, "Keywords"), []),
+            "director": {
+                "name": if_null(path(d, "Director", "Name"), ""),
+                "facebookLikes": self._int(path(d, "Director", "Facebook likes"),
+                                           "Movies.details.director.facebookLikes"),
+            },
+            "cast": {
+                "facebookLikes": self._int(path(d, "Cast", "Facebook likes"),
+                                           "Movies.details.cast.facebookLikes"),
+                "stars": [
+                    {
+                        "player": if_null(path(star, "Player"), ""),
+                        "facebookLikes": self._int(path(star, "Facebook likes"),
+                                                   "Movies.details.cast.stars.facebookLikes"),
+                    }
+                    for star in stars_in
+                ],
+            },
+            # 6B reconstruye details sin imdbLink y 6C lo repone vacío
+            "imdbLink": "",
+        }
+
+    def _clean_series(self, s):
+        out = {"date": self._safe("Series.date", content_date, path(s, "Date"))}
+        time_value = path(s, "Time")
+        if time_value is not MISSING:
+            out["time"] = time_value
+        out["title"] = self._title(s, "Series.title")
+        season, episode = path(s, "Season"), path(s, "Episode")
+        if season is not MISSING:
+            out["season"] = None
+        if episode is not MISSING:
+            out["episode"] = None
+        out["avgDuration"] = self._int(path(s, "Avg duration"), "Series.avgDuration")
+        out["totalEpisodes"] = self._int(path(s, "Total Episodes"), "Series.totalEpisodes")
+        out["totalSeasons"] = self._int(path(s, "Total Seasons"), "Series.totalSeasons")
+        out["viewingPct"] = self._viewing_pct(s, "Series.viewingPct")
+        out["license"] = self._license(s, "Series")
+        # Si faltaban, $mergeObjects (PASO 3.7) los añade al final
+        out["season"] = self._int(season, "Series.season")
+        out["episode"] = self._int(episode, "Series.episode")
+        return out
+
+
+# ----------------------------------------------------------------------
+# Carga
+# ----------------------------------------------------------------------
+
+class CleanLoader:
+    def __init__(self, data_directory=DATA_DIR, collection=COLLECTION, writers=2,
+                 max_batch_bytes=MAX_BATCH_BYTES, append=False, client_factory=connect, index_plan=None,
+                 metrics=None, dedup_plan=None):
+        self.data_directory = data_directory
+        self.writers = writers
+        self.max_batch_bytes = max_batch_bytes
+        self.append = append
+        self.client = client_factory()
+        self.db = self.client[DATABASE_NAME]
+        self.collection = self.db[collection]
+        self.cleaner = InvoiceCleaner()
+        # [IndexModel] a construir tras la carga (por defecto los de PASO 7/7B)
+        self.index_models = [IndexModel(keys) for keys in INDEXES] if index_plan is None else index_plan
+        self.metrics = Metrics("carga_limpia") if metrics is None else metrics
+        # deduplicacion.DedupPlan con las facturas duplicadas a descartar
+        self.dedup_plan = dedup_plan
+
+        self.duplicates = 0
+        self.deduplicated = 0
+        self.without_id = 0
+
+    def iter_clean_documents(self):
+        """
+        Facturas limpias de todos los volcados en orden alfabético. Como
+        mongoimport, de un _id repetido se conserva la primera aparición.
+        Las facturas que descarta el plan de deduplicación no se cargan.
+        """
+        seen = set()
+        json_files = sorted(f for f in os.listdir(self.data_directory) if f.endswith('.json'))
+        for filename in json_files:
+            path = os.path.join(self.data_directory, filename)
+            dump = MappedDump(path)
+            self.metrics.add(bytes_read=os.path.getsize(path))
+            skip = self.dedup_plan.skip(filename) if self.dedup_plan else frozenset()
+            count = 0
+            for offset, doc in dump.iter_documents_with_offsets():
+                if offset in skip:
+                    self.deduplicated += 1
+                    continue
+                doc_id = doc.get("_id")
+                if doc_id is None:
+                    self.without_id += 1
+                elif doc_id in seen:
+                    self.duplicates += 1
+                    continue
+                else:
+                    seen.add(doc_id)
+                count += 1
+                yield self.cleaner.clean(doc)
+
+            aviso = f", {len(dump.malformed)} objetos mal formados" if dump.malformed else ""
+            print(f"   {filename}: {count} facturas ({dump.encoding}{aviso})")
+
+    def load(self):
+        print("=" * 80)
+        print("CARGA LIMPIA DE LOS VOLCADOS".center(80))
+        print("=" * 80)
+        print()
+        start = time.perf_counter()
+
+        if not self.append:
+            print(f"Limpiando colección destino '{self.collection.name}'...")
+            self.collection.drop()
+
+        # Al añadir se reemplaza por _id: recargar un volcado no duplica facturas
+        mode = 'replace' if self.append else 'insert'
+        print("Leyendo, limpiando y escribiendo facturas...")
+        with self.metrics.phase("load"):
+            with BulkWriter(self.collection, workers=self.writers, mode=mode,
+                            max_batch_bytes=self.max_batch_bytes) as writer:
+                for doc in self.iter_clean_documents():
+                    if "_id" not in doc:
+                        doc["_id"] = ObjectId()
+                    writer.put(doc)
+            self.metrics.add(docs=writer.docs, bytes_written=writer.bytes)
+        self.metrics.merge_histogram("batch_write_seconds", writer.latency)
+        writer.print_stats("Escritura")
+
+        if self.deduplicated:
+            print(f"   {self.deduplicated} facturas duplicadas descartadas por el plan de deduplicación")
+        if self.duplicates:
+            print(f"   Aviso: {self.duplicates} facturas con _id repetido omitidas (se conserva la primera)")
+        self.print_incidencias()
+
+        with self.metrics.phase("create_indexes"):
+            self.create_indexes()
+        with self.metrics.phase("validate"):
+            self.validate()
+        print(f"\nTiempo total: {time.perf_counter() - start:.2f} s")
+
+    def print_incidencias(self):
+        incidencias = self.cleaner.incidencias
+        if not incidencias:
+            return
+        print(f"\n   Aviso: {sum(incidencias.values())} valores que mongosh no habría podido convertir (quedan en null):")
+        for campo, veces in incidencias.most_common():
+            print(f"      {campo}: {veces}")
+
+    def create_indexes(self):
+        print("\nCreando índices...")
+        # Un solo createIndexes: la colección se lee una vez para todos los índices
+        built = build_indexes(self.db, {self.collection.name: self.index_models})
+        names, seconds = built[self.collection.name]
+        print(f"✓ {len(names)} índices creados en {seconds:.2f} s")
+
+    def validate(self):
+        print("\nVALIDACIONES FINALES")
+        print("-" * 80)
+        total_errors = 0
+        for name, query in VALIDATIONS:
+            count = self.collection.count_documents(query)
+            total_errors += count
+            print(f"[{'ERROR' if count else 'OK'}] {name}: {count}")
+        print(f"\nTotal documentos: {self.collection.count_documents({})}")
+        print("LIMPIEZA COMPLETADA SIN ERRORES" if total_errors == 0
+              else f"LIMPIEZA COMPLETADA CON ADVERTENCIAS ({total_errors} incidencias)")
+
+    # ------------------------------------------------------------------
+    # Paridad con el script de mongosh
+    # ------------------------------------------------------------------
+
+    def verify_parity(self, reference, batch_size=1000, max_examples=10):
+        """
+        Compara los documentos limpiados en memoria con los de la colección
+        reference (cargada con mongoimport y limpiada con mongosh). Se ignoran
+        _metadata.cleanedAt y, si no hay chargeDate, Client.age (ambos usan la
+        fecha de ejecución). Devuelve True si no hay diferencias.
+        """
+        ref_collection = self.db[reference]
+        print(f"Verificando paridad con '{reference}'...\n")
+
+        stats = Counter()
+        diferencias = Counter()
+        ejemplos = []
+        ids = set()
+
+        def compare(batch):
+            refs = {d["_id"]: d for d in ref_collection.find({"_id": {"$in": [d["_id"] for d in batch]}})}
+            for doc in batch:
+                ref = refs.get(doc["_id"])
+                if ref is None:
+                    stats["sin_referencia"] += 1
+                    continue
+                paths = []
+                _diff(_comparable(doc), _comparable(ref), "", paths)
+                if paths:
+                    stats["distintos"] += 1
+                    diferencias.update(set(paths))
+                    if len(ejemplos) < max_examples:
+                        ejemplos.append((doc["_id"], paths[:5]))
+                else:
+                    stats["identicos"] += 1
+
+        batch = []
+        for doc in self.iter_clean_documents():
+            if "_id" not in doc:
+                continue
+            ids.add(doc["_id"])
+            # Mismos tipos que al leer de MongoDB
+            batch.append(bson.decode(bson.encode(doc)))
+            if len(batch) >= batch_size:
+                compare(batch)
+                batch = []
+        if batch:
+            compare(batch)
+
+        extra = ref_collection.count_documents({}) - len(ids & set(ref_collection.distinct("_id")))
+
+        print(f"\nDocumentos idénticos: {stats['identicos']}")
+        print(f"Documentos distintos: {stats['distintos']}")
+        if stats["sin_referencia"]:
+            print(f"Sin documento en '{reference}': {stats['sin_referencia']}")
+        if extra:
+            print(f"Solo en '{reference}': {extra}")
+        if self.without_id:
+            print(f"Sin _id (no comparables): {self.without_id}")
+        self.print_incidencias()
+
+        if diferencias:
+            print("\nCampos con diferencias:")
+            for campo, veces in diferencias.most_common():
+                print(f"   {campo}: {veces}")
+            print("\nEjemplos:")
+            for doc_id, paths in ejemplos:
+                print(f"   {doc_id!r}: {', '.join(paths)}")
+
+        ok = not diferencias and not stats["sin_referencia"] and not extra
+        print("\n" + ("PARIDAD OK" if ok else "PARIDAD CON DIFERENCIAS"))
+        return ok
+
+
+def _comparable(doc):
+    """Quita los campos que dependen de la fecha de ejecución"""
+    metadata = doc.get("_metadata")
+    if isinstance(metadata, dict):
+        metadata.pop("cleanedAt", None)
+    client = doc.get("Client")
+    if doc.get("chargeDate") is None and isinstance(client, dict):
+        client.pop("age", None)
+    return doc
+
+
+def _diff(a, b, prefix, out):
+    """Añade a out las rutas en las que a y b difieren (valor o tipo BSON)"""
+    if isinstance(a, dict) and isinstance(b, dict):
+        for key in a.keys() | b.keys():
+            sub = f"{prefix}.{key}" if prefix else key
+            if key not in a or key not in b:
+                out.append(sub)
+            else:
+                _diff(a[key], b[key], sub, out)
+    elif isinstance(a, list) and isinstance(b, list):
+        if len(a) != len(b):
+            out.append(f"{prefix}[]")
+        else:
+            for x, y in zip(a, b):
+                _diff(x, y, f"{prefix}[]", out)
+    elif type(a) is not type(b) or a != b:
+        out.append(prefix)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Carga los volcados en MongoDB aplicando en memoria la limpieza de PO22_05_07_1_limpieza.txt")
+    parser.add_argument('--directorio', default=DATA_DIR,
+                        help="directorio con los volcados JSON (por defecto: %(default)s)")
+    parser.add_argument('--coleccion', default=COLLECTION,
+                        help="colección destino en streamit_db (por defecto: %(default)s)")
+    parser.add_argument('--escritores', type=int, default=2,
+                        help="hilos de escritura en bloque (por defecto: %(default)s)")
+    parser.add_argument('--lote-mb', type=float, default=MAX_BATCH_BYTES / 1024 / 1024,
+                        help="tamaño máximo de cada lote en MB (por defecto: %(default)s)")
+    parser.add_argument('--anadir', action='store_true',
+                        help="no borrar la colección destino; las facturas se reemplazan por _id")
+    parser.add_argument('--verificar-paridad', metavar='COLECCION',
+                        help="no escribir: comparar con una colección ya limpiada por el script de mongosh")
+    parser.add_argument('--plan-indices', metavar='FICHERO', default=None,
+                        help="construir los índices de un plan de asesor_indices.py en lugar de los de PASO 7/7B")
+    parser.add_argument('--plan-dedup', metavar='FICHERO', default=None,
+                        help="descartar las facturas duplicadas de un plan de deduplicacion.py")
+    add_metrics_arguments(parser)
+    backend_json.add_backend_argument(parser)
+    args = parser.parse_args()
+    backend_json.set_backend(args.backend_json)
+
+    if not os.path.isdir(args.directorio):
+        print(f"ERROR: No existe el directorio '{args.directorio}'")
+        sys.exit(1)
+
+    dedup_plan = None
+    if args.plan_dedup:
+        try:
+            dedup_plan = load_checked_plan(args.plan_dedup, args.directorio)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"ERROR: No se puede aplicar el plan de deduplicación: {e}")
+            sys.exit(1)
+
+    loader = CleanLoader(
+        data_directory=args.directorio,
+        collection=args.coleccion,
+        writers=args.escritores,
+        max_batch_bytes=int(args.lote_mb * 1024 * 1024),
+        append=args.anadir,
+        index_plan=load_plan(args.plan_indices).get(args.coleccion, []) if args.plan_indices else None,
+        metrics=Metrics("carga_limpia", profile_dir=args.perfilar),
+        dedup_plan=dedup_plan,
+    )
+    try:
+        if args.verificar_paridad:
+            sys.exit(0 if loader.verify_parity(args.verificar_paridad) else 1)
+        loader.load()
+    finally:
+        loader.client.close()
+    if args.metricas or args.metricas_prom or args.perfilar:
+        loader.metrics.export(args.metricas, args.metricas_prom)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,81 +5,150 @@ Script para convertir archivos JSON con múltiples objetos separados
 a un array JSON válido que MongoDB Compass pueda importar
 """
 
-import json
+import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
-def convert_multi_json_to_array(input_file, output_file):
+import backend_json
+from deduplicacion import load_checked_plan
+from lector_json import iter_documents_with_offsets
+
+# Formatos de salida disponibles
+#   array    -> array JSON indentado (mongoimport --jsonArray / Compass)
+#   compacto -> array JSON sin indentación (mongoimport --jsonArray)
+#   ndjson   -> un documento por línea (mongoimport sin --jsonArray)
+OUTPUT_FORMATS = ('array', 'compacto', 'ndjson')
+
+def _write_documents(documents, f, output_format):
     """
-    Convierte un archivo con múltiples objetos JSON a un array JSON válido
+    Escribe los documentos según el formato a medida que se parsean,
+    sin acumularlos en memoria. Devuelve el número de documentos escritos.
     """
-    documents = []
+    count = 0
     
-    # Leer el archivo con diferentes encodings
-    encodings = ['utf-8', 'latin-1', 'iso-8859-1']
-    content = None
+    if output_format == 'ndjson':
+        for doc in documents:
+            f.write(backend_json.dumps(doc))
+            f.write('\n')
+            count += 1
+        return count
     
-    for encoding in encodings:
-        try:
-            with open(input_file, 'r', encoding=encoding, errors='replace') as f:
-                content = f.read()
-            break
-        except:
-            continue
-    
-    if not content:
-        print(f"❌ Error: No se pudo leer {input_file}")
-        return 0
-    
-    # Parsear objetos JSON individuales
-    brace_count = 0
-    current_obj = ""
-    in_string = False
-    escape_next = False
-    
-    for char in content:
-        if escape_next:
-            current_obj += char
-            escape_next = False
-            continue
-            
-        if char == '\\':
-            escape_next = True
-            current_obj += char
-            continue
-        
-        if char == '"' and not escape_next:
-            in_string = not in_string
-        
-        if not in_string:
-            if char == '{':
-                if brace_count == 0:
-                    current_obj = ""
-                brace_count += 1
-            elif char == '}':
-                brace_count -= 1
-        
-        current_obj += char
-        
-        # Cuando cerramos un objeto completo
-        if brace_count == 0 and current_obj.strip():
-            try:
-                obj = json.loads(current_obj.strip())
-                documents.append(obj)
-                current_obj = ""
-            except json.JSONDecodeError:
-                current_obj = ""
-    
-    # Escribir como array JSON válido
-    if documents:
+    if output_format == 'compacto':
+        for doc in documents:
+            f.write(',' if count else '[')
+            f.write(backend_json.dumps(doc))
+            count += 1
+        f.write(']\n' if count else '[]\n')
+        return count
+    
+    # Misma salida que json.dump(documents, indent=2), documento a documento
+    for doc in documents:
+        f.write(',\n  ' if count else '[\n  ')
+        f.write(backend_json.dumps(doc, indent=2).replace('\n', '\n  '))
+        count += 1
+    f.write('\n]' if count else '[]')
+    return count
+
+def _read_documents(input_file, malformed, skip):
+    """Documentos del volcado salvo los de los offsets de skip (plan de deduplicación)"""
+    for offset, doc in iter_documents_with_offsets(input_file, malformed=malformed):
+        if offset not in skip:
+            yield doc
+
+def _convert_file(input_file, output_file, output_format='array', skip=frozenset()):
+    """
+    Convierte un archivo sin imprimir nada (apto para procesos worker).
+    Devuelve (documentos, objetos inválidos, mensaje de error o None).
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Formato de salida desconocido: {output_format}")
+    
+    malformed = []
+    try:
         with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(documents, f, ensure_ascii=False, indent=2)
-        print(f"✓ Convertido: {os.path.basename(input_file)} → {len(documents)} documentos")
-        return len(documents)
+            count = _write_documents(_read_documents(input_file, malformed, skip), f, output_format)
+    except OSError as e:
+        return 0, malformed, f"No se pudo procesar {input_file}: {e}"
+    
+    if not count:
+        os.remove(output_file)
+    return count, malformed, None
+
+def _print_result(input_file, count, malformed, error, discarded=0):
+    """Imprime el resultado de la conversión de un archivo"""
+    if error:
+        print(f"❌ Error: {error}")
+        return
+    
+    for bad in malformed:
+        print(f"⚠️  {os.path.basename(input_file)}: objeto inválido en byte {bad.offset} "
+              f"({bad.length} bytes): {bad.message}")
+    
+    omitted = f" ({discarded} duplicados descartados)" if discarded else ""
+    if count:
+        print(f"✓ Convertido: {os.path.basename(input_file)} → {count} documentos{omitted}")
+    elif discarded:
+        print(f"✓ Deduplicado por completo: {os.path.basename(input_file)} "
+              f"({discarded} duplicados descartados, sin archivo de salida)")
     else:
         print(f"❌ No se encontraron documentos en {input_file}")
-        return 0
+
+def convert_multi_json_to_array(input_file, output_file, output_format='array', skip=frozenset()):
+    """
+    Convierte un archivo con múltiples objetos JSON a un array JSON válido
+    (o a NDJSON), escribiendo cada documento en cuanto se parsea y omitiendo
+    los offsets de skip
+    """
+    count, malformed, error = _convert_file(input_file, output_file, output_format, skip)
+    _print_result(input_file, count, malformed, error, len(skip))
+    return count
+
+def convert_files_parallel(jobs, output_format, workers):
+    """
+    Convierte los archivos en un pool de procesos. Muestra el progreso según
+    terminan y después el resumen por archivo en el orden original.
+    Devuelve el total de documentos convertidos.
+    """
+    results = {}
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_convert_file, input_path, output_path, output_format, skip): input_path
+            for input_path, output_path, skip in jobs
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            input_path = futures[future]
+            try:
+                results[input_path] = future.result()
+            except Exception as e:
+                results[input_path] = (0, [], f"No se pudo procesar {input_path}: {e}")
+            count, _, error = results[input_path]
+            status = "✗" if error else "✓"
+            print(f"   [{done}/{len(jobs)}] {status} {os.path.basename(input_path)} ({count} documentos)")
+    
+    print()
+    total_docs = 0
+    for input_path, _, skip in jobs:
+        count, malformed, error = results[input_path]
+        _print_result(input_path, count, malformed, error, len(skip))
+        total_docs += count
+    return total_docs
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convierte los volcados multi-objeto a JSON importable")
+    parser.add_argument('--formato', choices=OUTPUT_FORMATS, default='array',
+                        help="array indentado (por defecto), array compacto o NDJSON (un documento por línea)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="procesos para convertir archivos en paralelo (0 = todos los núcleos)")
+    parser.add_argument('--plan-dedup', metavar='FICHERO', default=None,
+                        help="descartar las facturas duplicadas de un plan de deduplicacion.py")
+    backend_json.add_backend_argument(parser)
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    backend = backend_json.set_backend(args.backend_json)
+    
     print("=" * 80)
     print("CONVERSIÓN DE ARCHIVOS JSON PARA MONGODB COMPASS")
     print("=" * 80)
@@ -99,16 +168,31 @@ def main():
         return
     
     print(f"\n📁 Archivos encontrados: {len(json_files)}")
-    print(f"📂 Salida: {output_dir}\n")
+    print(f"📂 Salida: {output_dir}")
+    print(f"📝 Formato: {args.formato}")
+    print(f"🧩 Backend JSON: {backend}\n")
     
-    total_docs = 0
+    plan = None
+    if args.plan_dedup:
+        try:
+            plan = load_checked_plan(args.plan_dedup, input_dir)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ No se puede aplicar el plan de deduplicación: {e}")
+            return
+        print(f"🧹 Plan de deduplicación: {plan.discarded} facturas duplicadas a descartar\n")
+    
+    jobs = [(os.path.join(input_dir, f), os.path.join(output_dir, f), plan.skip(f) if plan else frozenset())
+            for f in json_files]
+    workers = min(args.workers if args.workers > 0 else (os.cpu_count() or 1), len(jobs))
     
-    for filename in json_files:
-        input_path = os.path.join(input_dir, filename)
-        output_path = os.path.join(output_dir, filename)
-        
-        docs = convert_multi_json_to_array(input_path, output_path)
-        total_docs += docs
+    if workers > 1:
+        print(f"⚙️  Procesos en paralelo: {workers}\n")
+        total_docs = convert_files_parallel(jobs, args.formato, workers)
+    else:
+        total_docs = 0
+        for input_path, output_path, skip in jobs:
+            docs = convert_multi_json_to_array(input_path, output_path, args.formato, skip)
+            total_docs += docs
     
     print("\n" + "=" * 80)
     print(f"✅ CONVERSIÓN COMPLETADA")
@@ -125,6 +209,10 @@ def main():
     print("5. Click en 'ADD DATA' → 'Import JSON or CSV file'")
     print(f"6. Seleccionar archivos de: {output_dir}")
     print("7. Importar uno por uno o todos juntos\n")
+    
+    json_array_flag = "" if args.formato == 'ndjson' else " --jsonArray"
+    print("📋 O DESDE TERMINAL CON mongoimport:")
+    print(f"   mongoimport --db streamit_db --collection invoices --file <archivo>{json_array_flag}\n")
 
 if __name__ == "__main__":
     main()
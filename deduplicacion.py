@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Detección de facturas duplicadas y casi duplicadas
+Descripción: Calcula para cada factura de los volcados tres huellas y agrupa
+las facturas que comparten alguna, con cubos hash en lugar de comparar cada
+par (tiempo lineal en el número de facturas):
+  - contenido: hash del documento completo sin los campos volátiles (_id,
+    dump date, _metadata); dos facturas con la misma huella son duplicados
+    exactos aunque tengan distinto _id o vengan de volcados distintos
+  - normalizado: hash del contenido con las claves unificadas (charge date /
+    chargeDate), los strings sin espacios sobrantes ni mayúsculas, los
+    números por valor (5, 5.0 y "5.00") y los arrays sin orden
+  - negocio: código de cliente + ID de contrato + mes de facturación + TOTAL
+Los grupos unidos solo por las dos últimas huellas son casi duplicados.
+
+De cada grupo se conserva la primera aparición (volcados en orden alfabético
+y por offset, igual que carga_limpia.py y mongoimport con los _id
+repetidos). Los duplicados exactos se descartan; los casi duplicados quedan
+para revisar salvo con --aproximados. El plan (--salida) lo aplican
+convertir_json.py y carga_limpia.py con --plan-dedup: cada factura se
+identifica por archivo y offset, así que el plan guarda el SHA-256 de cada
+volcado y no se aplica si alguno ha cambiado.
+
+Uso:
+    python3 deduplicacion.py [--directorio ./datafiles] [--salida plan_dedup.json] [--aproximados]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+from analizadores import DocRef
+from cache_eda import file_sha256
+from fechas import parse_date
+from lector_json import MappedDump
+
+DATA_DIR = "./datafiles"
+
+# Campos de nivel superior que cambian entre volcados de la misma factura
+# (_id, dump date y _metadata, con las claves en forma canónica)
+VOLATILE_FIELDS = frozenset({'id', 'dumpdate', 'metadata'})
+
+# Grupos mostrados en el informe por defecto
+DEFAULT_SHOWN_GROUPS = 10
+
+# Bytes de cada huella (blake2b)
+DIGEST_SIZE = 16
+
+_NUMBER = re.compile(r'[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?')
+
+# Huellas de una factura. business es la clave de negocio (tupla) o None si
+# falta alguno de sus campos; total es el TOTAL como Decimal (o None).
+Fingerprint = namedtuple('Fingerprint', ['offset', 'content', 'normalized', 'business', 'total'])
+
+# Huellas de un volcado
+FileFingerprints = namedtuple('FileFingerprints', ['filename', 'sha256', 'encoding', 'malformed', 'fingerprints'])
+
+# Grupo de facturas duplicadas. members: [(DocRef, acción, TOTAL)] con la
+# factura conservada primero; criteria: huellas que unen el grupo.
+DuplicateGroup = namedtuple('DuplicateGroup', ['kind', 'criteria', 'members', 'business'])
+
+KEEP, DISCARD, REVIEW = 'conservar', 'descartar', 'revisar'
+
+
+# ----------------------------------------------------------------------
+# Huellas
+# ----------------------------------------------------------------------
+
+@lru_cache(maxsize=4096)
+def canonical_key(key):
+    """'charge date', 'chargeDate' y 'Charge_Date' -> 'chargedate'"""
+    return ''.join(ch for ch in key.casefold() if ch.isalnum()) if isinstance(key, str) else str(key)
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=DIGEST_SIZE).digest()
+
+
+def _amount(value):
+    """Decimal normalizado de un número o de un string numérico (None si no lo es)"""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        text = repr(value)
+    elif isinstance(value, str) and _NUMBER.fullmatch(value.strip()):
+        text = value.strip()
+    else:
+        return None
+    try:
+        number = Decimal(text).normalize()
+    except InvalidOperation:
+        return None
+    # normalize() deja 20 como 2E+1: se vuelve a la notación sin exponente
+    return Decimal(format(number, 'f'))
+
+
+@lru_cache(maxsize=65536)
+def _scalar_text(value):
+    """Número (por valor) o string normalizado; los valores se repiten mucho"""
+    number = _amount(value)
+    if number is not None:
+        return f"n{number}"
+    text = " ".join(str(value).split()).casefold()
+    return repr(text) if text else None
+
+
+def _normalized_text(value):
+    """
+    Serialización canónica para la huella normalizada. Los valores vacíos
+    (None, '', [], {}) se omiten, así que un campo ausente y uno vacío
+    coinciden.
+    """
+    kind = type(value)
+    if kind is dict:
+        items = []
+        for k, v in value.items():
+            text = _normalized_text(v)
+            if text is not None:
+                items.append(f"{canonical_key(k)}:{text}")
+        return "{" + ",".join(sorted(items)) + "}" if items else None
+    if kind is list:
+        items = [text for text in map(_normalized_text, value) if text is not None]
+        return "[" + ",".join(sorted(items)) + "]" if items else None
+    if value is None:
+        return None
+    # bool antes que la caché: True == 1 compartiría entrada con el número 1
+    if kind is bool:
+        return "true" if value else "false"
+    return _scalar_text(value)
+
+
+def _code(value):
+    """Código o identificador sin espacios ni distinción de mayúsculas"""
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    text = "".join(str(value).split()).upper()
+    return text or None
+
+
+def _billing_month(value):
+    """'october 2016', '01/10/16'... -> '2016-10'; si no es una fecha, el texto normalizado"""
+    parsed = parse_date(value.strip()) if isinstance(value, str) else None
+    if parsed is not None:
+        return f"{parsed.year:04d}-{parsed.month:02d}"
+    return _code(value)
+
+
+def business_key(doc):
+    """(cliente, contrato, mes de facturación, TOTAL) o None si falta alguno"""
+    return _business_key({canonical_key(k): v for k, v in doc.items()})
+
+
+def _business_key(top):
+    client = top.get('client')
+    contract = top.get('contract')
+    client = {canonical_key(k): v for k, v in client.items()} if isinstance(client, dict) else {}
+    contract = {canonical_key(k): v for k, v in contract.items()} if isinstance(contract, dict) else {}
+
+    total = top.get('total')
+    amount = _amount(total)
+    key = (
+        _code(client.get('customercode')),
+        _code(contract.get('contractid')),
+        _billing_month(top.get('billing')),
+        str(amount) if amount is not None else _code(total),
+    )
+    return None if None in key else key
+
+
+def fingerprint(doc, offset=None):
+    """Huellas de una factura"""
+    top = {canonical_key(k): v for k, v in doc.items()}
+    stable = {k: v for k, v in doc.items() if canonical_key(k) not in VOLATILE_FIELDS}
+    content = _digest(json.dumps(stable, sort_keys=True, ensure_ascii=False, default=str))
+    normalized = _digest(_normalized_text(stable) or "")
+    return Fingerprint(offset, content, normalized, _business_key(top), _amount(top.get('total')))
+
+
+def fingerprint_file(path):
+    """Huellas de todas las facturas de un volcado (apto para procesos worker)"""
+    dump = MappedDump(path)
+    fingerprints = [fingerprint(doc, offset) for offset, doc in dump.iter_documents_with_offsets()]
+    return FileFingerprints(os.path.basename(path), file_sha256(path), dump.encoding,
+                            len(dump.malformed), fingerprints)
+
+
+# ----------------------------------------------------------------------
+# Agrupación por cubos hash
+# ----------------------------------------------------------------------
+
+class DuplicateFinder:
+    """
+    Agrupa las facturas que comparten alguna huella. Cada huella se busca en
+    un diccionario (su cubo) y las facturas del mismo cubo se unen con
+    union-find, así que el coste es lineal en el número de facturas.
+    """
+
+    CRITERIA = ('contenido', 'normalizado', 'negocio')
+
+    def __init__(self):
+        self.files = {}
+        self.refs = []
+        self.fingerprints = []
+        self._parent = []
+        self._buckets = {criterion: {} for criterion in self.CRITERIA}
+
+    def _find(self, i):
+        parent = self._parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def _union(self, i, j):
+        ri, rj = self._find(i), self._find(j)
+        if ri != rj:
+            # La raíz es siempre la primera aparición
+            if rj < ri:
+                ri, rj = rj, ri
+            self._parent[rj] = ri
+
+    def add_file(self, result):
+        """Incorpora las huellas de un volcado (en orden alfabético de archivos)"""
+        self.files[result.filename] = result
+        for fp in result.fingerprints:
+            i = len(self.refs)
+            self.refs.append(DocRef(result.filename, fp.offset))
+            self.fingerprints.append(fp)
+            self._parent.append(i)
+            for criterion, value in zip(self.CRITERIA, (fp.content, fp.normalized, fp.business)):
+                if value is None:
+                    continue
+                first = self._buckets[criterion].setdefault(value, i)
+                if first != i:
+                    self._union(first, i)
+
+    def groups(self, approximate=False):
+        """
+        Grupos de dos o más facturas, en orden de primera aparición. Una
+        factura con la misma huella de contenido que otra anterior del grupo
+        se descarta; el resto de casi duplicados se revisa (o se descarta
+        con approximate=True).
+        """
+        members = defaultdict(list)
+        for i in range(len(self.refs)):
+            members[self._find(i)].append(i)
+
+        groups = []
+        for root in sorted(members):
+            indices = members[root]
+            if len(indices) < 2:
+                continue
+            fps = [self.fingerprints[i] for i in indices]
+            criteria = []
+            columns = ([fp.content for fp in fps], [fp.normalized for fp in fps], [fp.business for fp in fps])
+            for criterion, values in zip(self.CRITERIA, columns):
+                counts = Counter(v for v in values if v is not None)
+                if counts and max(counts.values()) > 1:
+                    criteria.append(criterion)
+            seen_content = set()
+            group_members = []
+            for i, fp in zip(indices, fps):
+                if not group_members:
+                    action = KEEP
+                elif fp.content in seen_content or approximate:
+                    action = DISCARD
+                else:
+                    action = REVIEW
+                seen_content.add(fp.content)
+                group_members.append((self.refs[i], action, fp.total))
+            kind = 'exacto' if len(seen_content) == 1 else 'aproximado'
+            groups.append(DuplicateGroup(kind, criteria, group_members, fps[0].business))
+        return groups
+
+
+def find_duplicates(directory, workers=1):
+    """DuplicateFinder con las huellas de todos los volcados del directorio"""
+    paths = [os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.endswith('.json')]
+    finder = DuplicateFinder()
+    workers = min(workers if workers > 0 else (os.cpu_count() or 1), len(paths))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(fingerprint_file, paths))
+    else:
+        results = map(fingerprint_file, paths)
+    for result in results:
+        finder.add_file(result)
+    return finder
+
+
+def report(finder, groups, shown=DEFAULT_SHOWN_GROUPS):
+    """Imprime el resumen de la detección y los primeros grupos"""
+    print("=" * 80)
+    print("DETECCIÓN DE FACTURAS DUPLICADAS")
+    print("=" * 80)
+
+    for result in finder.files.values():
+        aviso = f", {result.malformed} objetos mal formados" if result.malformed else ""
+        print(f"   {result.filename}: {len(result.fingerprints)} facturas ({result.encoding}{aviso})")
+
+    actions = Counter()
+    amounts = defaultdict(Decimal)
+    for group in groups:
+        for _, action, total in group.members:
+            actions[action] += 1
+            if total is not None:
+                amounts[action] += total
+
+    exact = sum(1 for g in groups if g.kind == 'exacto')
+    print(f"\n📊 {len(finder.refs)} facturas en {len(finder.files)} volcados")
+    print(f"   • Grupos de duplicados exactos: {exact}")
+    print(f"   • Grupos de casi duplicados: {len(groups) - exact}")
+    print(f"   • Facturas a descartar: {actions[DISCARD]} (TOTAL {amounts[DISCARD]})")
+    print(f"   • Facturas a revisar: {actions[REVIEW]} (TOTAL {amounts[REVIEW]})")
+
+    if not groups:
+        print("\n✅ No se han encontrado facturas duplicadas")
+        return
+
+    print(f"\n📋 Primeros {min(shown, len(groups))} grupos de {len(groups)}:")
+    symbols = {KEEP: "✓", DISCARD: "✗", REVIEW: "?"}
+    for group in groups[:shown]:
+        clave = " | ".join(group.business) if group.business else "sin clave de negocio"
+        print(f"\n   [{group.kind}] {clave} ({', '.join(group.criteria)})")
+        for ref, action, total in group.members:
+            print(f"      {symbols[action]} {action:<10} {ref} (TOTAL {total})")
+
+
+# ----------------------------------------------------------------------
+# Plan de deduplicación
+# ----------------------------------------------------------------------
+
+def build_plan(finder, groups, directory, approximate=False):
+    """Plan JSON: facturas a descartar por volcado (con su SHA-256) y los grupos"""
+    archivos = {
+        filename: {"sha256": result.sha256, "descartar": []}
+        for filename, result in finder.files.items()
+    }
+    grupos = []
+    for group in groups:
+        for ref, action, _ in group.members:
+            if action == DISCARD:
+                archivos[ref.archivo]["descartar"].append(ref.offset)
+        grupos.append({
+            "tipo": group.kind,
+            "criterios": group.criteria,
+            "claveNegocio": list(group.business) if group.business else None,
+            "facturas": [{"ref": str(ref), "accion": action} for ref, action, _ in group.members],
+        })
+    for entry in archivos.values():
+        entry["descartar"].sort()
+    return {
+        "meta": {"fecha": datetime.now().isoformat(timespec="seconds"),
+                 "directorio": os.path.abspath(directory), "aproximados": approximate,
+                 "facturas": len(finder.refs)},
+        "archivos": archivos,
+        "grupos": grupos,
+    }
+
+
+class DedupPlan:
+    """Plan de deduplicación guardado, tal como lo aplican los pasos de importación"""
+
+    def __init__(self, plan):
+        self.plan = plan
+        self._skip = {filename: frozenset(entry["descartar"]) for filename, entry in plan["archivos"].items()}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    @property
+    def discarded(self):
+        """Facturas que descarta el plan"""
+        return sum(len(offsets) for offsets in self._skip.values())
+
+    def changed_files(self, directory):
+        """Volcados con facturas a descartar que ya no coinciden con el plan"""
+        changed = []
+        for filename, entry in self.plan["archivos"].items():
+            if not entry["descartar"]:
+                continue
+            path = os.path.join(directory, filename)
+            if not os.path.exists(path) or file_sha256(path) != entry["sha256"]:
+                changed.append(filename)
+        return changed
+
+    def skip(self, filename):
+        """Offsets de las facturas de un volcado que se descartan"""
+        return self._skip.get(os.path.basename(filename), frozenset())
+
+
+def load_checked_plan(path, directory):
+    """
+    Carga un plan y comprueba que los volcados no han cambiado desde que se
+    generó (los offsets dejarían de ser válidos). Lanza ValueError si no.
+    """
+    plan = DedupPlan.load(path)
+    changed = plan.changed_files(directory)
+    if changed:
+        raise ValueError(f"Los volcados han cambiado desde el plan de deduplicación: {', '.join(changed)}. "
+                         f"Vuelve a generarlo con deduplicacion.py")
+    return plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detecta facturas duplicadas y genera un plan de deduplicación")
+    parser.add_argument('--directorio', default=DATA_DIR,
+                        help="directorio con los volcados JSON (por defecto: %(default)s)")
+    parser.add_argument('--salida', default=None,
+                        help="guardar el plan de deduplicación en este JSON")
+    parser.add_argument('--aproximados', action='store_true',
+                        help="descartar también los casi duplicados (por defecto solo se marcan para revisar)")
+    parser.add_argument('--grupos', type=int, default=DEFAULT_SHOWN_GROUPS,
+                        help="grupos mostrados en el informe (por defecto: %(default)s)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="procesos para calcular las huellas en paralelo (0 = todos los núcleos)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.directorio):
+        print(f"❌ No existe el directorio '{args.directorio}'")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    finder = find_duplicates(args.directorio, args.workers)
+    groups = finder.groups(args.aproximados)
+    report(finder, groups, args.grupos)
+    print(f"\n⏱️  {time.perf_counter() - start:.2f} s")
+
+    if args.salida:
+        plan = build_plan(finder, groups, args.directorio, args.aproximados)
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(plan, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Plan guardado en '{args.salida}' (aplicar con --plan-dedup {args.salida} "
+              f"en convertir_json.py o carga_limpia.py)")
+
+
+if __name__ == "__main__":
+    main()
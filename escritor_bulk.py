@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Escritura concurrente en bloque para MongoDB
+Descripción: BulkWriter recibe documentos desde el hilo principal a través
+de una cola acotada y los escribe desde un pool de hilos en segundo plano.
+Los lotes se cierran por tamaño BSON (hasta 16 MB) o por número de
+operaciones (hasta 100k), se escriben sin orden (ordered=False) y los fallos
+transitorios de red se reintentan con espera exponencial. prefetch() lee un
+cursor en otro hilo, de modo que lectura, transformación y escritura se
+solapan. La latencia de cada lote escrito queda en el histograma latency
+(metricas.Histogram).
+"""
+
+import queue
+import threading
+import time
+
+import bson
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, PyMongoError
+
+from metricas import Histogram
+
+# Límites por lote (los del servidor: 16 MB por mensaje BSON, 100k operaciones)
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+MAX_BATCH_OPS = 100_000
+
+# Documentos en cola antes de bloquear al productor
+QUEUE_SIZE = 10_000
+
+# Reintentos ante errores transitorios y espera inicial (segundos)
+MAX_RETRIES = 5
+RETRY_BACKOFF = 0.5
+
+# Espera sin documentos nuevos tras la que se escribe un lote incompleto
+_IDLE_FLUSH = 0.05
+
+# Clave duplicada: en un reintento significa que el intento anterior sí escribió
+_DUPLICATE_KEY = 11000
+
+_FIN = object()
+
+
+def _is_transient(error):
+    return isinstance(error, ConnectionFailure) or (
+        isinstance(error, PyMongoError) and error.has_error_label("RetryableWriteError")
+    )
+
+
+def write_with_retry(collection, batch, mode='insert', max_retries=MAX_RETRIES, on_retry=None):
+    """
+    Escribe un lote sin orden (insert_many o ReplaceOne con upsert por _id),
+    reintentando los errores transitorios. Devuelve cuántos duplicados se
+    ignoraron al reintentar una inserción que ya se había escrito.
+    """
+    attempt = 0
+    while True:
+        try:
+            if mode == 'insert':
+                collection.insert_many(batch, ordered=False)
+            else:
+                collection.bulk_write(
+                    [ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in batch],
+                    ordered=False,
+                )
+            return 0
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if attempt > 0 and mode == 'insert' and errors and all(
+                err.get("code") == _DUPLICATE_KEY for err in errors
+            ):
+                # Reintento de un lote que ya se escribió (parcialmente) antes del corte
+                return len(errors)
+            raise
+        except PyMongoError as e:
+            if not _is_transient(e) or attempt >= max_retries:
+                raise
+        attempt += 1
+        if on_retry is not None:
+            on_retry()
+        time.sleep(RETRY_BACKOFF * 2 ** (attempt - 1))
+
+
+class BulkWriter:
+    """
+    Escritor en bloque con hilos en segundo plano.
+
+    mode='insert' inserta los documentos; mode='replace' hace un upsert por
+    _id (ReplaceOne), útil para cargas que se pueden repetir. Usar como
+    context manager o llamar a close() para esperar a que termine; un error
+    no transitorio en un hilo escritor se relanza en put() o close().
+    """
+
+    def __init__(self, collection, workers=2, mode='insert', max_batch_bytes=MAX_BATCH_BYTES,
+                 max_batch_ops=MAX_BATCH_OPS, queue_size=QUEUE_SIZE, max_retries=MAX_RETRIES):
+        if mode not in ('insert', 'replace'):
+            raise ValueError(f"Modo de escritura no soportado: {mode}")
+        self.collection = collection
+        self.mode = mode
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_ops = max_batch_ops
+        self.max_retries = max_retries
+
+        self.docs = 0
+        self.bytes = 0
+        self.batches = 0
+        self.retries = 0
+        self.duplicates = 0
+        # Segundos por lote escrito, reintentos incluidos
+        self.latency = Histogram()
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._error = None
+        self._closed = False
+        self._start = time.perf_counter()
+        self._end = None
+        self._threads = [
+            threading.Thread(target=self._run, name=f"bulk-writer-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for t in self._threads:
+            t.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(raise_errors=exc_type is None)
+        return False
+
+    def put(self, doc):
+        """Encola un documento; bloquea si la cola está llena"""
+        while True:
+            if self._error is not None:
+                raise self._error
+            try:
+                self._queue.put(doc, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def close(self, raise_errors=True):
+        """Escribe lo pendiente, detiene los hilos y devuelve las estadísticas"""
+        if not self._closed:
+            self._closed = True
+            for _ in self._threads:
+                self._queue.put(_FIN)
+            for t in self._threads:
+                t.join()
+            self._end = time.perf_counter()
+        if raise_errors and self._error is not None:
+            raise self._error
+        return self.stats()
+
+    # ------------------------------------------------------------------
+    # Hilos escritores
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        batch, batch_bytes = [], 0
+        while True:
+            try:
+                doc = self._queue.get(timeout=_IDLE_FLUSH)
+            except queue.Empty:
+                # Sin documentos nuevos: no retener un lote incompleto
+                if batch:
+                    self._flush(batch, batch_bytes)
+                    batch, batch_bytes = [], 0
+                continue
+
+            if doc is _FIN:
+                if batch:
+                    self._flush(batch, batch_bytes)
+                return
+            if self._error is not None:
+                # Tras un error fatal solo se vacía la cola para no bloquear al productor
+                continue
+
+            try:
+                size = len(bson.encode(doc))
+            except Exception as e:
+                # Documento no codificable en BSON: se trata como un error de escritura
+                self._fail(e)
+                continue
+            if batch and (batch_bytes + size > self.max_batch_bytes or len(batch) >= self.max_batch_ops):
+                self._flush(batch, batch_bytes)
+                batch, batch_bytes = [], 0
+            batch.append(doc)
+            batch_bytes += size
+
+    def _flush(self, batch, batch_bytes):
+        if self._error is not None:
+            return
+        start = time.perf_counter()
+        try:
+            duplicates = self._write_with_retry(batch)
+        except Exception as e:
+            self._fail(e)
+            return
+        with self._lock:
+            self.docs += len(batch)
+            self.bytes += batch_bytes
+            self.batches += 1
+            self.duplicates += duplicates
+            self.latency.observe(time.perf_counter() - start)
+
+    def _fail(self, error):
+        """Guarda el primer error fatal para relanzarlo en put() o close()"""
+        with self._lock:
+            if self._error is None:
+                self._error = error
+
+    def _write_with_retry(self, batch):
+        def on_retry():
+            with self._lock:
+                self.retries += 1
+        return write_with_retry(self.collection, batch, self.mode, self.max_retries, on_retry)
+
+    # ------------------------------------------------------------------
+    # Estadísticas
+    # ------------------------------------------------------------------
+
+    @property
+    def elapsed(self):
+        return (self._end or time.perf_counter()) - self._start
+
+    def stats(self):
+        elapsed = self.elapsed or 1e-9
+        return {
+            "docs": self.docs,
+            "bytes": self.bytes,
+            "batches": self.batches,
+            "retries": self.retries,
+            "duplicates": self.duplicates,
+            "seconds": elapsed,
+            "docs_per_sec": self.docs / elapsed,
+            "mb_per_sec": self.bytes / elapsed / 1024 / 1024,
+        }
+
+    def print_stats(self, label="Escritura"):
+        st = self.stats()
+        print(f"   {label}: {st['docs']} docs en {st['seconds']:.2f} s "
+              f"({st['docs_per_sec']:.0f} docs/s, {st['mb_per_sec']:.2f} MB/s), "
+              f"{st['batches']} lotes, {st['retries']} reintentos")
+
+
+def prefetch(iterable, maxsize=1000):
+    """
+    Recorre iterable (p. ej. un cursor) en un hilo aparte y entrega sus
+    elementos a través de una cola acotada, para solapar la lectura con el
+    procesamiento. Los errores del hilo lector se relanzan al consumidor.
+    """
+    q = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    error = []
+
+    def reader():
+        try:
+            for item in iterable:
+                while not stop.is_set():
+                    try:
+                        q.put(item, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+        except Exception as e:
+            error.append(e)
+        finally:
+            while not stop.is_set():
+                try:
+                    q.put(_FIN, timeout=0.5)
+                    break
+                except queue.Full:
+                    continue
+
+    t = threading.Thread(target=reader, name="cursor-prefetch", daemon=True)
+    t.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _FIN:
+                break
+            yield item
+        if error:
+            raise error[0]
+    finally:
+        stop.set()
+        t.join(timeout=1)
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Acumuladores estadísticos en streaming para el EDA
+Descripción: Estructuras de memoria acotada que se actualizan valor a valor
+y se pueden combinar entre archivos o procesos:
+  - RunningStats: media y varianza (Welford / Chan), mínimo y máximo
+  - QuantileSketch: cuantiles con error relativo acotado (estilo DDSketch)
+  - HyperLogLog: número aproximado de valores distintos
+  - DuplicateDetector: conteo exacto de claves repetidas que, por encima de
+    un umbral, vuelca a disco particionado por hash
+"""
+
+import hashlib
+import math
+import os
+import pickle
+import tempfile
+import uuid
+from collections import Counter
+
+# Error relativo por defecto de los cuantiles (1 %)
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# Máximo de intervalos del sketch de cuantiles antes de colapsar los menores
+DEFAULT_MAX_BINS = 2048
+
+# Precisión de HyperLogLog: 2^p registros, error típico 1.04 / sqrt(2^p)
+DEFAULT_HLL_PRECISION = 14
+
+# Claves distintas en memoria antes de volcar a disco
+DEFAULT_MAX_EXACT = 1_000_000
+
+# Particiones del volcado a disco (memoria al contar ~ claves / particiones)
+DEFAULT_SPILL_PARTITIONS = 64
+
+_MASK64 = (1 << 64) - 1
+
+
+def stable_hash64(value):
+    """Hash de 64 bits estable entre procesos y ejecuciones (no usa hash())"""
+    digest = hashlib.blake2b(repr(value).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def _canonical_key(key):
+    """
+    Clave con la que se particiona: Counter trata 1, 1.0 y True como la misma
+    clave, así que deben caer en la misma partición aunque su repr difiera
+    """
+    if isinstance(key, bool):
+        return int(key)
+    if isinstance(key, float) and key.is_integer():
+        return int(key)
+    if isinstance(key, tuple):
+        return tuple(_canonical_key(k) for k in key)
+    return key
+
+
+class RunningStats:
+    """Media, varianza, mínimo y máximo en una pasada (algoritmo de Welford)"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimo = None
+        self.maximo = None
+
+    def update(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if self.minimo is None or x < self.minimo:
+            self.minimo = x
+        if self.maximo is None or x > self.maximo:
+            self.maximo = x
+
+    def merge(self, other):
+        """Combina dos acumuladores (fórmula paralela de Chan)"""
+        if not other.count:
+            return
+        if not self.count:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.minimo, self.maximo = other.minimo, other.maximo
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.minimo = min(self.minimo, other.minimo)
+        self.maximo = max(self.maximo, other.maximo)
+
+    @property
+    def variance(self):
+        """Varianza muestral (0 con menos de dos valores)"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance)
+
+
+class QuantileSketch:
+    """
+    Sketch de cuantiles con error relativo acotado (estilo DDSketch).
+    Cada valor cae en un intervalo logarítmico de razón gamma; el cuantil
+    devuelto está a menos de relative_accuracy del valor real y nunca fuera
+    del rango observado (mínimo y máximo exactos). Si se supera max_bins se
+    colapsan los intervalos de menor magnitud.
+    """
+
+    def __init__(self, relative_accuracy=DEFAULT_RELATIVE_ACCURACY, max_bins=DEFAULT_MAX_BINS):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy debe estar entre 0 y 1")
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positivos = Counter()
+        self.negativos = Counter()
+        self.ceros = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def _key(self, x):
+        return math.ceil(math.log(x) / self._log_gamma)
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def update(self, x):
+        self.count += 1
+        if self.min is None or x < self.min:
+            self.min = x
+        if self.max is None or x > self.max:
+            self.max = x
+        if x > 0:
+            self.positivos[self._key(x)] += 1
+        elif x < 0:
+            self.negativos[self._key(-x)] += 1
+        else:
+            self.ceros += 1
+        if len(self.positivos) + len(self.negativos) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self):
+        # Se pierde precisión solo en los valores de menor magnitud
+        for bins in (self.negativos, self.positivos):
+            exceso = len(self.positivos) + len(self.negativos) - self.max_bins
+            if exceso <= 0 or len(bins) < 2:
+                continue
+            keys = sorted(bins)[:min(exceso, len(bins) - 1) + 1]
+            total = sum(bins.pop(k) for k in keys)
+            bins[keys[-1]] += total
+
+    def merge(self, other):
+        if other.gamma != self.gamma:
+            raise ValueError("No se pueden combinar sketches con distinta precisión")
+        self.positivos.update(other.positivos)
+        self.negativos.update(other.negativos)
+        self.ceros += other.ceros
+        self.count += other.count
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        if len(self.positivos) + len(self.negativos) > self.max_bins:
+            self._collapse()
+
+    def quantile(self, q):
+        """Valor aproximado del cuantil q (0..1) o None si está vacío"""
+        if not self.count:
+            return None
+        if self.min == self.max:
+            return self.min
+        # El punto medio del intervalo puede quedar fuera del rango observado
+        return min(max(self._bin_quantile(q), self.min), self.max)
+
+    def _bin_quantile(self, q):
+        rank = q * (self.count - 1)
+        acumulado = 0
+        for key in sorted(self.negativos, reverse=True):
+            acumulado += self.negativos[key]
+            if acumulado > rank:
+                return -self._value(key)
+        acumulado += self.ceros
+        if acumulado > rank:
+            return 0.0
+        for key in sorted(self.positivos):
+            acumulado += self.positivos[key]
+            if acumulado > rank:
+                return self._value(key)
+        return self._value(max(self.positivos))
+
+
+class HyperLogLog:
+    """Estimador de cardinalidad con 2^precision registros de un byte"""
+
+    def __init__(self, precision=DEFAULT_HLL_PRECISION):
+        if not 4 <= precision <= 18:
+            raise ValueError("precision debe estar entre 4 y 18")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        x = stable_hash64(value)
+        idx = x >> (64 - self.precision)
+        w = (x << self.precision) & _MASK64
+        rank = 65 - self.precision if w == 0 else 65 - w.bit_length()
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("No se pueden combinar HyperLogLog con distinta precisión")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    @property
+    def standard_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Corrección de rango bajo (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class DuplicateDetector:
+    """
+    Detector exacto de claves repetidas con memoria acotada.
+    Mientras haya hasta max_exact claves distintas se cuentan en memoria;
+    al superarlo los conteos se vuelcan a disco repartidos en particiones
+    por hash, y al final cada partición se cuenta por separado. Los
+    archivos volcados deben existir mientras se use el detector (también
+    si se guarda en la caché del EDA). merge() comparte los volcados del
+    otro detector sin copiarlos: cleanup() solo borra los que escribió este
+    (owned), los del otro siguen siendo suyos.
+    """
+
+    def __init__(self, max_exact=DEFAULT_MAX_EXACT, spill_dir=None, partitions=DEFAULT_SPILL_PARTITIONS):
+        self.max_exact = max_exact
+        self.spill_dir = spill_dir
+        self.partitions = partitions
+        self.counts = Counter()
+        self.spills = []
+        self.owned = []
+
+    def add(self, key):
+        self.counts[key] += 1
+        if len(self.counts) > self.max_exact:
+            self._spill()
+
+    def _partition(self, key):
+        return stable_hash64(_canonical_key(key)) % self.partitions
+
+    def _spill(self):
+        directory = self.spill_dir or os.path.join(tempfile.gettempdir(), 'eda_spill')
+        os.makedirs(directory, exist_ok=True)
+
+        buckets = [[] for _ in range(self.partitions)]
+        for key, count in self.counts.items():
+            buckets[self._partition(key)].append((key, count))
+
+        prefix = os.path.join(directory, f"ids_{uuid.uuid4().hex}")
+        paths = []
+        for i, bucket in enumerate(buckets):
+            path = f"{prefix}_{i:03d}.pkl"
+            with open(path, 'wb') as f:
+                pickle.dump(bucket, f, protocol=pickle.HIGHEST_PROTOCOL)
+            paths.append(path)
+        self.spills.append(paths)
+        self.owned.append(paths)
+        self.counts = Counter()
+
+    @property
+    def spilled(self):
+        return bool(self.spills)
+
+    def merge(self, other):
+        if other.partitions != self.partitions:
+            raise ValueError("No se pueden combinar detectores con distinto número de particiones")
+        self.spills.extend(other.spills)
+        self.counts.update(other.counts)
+        if len(self.counts) > self.max_exact:
+            self._spill()
+
+    def iter_counts(self):
+        """Genera (clave, veces) con conteos exactos, partición a partición"""
+        if not self.spills:
+            yield from self.counts.items()
+            return
+
+        en_memoria = [Counter() for _ in range(self.partitions)]
+        for key, count in self.counts.items():
+            en_memoria[self._partition(key)][key] += count
+
+        for i in range(self.partitions):
+            counts = en_memoria[i]
+            for paths in self.spills:
+                with open(paths[i], 'rb') as f:
+                    for key, count in pickle.load(f):
+                        counts[key] += count
+            yield from counts.items()
+            en_memoria[i] = None
+
+    def summary(self, max_examples=5):
+        """Devuelve (claves distintas, claves repetidas, [(clave, veces)] de ejemplo)"""
+        distintos = 0
+        repetidos = 0
+        ejemplos = []
+        for key, count in self.iter_counts():
+            distintos += 1
+            if count > 1:
+                repetidos += 1
+                if len(ejemplos) < max_examples:
+                    ejemplos.append((key, count))
+        return distintos, repetidos, ejemplos
+
+    def spill_files(self):
+        """Rutas de los archivos volcados por este detector"""
+        return [path for paths in self.owned for path in paths]
+
+    def cleanup(self):
+        """Elimina los archivos volcados por este detector"""
+        remove_files(self.spill_files())
+        self.spills = [paths for paths in self.spills if paths not in self.owned]
+        self.owned = []
+
+
+def remove_files(paths):
+    """Borra los archivos indicados; los que ya no existen se ignoran"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
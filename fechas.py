@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Clasificación y conversión de fechas de los volcados
+Descripción: Detecta el formato de cada valor de fecha con patrones
+precompilados y lo convierte a datetime con las mismas reglas que el script
+de limpieza de mongosh ($dateFromString):
+  - DD/MM/YY    -> año > 25 = 19YY, en otro caso 20YY
+  - DD/MM/YYYY  -> fecha tal cual
+  - YYYY-MM-DD  -> ISO
+  - Month YYYY  -> primer día del mes (nombre en inglés, sin distinguir mayúsculas)
+Los campos de fecha repiten un conjunto muy pequeño de valores, así que el
+resultado se memoriza en una caché LRU acotada.
+"""
+
+import re
+from datetime import datetime
+from functools import lru_cache
+
+# Valores distintos memorizados como máximo
+DATE_CACHE_SIZE = 4096
+
+# Pivote de siglo para años de dos dígitos (igual que createDateConversion)
+YEAR_PIVOT = 25
+
+MONTHS = {
+    'january': 1, 'february': 2, 'march': 3, 'april': 4,
+    'may': 5, 'june': 6, 'july': 7, 'august': 8,
+    'september': 9, 'october': 10, 'november': 11, 'december': 12,
+}
+
+
+def _parse_dmy4(value):
+    return datetime(int(value[6:10]), int(value[3:5]), int(value[0:2]))
+
+
+def _parse_dmy2(value):
+    yy = int(value[6:8])
+    year = (1900 if yy > YEAR_PIVOT else 2000) + yy
+    return datetime(year, int(value[3:5]), int(value[0:2]))
+
+
+def _parse_iso(value):
+    return datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]))
+
+
+def _parse_month_year(value):
+    month, year = value.split(' ')
+    # mongosh usa enero para un mes desconocido; aquí se reporta como fallo
+    return datetime(int(year), MONTHS[month.lower()], 1)
+
+
+# (patrón, formato, conversor) en orden de prioridad
+DATE_PATTERNS = [
+    (re.compile(r'^\d{2}/\d{2}/\d{4}$'), 'DD/MM/YYYY', _parse_dmy4),
+    (re.compile(r'^\d{2}/\d{2}/\d{2}$'), 'DD/MM/YY', _parse_dmy2),
+    (re.compile(r'^\d{4}-\d{2}-\d{2}$'), 'YYYY-MM-DD (ISO)', _parse_iso),
+    (re.compile(r'^[A-Za-z]+ \d{4}$'), 'Month YYYY', _parse_month_year),
+    (re.compile(r'^\d{2}/\d{2}/\d{2,4}$'), 'DD/MM/YY(YY)', None),
+]
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _classify_string(value):
+    for pattern, formato, parser in DATE_PATTERNS:
+        if pattern.match(value):
+            try:
+                parsed = parser(value) if parser else None
+            except (ValueError, KeyError):
+                parsed = None
+            return formato, parsed
+
+    formato = f"otro: '{value[:20]}...'" if len(value) > 20 else f"otro: '{value}'"
+    return formato, None
+
+
+def classify_date(value):
+    """
+    Devuelve (formato, datetime) para un valor de fecha. El datetime es None
+    si el valor no se puede convertir (tipo no string, formato desconocido o
+    fecha inexistente como 31/02/2016).
+    """
+    if not isinstance(value, str):
+        return f"tipo_{type(value).__name__}", None
+    return _classify_string(value)
+
+
+def detect_date_format(date_value):
+    """Detecta el formato de una fecha"""
+    return classify_date(date_value)[0]
+
+
+def parse_date(date_value):
+    """Convierte una fecha de los volcados a datetime (None si no es posible)"""
+    return classify_date(date_value)[1]
+
+
+def date_cache_info():
+    """Estadísticas de la caché LRU (hits, misses, maxsize, currsize)"""
+    return _classify_string.cache_info()
+
+
+def clear_date_cache():
+    _classify_string.cache_clear()
@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Generador de volcados sintéticos
+Descripción: Aprende de los volcados existentes la estructura y la
+distribución de cada campo y genera volcados de cualquier tamaño en el
+mismo formato multi-objeto, para medir conversión, EDA, limpieza,
+reestructuración y consultas a 10x o 100x sin datos de producción.
+
+Lo que se aprende, campo a campo (las grafías de una misma clave, como
+'Viewing PCT' y 'viewingPct', se agrupan y se conserva su frecuencia):
+  - probabilidad de presencia y mezcla de tipos (Surname string, lista o null)
+  - valores frecuentes; si un campo tiene demasiados valores distintos
+    (emails, teléfonos, DNI...) solo se guarda su forma ('999-999-999')
+  - fechas: formato (DD/MM/YY, DD/MM/YYYY, ISO...) y rango de cada formato
+  - números: valores frecuentes o rango; longitudes de las listas
+
+Además se mantienen las entidades que el pipeline deduplica: cada cliente
+sintético (Client + contract) aparece en varias facturas como en los
+volcados reales, y cada visionado apunta a una película o serie del
+catálogo aprendido con sus Details completos, así el catálogo sigue siendo
+coherente. Los campos son independientes entre sí (las fechas de una
+factura no se correlacionan). El _id repetido aparece en la misma
+proporción que en los volcados.
+
+La salida es reproducible: cada archivo y cada cliente tienen su propia
+semilla derivada de --semilla, así el resultado no depende de --procesos.
+
+Uso:
+    python3 generar_dump.py --aprender ./datafiles --perfil perfil.pkl
+    python3 generar_dump.py --perfil perfil.pkl --documentos 1000000 --salida ./datafiles_sinteticos
+                            [--por-archivo 20000] [--semilla 42] [--procesos 4] [--factor-catalogo 10]
+"""
+
+import argparse
+import json
+import math
+import os
+import pickle
+import random
+import re
+import sys
+import time
+from bisect import bisect_right
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from functools import lru_cache
+
+from estadisticas import HyperLogLog
+from fechas import classify_date
+from lector_json import MappedDump
+
+# Valores distintos guardados por campo y tipo; por encima se usa la forma
+MAX_VALUES = 2000
+
+# Formas distintas guardadas por campo
+MAX_SHAPES = 500
+
+# Títulos distintos guardados por catálogo (películas, series)
+MAX_CATALOG = 50000
+
+# Documentos por archivo generado por defecto
+DEFAULT_PER_FILE = 20000
+
+# Pasos (primos) para recorrer los clientes en un orden disperso
+CLIENT_STEPS = (1000003, 1000033, 1000037)
+
+# _id recientes entre los que se elige uno repetido
+RECENT_IDS = 1000
+
+# Versión del formato del perfil guardado
+PROFILE_VERSION = 1
+
+# Campos de nivel superior con tratamiento propio (claves canónicas)
+ID_KEY = "id"                   # canonical_key("_id")
+CLIENT_KEYS = ("client", "contract")
+# Campo de cada entidad de cliente que se numera (único por cliente)
+SERIAL_KEYS = {"client": "customercode", "contract": "contractid"}
+# Listas de visionados y campos del catálogo que se copian juntos de un mismo título
+CATALOG_KEYS = {
+    "movies": ("title", "details"),
+    "series": ("title", "avgduration", "totalepisodes", "totalseasons"),
+}
+
+# Formatos de fecha que se pueden volver a escribir (los de fechas.DATE_PATTERNS)
+DATE_WRITERS = {
+    'DD/MM/YYYY': "%d/%m/%Y",
+    'DD/MM/YY': "%d/%m/%y",
+    'YYYY-MM-DD (ISO)': "%Y-%m-%d",
+}
+
+_DIGITS = re.compile(r'\d+')
+
+
+def canonical_key(key):
+    """'Viewing PCT', 'viewingPct' y 'viewing_pct' comparten clave canónica"""
+    return re.sub(r'[\s_\-]', '', str(key)).lower()
+
+
+def _type_tag(value):
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    if isinstance(value, dict):
+        return 'dict'
+    if isinstance(value, list):
+        return 'list'
+    return 'str'
+
+
+def string_shape(value):
+    """Dígitos -> 9, minúsculas -> a, mayúsculas -> A; el resto se conserva"""
+    return "".join('9' if c.isdigit() else 'a' if c.islower() else 'A' if c.isupper() else c
+                   for c in value)
+
+
+def fill_shape(shape, rng):
+    out = []
+    for c in shape:
+        if c == '9':
+            out.append(chr(48 + rng.randrange(10)))
+        elif c == 'a':
+            out.append(chr(97 + rng.randrange(26)))
+        elif c == 'A':
+            out.append(chr(65 + rng.randrange(26)))
+        else:
+            out.append(c)
+    return "".join(out)
+
+
+def serial_value(example, n):
+    """El ejemplo con su tramo de dígitos más largo sustituido por n ('AB000000' -> 'AB000123')"""
+    if not isinstance(example, str):
+        return n
+    runs = list(_DIGITS.finditer(example))
+    if not runs:
+        return f"{example}{n}"
+    run = max(runs, key=lambda m: len(m.group()))
+    return example[:run.start()] + str(n).zfill(len(run.group())) + example[run.end():]
+
+
+def _decimals(value):
+    text = repr(value)
+    return min(len(text.split('.')[1]), 4) if '.' in text and 'e' not in text else 0
+
+
+class _Sampler:
+    """Elección ponderada sobre un Counter (se construye una vez por campo)"""
+
+    __slots__ = ('population', 'cum_weights', 'total')
+
+    def __init__(self, counter):
+        self.population = list(counter)
+        self.cum_weights = []
+        self.total = 0
+        for value in self.population:
+            self.total += counter[value]
+            self.cum_weights.append(self.total)
+
+    def __call__(self, rng):
+        if len(self.population) == 1:
+            return self.population[0]
+        return self.population[bisect_right(self.cum_weights, rng.random() * self.total)]
+
+
+class KeyProfile:
+    """Una clave de un subdocumento: grafías vistas, veces presente y su campo"""
+
+    def __init__(self):
+        self.spellings = Counter()
+        self.present = 0
+        self.field = FieldProfile()
+
+
+class FieldProfile:
+    """
+    Distribución aprendida de un campo (y, recursivamente, de sus
+    subdocumentos y de los elementos de sus listas).
+    """
+
+    def __init__(self):
+        self.seen = 0
+        self.types = Counter()
+        self.values = {}            # tipo -> Counter de valores (hasta MAX_VALUES)
+        self.overflow = set()       # tipos con demasiados valores distintos
+        self.ranges = {}            # 'int'/'float' -> [mínimo, máximo]
+        self.decimals = 0
+        self.shapes = Counter()
+        self.example = None
+        self.dates = Counter()      # formato -> veces
+        self.date_ranges = {}       # formato -> [ordinal mínimo, ordinal máximo]
+        self.keys = {}              # clave canónica -> KeyProfile (en orden de aparición)
+        self.lengths = Counter()
+        self.item = None
+        self._samplers = {}
+
+    # --- aprendizaje ---
+
+    def observe(self, value):
+        self.seen += 1
+        tag = _type_tag(value)
+        self.types[tag] += 1
+        if tag == 'dict':
+            for key, child in value.items():
+                kp = self.keys.get(canonical_key(key))
+                if kp is None:
+                    kp = self.keys[canonical_key(key)] = KeyProfile()
+                kp.spellings[key] += 1
+                kp.present += 1
+                kp.field.observe(child)
+        elif tag == 'list':
+            self.lengths[len(value)] += 1
+            if self.item is None:
+                self.item = FieldProfile()
+            for child in value:
+                self.item.observe(child)
+        elif tag == 'str':
+            if self.example is None:
+                self.example = value
+            formato, parsed = classify_date(value)
+            if parsed is not None and formato in DATE_WRITERS:
+                self.dates[formato] += 1
+                ordinal = parsed.toordinal()
+                bounds = self.date_ranges.setdefault(formato, [ordinal, ordinal])
+                bounds[0], bounds[1] = min(bounds[0], ordinal), max(bounds[1], ordinal)
+                return
+            if len(self.shapes) < MAX_SHAPES or string_shape(value) in self.shapes:
+                self.shapes[string_shape(value)] += 1
+            self._count_value(tag, value)
+        elif tag in ('int', 'float'):
+            if self.example is None:
+                self.example = value
+            bounds = self.ranges.setdefault(tag, [value, value])
+            bounds[0], bounds[1] = min(bounds[0], value), max(bounds[1], value)
+            if tag == 'float':
+                self.decimals = max(self.decimals, _decimals(value))
+            self._count_value(tag, value)
+        elif tag == 'bool':
+            self._count_value(tag, value)
+
+    def _count_value(self, tag, value):
+        if tag in self.overflow:
+            return
+        counter = self.values.setdefault(tag, Counter())
+        if value in counter or len(counter) < MAX_VALUES:
+            counter[value] += 1
+        else:
+            # Campo de alta cardinalidad: se generará por forma o rango
+            self.overflow.add(tag)
+            del self.values[tag]
+
+    # --- generación ---
+
+    def _sampler(self, name, counter):
+        sampler = self._samplers.get(name)
+        if sampler is None:
+            sampler = self._samplers[name] = _Sampler(counter)
+        return sampler
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_samplers'] = {}
+        return state
+
+    def generate(self, rng):
+        if not self.types:
+            return None
+        tag = self._sampler('types', self.types)(rng)
+        if tag == 'null':
+            return None
+        if tag == 'dict':
+            return self.generate_dict(rng)
+        if tag == 'list':
+            n = self._sampler('lengths', self.lengths)(rng)
+            return [self.item.generate(rng) for _ in range(n)]
+        if tag == 'str':
+            return self._generate_string(rng)
+        if tag in self.values:
+            return self._sampler(tag, self.values[tag])(rng)
+        low, high = self.ranges.get(tag, (0, 0))
+        if tag == 'int':
+            return rng.randint(low, high)
+        if tag == 'float':
+            return round(rng.uniform(low, high), self.decimals)
+        return None
+
+    def generate_dict(self, rng, skip=()):
+        """Subdocumento con cada clave según su presencia y grafía aprendidas"""
+        out = {}
+        total = self.types['dict']
+        for canon, kp in self.keys.items():
+            if canon in skip or rng.random() * total >= kp.present:
+                continue
+            out[self.spelling(canon, rng)] = kp.field.generate(rng)
+        return out
+
+    def spelling(self, canon, rng):
+        return self._sampler(('spelling', canon), self.keys[canon].spellings)(rng)
+
+    def _generate_string(self, rng):
+        n_dates = sum(self.dates.values())
+        n_strings = self.types['str']
+        if n_dates and rng.random() * n_strings < n_dates:
+            formato = self._sampler('dates', self.dates)(rng)
+            low, high = self.date_ranges[formato]
+            return date.fromordinal(rng.randint(low, high)).strftime(DATE_WRITERS[formato])
+        if 'str' in self.values:
+            return self._sampler('str', self.values['str'])(rng)
+        if self.shapes:
+            return fill_shape(self._sampler('shapes', self.shapes)(rng), rng)
+        return ""
+
+
+class CatalogProfile:
+    """Títulos vistos de una lista de visionados y sus campos de catálogo"""
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.views = Counter()
+        self.entries = {}           # título normalizado -> {clave canónica: valor}
+        self.untitled = 0
+        self._total = None
+        self._sampler = None
+
+    def observe(self, items):
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            static = {}
+            for key, value in item.items():
+                canon = canonical_key(key)
+                if canon in self.fields and canon not in static and value not in (None, ""):
+                    static[canon] = value
+            title = static.get("title")
+            norm = str(title).strip().lower() if title is not None else ""
+            if not norm:
+                self.untitled += 1
+                continue
+            if norm in self.views or len(self.views) < MAX_CATALOG:
+                self.views[norm] += 1
+                self.entries.setdefault(norm, static)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_total'] = state['_sampler'] = None
+        return state
+
+    def pick(self, rng):
+        """Campos de catálogo de un título elegido según sus visionados (None = sin título)"""
+        if self._total is None:
+            self._total = sum(self.views.values())
+        if not self._total or rng.random() * (self._total + self.untitled) >= self._total:
+            return None
+        if self._sampler is None:
+            self._sampler = _Sampler(self.views)
+        return self.entries[self._sampler(rng)]
+
+
+class DumpProfile:
+    """Perfil completo aprendido de los volcados"""
+
+    def __init__(self):
+        self.version = PROFILE_VERSION
+        self.documents = 0
+        self.root = FieldProfile()
+        self.ids = HyperLogLog()
+        self.clients = HyperLogLog()
+        self.catalogs = {canon: CatalogProfile(fields) for canon, fields in CATALOG_KEYS.items()}
+
+    def observe(self, doc):
+        if not isinstance(doc, dict):
+            return
+        self.documents += 1
+        self.root.observe(doc)
+        for key, value in doc.items():
+            canon = canonical_key(key)
+            if canon == ID_KEY:
+                self.ids.add(str(value))
+            elif canon == "client" and isinstance(value, dict):
+                code = next((v for k, v in value.items() if canonical_key(k) == SERIAL_KEYS["client"]), None)
+                if code is not None:
+                    self.clients.add(str(code))
+            elif canon in self.catalogs and isinstance(value, list):
+                self.catalogs[canon].observe(value)
+
+    @property
+    def duplicate_ratio(self):
+        if not self.documents:
+            return 0.0
+        return max(0.0, 1.0 - min(self.ids.estimate(), self.documents) / self.documents)
+
+    @property
+    def invoices_per_client(self):
+        distinct = self.clients.estimate()
+        return max(1.0, self.documents / distinct) if distinct else 1.0
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        """El perfil usa pickle: solo debe cargarse desde un origen de confianza"""
+        with open(path, 'rb') as f:
+            profile = pickle.load(f)
+        if getattr(profile, 'version', None) != PROFILE_VERSION:
+            raise ValueError(f"perfil '{path}' de una versión no compatible")
+        return profile
+
+
+def learn(directory):
+    """Recorre todos los volcados de directory y devuelve su DumpProfile"""
+    profile = DumpProfile()
+    for filename in sorted(f for f in os.listdir(directory) if f.endswith('.json')):
+        for doc in MappedDump(os.path.join(directory, filename)):
+            profile.observe(doc)
+    return profile
+
+
+class DumpGenerator:
+    """Genera documentos sintéticos a partir de un DumpProfile"""
+
+    def __init__(self, profile, seed=0, total_documents=0, catalog_factor=1):
+        self.profile = profile
+        self.seed = seed
+        self.catalog_factor = max(1, catalog_factor)
+        self.invoices_per_client = profile.invoices_per_client
+        self.n_clients = max(1, math.ceil(max(total_documents, 1) / self.invoices_per_client))
+        # Paso coprimo con n_clients: reparte las facturas de cada cliente por todos los archivos
+        self.client_step = next(p for p in CLIENT_STEPS if self.n_clients % p)
+        self.duplicate_ratio = profile.duplicate_ratio
+        root = profile.root
+        self.id_example = root.keys[ID_KEY].field.example if ID_KEY in root.keys else None
+        self.client = lru_cache(maxsize=65536)(self._client)
+
+    def _client(self, number):
+        """Client y contract del cliente number (misma semilla -> mismos datos)"""
+        rng = random.Random(f"{self.seed}:cliente:{number}")
+        entity = {}
+        for canon in CLIENT_KEYS:
+            kp = self.profile.root.keys.get(canon)
+            if kp is None:
+                continue
+            value = kp.field.generate(rng)
+            serial = SERIAL_KEYS.get(canon)
+            if isinstance(value, dict) and serial in kp.field.keys:
+                example = kp.field.keys[serial].field.example
+                for key in value:
+                    if canonical_key(key) == serial:
+                        value[key] = serial_value(example, number)
+            entity[canon] = value
+        return entity
+
+    def _views(self, canon, field, rng):
+        """Lista de visionados: campos de catálogo de un título y el resto generados"""
+        if not field.types:
+            return None
+        tag = field._sampler('types', field.types)(rng)
+        if tag != 'list' or field.item is None:
+            return field.generate(rng)
+        catalog = self.profile.catalogs[canon]
+        item_field = field.item
+        items = []
+        for _ in range(field._sampler('lengths', field.lengths)(rng)):
+            entry = catalog.pick(rng)
+            if entry is None or item_field.types['dict'] == 0:
+                items.append(item_field.generate(rng))
+                continue
+            variant = rng.randrange(self.catalog_factor)
+            item = {}
+            total = item_field.types['dict']
+            for ic, ikp in item_field.keys.items():
+                if ic in entry:
+                    value = entry[ic]
+                    if ic == "title" and variant:
+                        value = f"{value} {variant + 1}"
+                    item[item_field.spelling(ic, rng)] = value
+                elif ic not in catalog.fields and rng.random() * total < ikp.present:
+                    item[item_field.spelling(ic, rng)] = ikp.field.generate(rng)
+            items.append(item)
+        return items
+
+    def document(self, index, rng, recent_ids):
+        root = self.profile.root
+        client = None
+        doc = {}
+        total = root.types['dict']
+        for canon, kp in root.keys.items():
+            if rng.random() * total >= kp.present:
+                continue
+            key = root.spelling(canon, rng)
+            if canon == ID_KEY:
+                if recent_ids and rng.random() < self.duplicate_ratio:
+                    value = rng.choice(recent_ids)
+                else:
+                    value = serial_value(self.id_example, index)
+                    recent_ids.append(value)
+            elif canon in CLIENT_KEYS:
+                if client is None:
+                    number = int(index / self.invoices_per_client) * self.client_step % self.n_clients
+                    client = self.client(number)
+                value = client.get(canon)
+            elif canon in self.profile.catalogs:
+                value = self._views(canon, kp.field, rng)
+            else:
+                value = kp.field.generate(rng)
+            doc[key] = value
+        return doc
+
+    def write_file(self, path, file_number, start, count, compact=False):
+        """Escribe count documentos (índices start...) en el formato multi-objeto"""
+        rng = random.Random(f"{self.seed}:archivo:{file_number}")
+        recent_ids = deque(maxlen=RECENT_IDS)
+        indent = None if compact else 4
+        with open(path, 'w', encoding='utf-8') as f:
+            for index in range(start, start + count):
+                f.write(json.dumps(self.document(index, rng, recent_ids), ensure_ascii=False, indent=indent))
+                f.write('\n')
+        return count
+
+
+def _write_job(profile_path, seed, total, catalog_factor, path, file_number, start, count, compact):
+    generator = DumpGenerator(DumpProfile.load(profile_path), seed, total, catalog_factor)
+    return generator.write_file(path, file_number, start, count, compact)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera volcados sintéticos con la distribución de los reales")
+    parser.add_argument('--aprender', default=None, metavar='DIRECTORIO',
+                        help="directorio de volcados del que aprender el perfil")
+    parser.add_argument('--perfil', default="perfil_volcados.pkl",
+                        help="perfil aprendido: se guarda con --aprender y se lee si no (por defecto: %(default)s)")
+    parser.add_argument('--documentos', type=int, default=0, help="documentos a generar (0 = solo aprender)")
+    parser.add_argument('--salida', default="./datafiles_sinteticos",
+                        help="directorio de los volcados generados (por defecto: %(default)s)")
+    parser.add_argument('--por-archivo', type=int, default=DEFAULT_PER_FILE,
+                        help="documentos por archivo (por defecto: %(default)s)")
+    parser.add_argument('--semilla', type=int, default=42, help="semilla (por defecto: %(default)s)")
+    parser.add_argument('--procesos', type=int, default=1,
+                        help="procesos que escriben archivos en paralelo (0 = todos los núcleos)")
+    parser.add_argument('--factor-catalogo', type=int, default=1,
+                        help="multiplica los títulos del catálogo con variantes numeradas (por defecto: %(default)s)")
+    parser.add_argument('--compacto', action='store_true',
+                        help="un objeto por línea en lugar de indentado (más rápido de escribir y leer)")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    if args.aprender:
+        if not os.path.isdir(args.aprender):
+            print(f"❌ No existe el directorio '{args.aprender}'")
+            sys.exit(1)
+        print(f"📖 Aprendiendo de '{args.aprender}'...")
+        profile = learn(args.aprender)
+        profile.save(args.perfil)
+        print(f"   Documentos: {profile.documents}")
+        print(f"   Clientes distintos (estimados): {profile.clients.estimate():.0f}"
+              f" ({profile.invoices_per_client:.1f} facturas por cliente)")
+        print(f"   _id repetidos: {profile.duplicate_ratio:.2%}")
+        for canon, catalog in profile.catalogs.items():
+            print(f"   Catálogo '{canon}': {len(catalog.views)} títulos")
+        print(f"💾 Perfil guardado en '{args.perfil}'")
+    else:
+        try:
+            profile = DumpProfile.load(args.perfil)
+        except (OSError, ValueError, pickle.UnpicklingError) as e:
+            print(f"❌ No se pudo leer el perfil: {e}")
+            sys.exit(1)
+
+    if args.documentos <= 0:
+        return
+    if not profile.documents:
+        print("❌ El perfil no contiene documentos")
+        sys.exit(1)
+
+    os.makedirs(args.salida, exist_ok=True)
+    per_file = max(1, args.por_archivo)
+    jobs = []
+    for file_number, start in enumerate(range(0, args.documentos, per_file)):
+        count = min(per_file, args.documentos - start)
+        jobs.append((os.path.join(args.salida, f"sintetico{file_number:04d}.json"), file_number, start, count))
+    workers = min(args.procesos if args.procesos > 0 else (os.cpu_count() or 1), len(jobs))
+    print(f"\n⚙️  Generando {args.documentos} documentos en {len(jobs)} archivos "
+          f"(semilla {args.semilla}, {workers} procesos)")
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_write_job, args.perfil, args.semilla, args.documentos, args.factor_catalogo,
+                                   path, file_number, start, count, args.compacto): path
+                       for path, file_number, start, count in jobs}
+            for done, future in enumerate(as_completed(futures), 1):
+                future.result()
+                print(f"   [{done}/{len(jobs)}] ✓ {os.path.basename(futures[future])}")
+    else:
+        generator = DumpGenerator(profile, args.semilla, args.documentos, args.factor_catalogo)
+        for done, (path, file_number, start, count) in enumerate(jobs, 1):
+            generator.write_file(path, file_number, start, count, args.compacto)
+            print(f"   [{done}/{len(jobs)}] ✓ {os.path.basename(path)}")
+
+    print(f"\n✅ Volcados en '{args.salida}' ({time.perf_counter() - start_time:.1f} s)")
+
+
+if __name__ == "__main__":
+    # El perfil se guarda con pickle: sus clases deben ser las de generar_dump, no las de __main__
+    from generar_dump import main
+    main()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lector en streaming para los volcados con múltiples objetos JSON
+Descripción: Localiza los límites de cada objeto sobre los bytes crudos del
+archivo (leído por bloques de tamaño fijo) y decodifica solo ese fragmento.
+Los objetos que no se pueden parsear se reportan con su offset en bytes.
+"""
+
+import codecs
+import json
+import mmap
+import os
+import re
+from collections import namedtuple
+
+import backend_json
+
+# Tamaño de bloque de lectura por defecto (1 MiB)
+CHUNK_SIZE = 1 << 20
+
+# Bytes iniciales usados para detectar el encoding (64 KiB)
+ENCODING_SAMPLE = 1 << 16
+
+# Encodings alternativos si un objeto no es UTF-8 válido (latin-1 nunca falla)
+FALLBACK_ENCODINGS = ('cp1252', 'latin-1')
+
+# Token del escáner: string JSON completo, comilla sin cerrar o llave.
+# Las llaves y comillas son ASCII, así que el escaneo sobre bytes es válido
+# para UTF-8, latin-1 y windows-1252.
+_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|"|[{}]', re.S)
+_QUOTE = ord('"')
+_OPEN = ord('{')
+_WHITESPACE = frozenset(b' \t\r\n')
+
+# Bytes que se examinan primero al buscar el final de un objeto (object_at)
+OBJECT_WINDOW = 1 << 10
+
+_decoder = json.JSONDecoder()
+
+# Objeto que no se pudo decodificar: offset en bytes, longitud y motivo
+MalformedObject = namedtuple('MalformedObject', ['offset', 'length', 'message'])
+
+
+class _ObjectScanner:
+    """
+    Escáner incremental de objetos JSON de nivel superior.
+    Conserva el estado (profundidad, inicio del objeto actual) entre bloques
+    para que cada byte se examine una sola vez.
+    """
+
+    def __init__(self):
+        self.pos = 0
+        self.depth = 0
+        self.start = None
+
+    def scan(self, buf, end=None):
+        """
+        Recorre buf desde la última posición y devuelve la lista de
+        (inicio, fin) de los objetos completos encontrados.
+        Se detiene ante un string sin cerrar, que requiere más datos.
+        """
+        spans = []
+        end = len(buf) if end is None else end
+        for m in _TOKEN.finditer(buf, self.pos, end):
+            first = buf[m.start()]
+            if first == _QUOTE:
+                if m.end() - m.start() == 1:
+                    # String sin cerrar: reanudar desde la comilla
+                    self.pos = m.start()
+                    return spans
+                continue
+            if first == _OPEN:
+                if self.depth == 0:
+                    self.start = m.start()
+                self.depth += 1
+            elif self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    spans.append((self.start, m.end()))
+                    self.start = None
+        self.pos = end
+        return spans
+
+    def shift(self, n):
+        """Ajusta las posiciones tras descartar n bytes del inicio del buffer"""
+        self.pos -= n
+        if self.start is not None:
+            self.start -= n
+
+
+def _skip_whitespace(buf, pos):
+    while pos < len(buf) and buf[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+def _iter_objects(buf, start, window):
+    """
+    (inicio, fin) de los objetos completos a partir de start. Se examinan
+    window bytes y después el doble cada vez (hasta CHUNK_SIZE), así el
+    primer objeto no obliga a recorrer mucho más allá de su final.
+    """
+    scanner = _ObjectScanner()
+    scanner.pos = start
+    end = start
+    while end < len(buf):
+        end = min(len(buf), end + window)
+        window = min(window * 2, CHUNK_SIZE)
+        yield from scanner.scan(buf, end)
+
+
+def object_at(buf, offset, window=OBJECT_WINDOW):
+    """
+    Localiza el objeto de nivel superior al que pertenece el byte offset:
+    desde su inicio hasta el inicio del siguiente (los separadores cuentan
+    para el objeto anterior). Devuelve (inicio, fin, siguiente), con fin None
+    si el objeto está truncado, o None si offset queda antes del primer
+    objeto. Se resincroniza buscando hacia atrás una llave al principio de
+    línea y comprobando que tras el objeto venga otra llave o el final del
+    archivo (un elemento de una lista iría seguido de ',' o ']'); después se
+    avanza objeto a objeto, así que también funciona con varios objetos en
+    la misma línea, aunque más despacio.
+    """
+    first = _skip_whitespace(buf, 0)
+    if offset < first:
+        return None
+    candidate = buf.rfind(b'\n{', 0, offset + 1)
+    while True:
+        start = candidate + 1 if candidate >= 0 else first
+        objects = _iter_objects(buf, start, window)
+        span = next(objects, None)
+        if span is None:
+            return start, None, len(buf)
+        nxt = _skip_whitespace(buf, span[1])
+        if nxt < len(buf) and buf[nxt] != _OPEN and candidate >= 0:
+            # No era un objeto de nivel superior: probar la llave anterior
+            candidate = buf.rfind(b'\n{', 0, candidate)
+            continue
+        break
+    # Desde un objeto de nivel superior se avanza hasta el que contiene offset
+    while nxt <= offset and nxt < len(buf):
+        following = next(objects, None)
+        if following is None:
+            return nxt, None, len(buf)
+        span = following
+        nxt = _skip_whitespace(buf, span[1])
+    return span[0], span[1], nxt
+
+
+def _decode_text(text):
+    """Decodifica con json el texto de un único objeto (ruta de referencia)"""
+    obj, end = _decoder.raw_decode(text)
+    if end != len(text):
+        raise json.JSONDecodeError("Datos extra tras el objeto", text, end)
+    return obj
+
+
+def decode_object(raw, encoding='utf-8', errors='replace'):
+    """Decodifica el fragmento de bytes de un único objeto JSON"""
+    if encoding == 'utf-8':
+        # El backend rápido lee los bytes UTF-8 directamente; si no puede
+        # (bytes no UTF-8, caso dudoso) se decodifica como hasta ahora
+        return backend_json.loads(raw, lambda data: _decode_text(data.decode(encoding, errors)))
+    return _decode_text(raw.decode(encoding, errors))
+
+
+def iter_documents_in_buffer(buf, encoding='utf-8', errors='replace', malformed=None, base_offset=0):
+    """
+    Genera (offset, documento) para cada objeto de un buffer completo
+    (bytes, bytearray o mmap). Los objetos inválidos o truncados se añaden
+    a la lista malformed si se proporciona.
+    """
+    scanner = _ObjectScanner()
+    for start, end in scanner.scan(buf):
+        try:
+            yield base_offset + start, decode_object(buf[start:end], encoding, errors)
+        except ValueError as e:
+            if malformed is not None:
+                malformed.append(MalformedObject(base_offset + start, end - start, str(e)))
+
+    if scanner.start is not None and malformed is not None:
+        length = len(buf) - scanner.start
+        malformed.append(MalformedObject(base_offset + scanner.start, length, "Objeto truncado al final del archivo"))
+
+
+def iter_documents_with_offsets(path, chunk_size=CHUNK_SIZE, encoding='utf-8', errors='replace', malformed=None):
+    """
+    Lee el archivo por bloques de chunk_size bytes y genera (offset, documento)
+    para cada objeto JSON de nivel superior. La memoria usada queda acotada
+    por el tamaño del bloque más el del objeto más grande.
+    """
+    scanner = _ObjectScanner()
+    buf = bytearray()
+    base = 0
+
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if chunk:
+                buf += chunk
+
+            for start, end in scanner.scan(buf):
+                try:
+                    yield base + start, decode_object(buf[start:end], encoding, errors)
+                except ValueError as e:
+                    if malformed is not None:
+                        malformed.append(MalformedObject(base + start, end - start, str(e)))
+
+            if not chunk:
+                break
+
+            # Descartar lo ya procesado y el ruido entre objetos
+            consumed = scanner.pos if scanner.start is None else scanner.start
+            if consumed:
+                del buf[:consumed]
+                scanner.shift(consumed)
+                base += consumed
+
+    if scanner.start is not None and malformed is not None:
+        length = len(buf) - scanner.start
+        malformed.append(MalformedObject(base + scanner.start, length, "Objeto truncado al final del archivo"))
+
+
+def iter_json_documents(path, chunk_size=CHUNK_SIZE, encoding='utf-8', errors='replace', malformed=None):
+    """Genera los documentos de un volcado multi-objeto en streaming"""
+    for _, doc in iter_documents_with_offsets(path, chunk_size, encoding, errors, malformed):
+        yield doc
+
+
+def detect_encoding(sample):
+    """
+    Detecta el encoding a partir de una muestra de bytes del inicio del archivo:
+    BOM de UTF-8, validez UTF-8 o, si no, el primer encoding alternativo válido.
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8'
+    try:
+        # final=False: tolera una secuencia multibyte cortada al final de la muestra
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        pass
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            sample.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return FALLBACK_ENCODINGS[-1]
+
+
+class MappedDump:
+    """
+    Volcado multi-objeto mapeado en memoria. Detecta el encoding una sola vez,
+    localiza los objetos sobre los bytes y decodifica solo cada fragmento.
+    Tras recorrerlo quedan disponibles el encoding usado, los objetos que
+    necesitaron un encoding alternativo y los objetos inválidos.
+    """
+
+    def __init__(self, path, sample_size=ENCODING_SAMPLE):
+        self.path = path
+        self.sample_size = sample_size
+        self.encoding = None
+        self.fallback_objects = 0
+        self.fallback_encodings = set()
+        self.malformed = []
+
+    @property
+    def needed_fallback(self):
+        """True si el archivo no se pudo leer entero como UTF-8"""
+        return self.encoding != 'utf-8' or self.fallback_objects > 0
+
+    def _decode(self, raw):
+        try:
+            return raw.decode(self.encoding)
+        except UnicodeDecodeError:
+            pass
+        self.fallback_objects += 1
+        for encoding in FALLBACK_ENCODINGS:
+            try:
+                text = raw.decode(encoding)
+                self.fallback_encodings.add(encoding)
+                return text
+            except UnicodeDecodeError:
+                continue
+
+    def iter_documents_with_offsets(self):
+        """Genera (offset, documento) para cada objeto del archivo"""
+        if os.path.getsize(self.path) == 0:
+            self.encoding = 'utf-8'
+            return
+
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            self.encoding = detect_encoding(mm[:self.sample_size])
+
+            def reference(raw):
+                return _decode_text(self._decode(raw))
+
+            # Si el backend rápido acepta los bytes es que eran UTF-8 válido,
+            # así que el resultado coincide con el de la ruta de referencia
+            utf8 = self.encoding == 'utf-8'
+            scanner = _ObjectScanner()
+            for start, end in scanner.scan(mm):
+                try:
+                    raw = mm[start:end]
+                    if utf8:
+                        obj = backend_json.loads(raw, reference)
+                    else:
+                        obj = reference(raw)
+                    yield start, obj
+                except ValueError as e:
+                    self.malformed.append(MalformedObject(start, end - start, str(e)))
+
+            if scanner.start is not None:
+                length = len(mm) - scanner.start
+                self.malformed.append(MalformedObject(scanner.start, length, "Objeto truncado al final del archivo"))
+
+    def __iter__(self):
+        for _, doc in self.iter_documents_with_offsets():
+            yield doc
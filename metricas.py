@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Métricas por fase de los scripts de migración
+Descripción: Metrics mide cada fase (carga, cada análisis, extracción de
+catálogos, reestructuración, índices...) con su tiempo, documentos,
+documentos/s, bytes leídos y escritos y el pico de memoria residente (RSS).
+También guarda contadores e histogramas, como la latencia de cada lote de
+escritura de escritor_bulk.BulkWriter. El resumen se exporta como JSON y como
+fichero de texto de Prometheus (para el textfile collector de node_exporter).
+
+Con profile_dir cada fase de primer nivel se ejecuta bajo cProfile y
+tracemalloc, y solo se guardan los datos de la más lenta:
+    <fase>.prof          abrir con: python3 -m pstats <fase>.prof
+    <fase>_memoria.txt   memoria reservada por línea al terminar la fase
+cProfile solo ve el hilo principal: los hilos de BulkWriter no aparecen.
+"""
+
+import cProfile
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # resource no existe en Windows: sin pico de RSS
+    resource = None
+
+# Límites superiores (segundos) de los buckets de latencia, como los de Prometheus
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Prefijo de las métricas exportadas a Prometheus
+PROMETHEUS_PREFIX = "migracion"
+
+# Descripción (HELP) de los contadores e histogramas conocidos; el resto usa su nombre
+DESCRIPTIONS = {
+    "batch_write_seconds": "Segundos por lote de escritura en bloque, reintentos incluidos",
+}
+
+# Marcos de pila que guarda tracemalloc por reserva, y líneas del informe de memoria
+TRACEMALLOC_FRAMES = 5
+MEMORY_TOP = 30
+
+
+def peak_rss(children=False):
+    """Pico de memoria residente en bytes del proceso (o de sus hijos); 0 si no se puede medir"""
+    if resource is None:
+        return 0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss viene en KB en Linux y en bytes en macOS
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+class Histogram:
+    """
+    Histograma de buckets fijos (acumulables, como los de Prometheus). Se
+    puede enviar a otro proceso y combinar con merge(), así los escritores
+    del modo --workers suman sus latencias a las del proceso principal.
+    """
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.bounds) and value > self.bounds[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        if other.bounds != self.bounds:
+            raise ValueError("Histogramas con buckets distintos")
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """Límite superior del bucket que contiene el cuantil q (el máximo en el último)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "max": round(self.max, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": {str(bound): n for bound, n in zip(self.bounds, self.counts)},
+            "overflow": self.counts[-1],
+        }
+
+
+class Phase:
+    """Totales de una fase (se acumulan si la fase se ejecuta varias veces)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.docs = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.rss_peak = 0
+
+    @property
+    def docs_per_sec(self):
+        return self.docs / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            "phase": self.name,
+            "calls": self.calls,
+            "seconds": round(self.seconds, 6),
+            "docs": self.docs,
+            "docsPerSec": round(self.docs_per_sec, 1),
+            "bytesRead": self.bytes_read,
+            "bytesWritten": self.bytes_written,
+            "rssPeakBytes": self.rss_peak,
+        }
+
+
+class Metrics:
+    """
+    Registro de métricas de una ejecución.
+
+        metrics = Metrics("reestructuracion")
+        with metrics.phase("restructure"):
+            ...
+            metrics.add(docs=processed, bytes_written=writer.bytes)
+        metrics.write_json("metricas.json")
+
+    add() suma a la fase en curso (la más interna), así cada método informa
+    de lo que ha procesado sin saber en qué fase se le llama. observe() y
+    count() se pueden llamar desde varios hilos.
+    """
+
+    def __init__(self, script, profile_dir=None):
+        self.script = script
+        self.profile_dir = profile_dir
+        self.phases = {}
+        self.counters = Counter()
+        self.histograms = {}
+        self.started = datetime.now()
+        self._start = time.perf_counter()
+        self._stack = []
+        self._lock = threading.Lock()
+        # (segundos, fase, cProfile.Profile, snapshot de tracemalloc, pico de tracemalloc)
+        self._slowest = None
+
+    def _phase(self, name):
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = Phase(name)
+        return phase
+
+    @contextmanager
+    def phase(self, name):
+        """Mide el bloque como la fase name"""
+        phase = self._phase(name)
+        # Solo se perfilan las fases de primer nivel: cProfile no admite dos perfiles activos
+        profiler = None
+        if self.profile_dir is not None and not self._stack:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            profiler = cProfile.Profile()
+            profiler.enable()
+        self._stack.append(phase)
+        start = time.perf_counter()
+        try:
+            yield phase
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            if profiler is not None:
+                profiler.disable()
+                _, traced_peak = tracemalloc.get_traced_memory()
+                if self._slowest is None or elapsed > self._slowest[0]:
+                    self._slowest = (elapsed, name, profiler, tracemalloc.take_snapshot(), traced_peak)
+                tracemalloc.stop()
+            phase.calls += 1
+            phase.seconds += elapsed
+            phase.rss_peak = max(phase.rss_peak, peak_rss())
+
+    def add(self, docs=0, bytes_read=0, bytes_written=0):
+        """Suma documentos y bytes a la fase en curso (nada si no hay ninguna)"""
+        if not self._stack:
+            return
+        phase = self._stack[-1]
+        phase.docs += docs
+        phase.bytes_read += bytes_read
+        phase.bytes_written += bytes_written
+
+    def record(self, name, seconds, docs=0, bytes_read=0, bytes_written=0):
+        """Registra una fase medida fuera (p. ej. en los procesos de un pool)"""
+        phase = self._phase(name)
+        phase.calls += 1
+        phase.seconds += seconds
+        phase.docs += docs
+        phase.bytes_read += bytes_read
+        phase.bytes_written += bytes_written
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def observe(self, name, value):
+        with self._lock:
+            self._histogram(name).observe(value)
+
+    def merge_histogram(self, name, histogram):
+        with self._lock:
+            self._histogram(name, histogram.bounds).merge(histogram)
+
+    def _histogram(self, name, bounds=LATENCY_BUCKETS):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(bounds)
+        return histogram
+
+    # ------------------------------------------------------------------
+    # Exportación
+    # ------------------------------------------------------------------
+
+    def summary(self):
+        slowest = max(self.phases.values(), key=lambda p: p.seconds, default=None)
+        return {
+            "meta": {
+                "script": self.script,
+                "fecha": self.started.isoformat(timespec="seconds"),
+                "pid": os.getpid(),
+            },
+            "seconds": round(time.perf_counter() - self._start, 6),
+            "rssPeakBytes": peak_rss(),
+            "rssPeakChildrenBytes": peak_rss(children=True),
+            "slowestPhase": slowest.name if slowest else None,
+            "phases": [phase.to_dict() for phase in self.phases.values()],
+            "counters": dict(self.counters),
+            "histograms": {name: h.to_dict() for name, h in self.histograms.items()},
+        }
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2, ensure_ascii=False)
+
+    def prometheus_text(self):
+        """Resumen en el formato de texto de Prometheus (una muestra por fase y métrica)"""
+        summary = self.summary()
+        script = _label(self.script)
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            name = f"{PROMETHEUS_PREFIX}_{name}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                labels = ",".join([f'script="{script}"'] + [f'{k}="{_label(v)}"' for k, v in labels])
+                lines.append(f"{name}{suffix}{{{labels}}} {value}")
+
+        phases = summary["phases"]
+        metric("phase_seconds", "gauge", "Segundos por fase",
+               [("", [("phase", p["phase"])], p["seconds"]) for p in phases])
+        metric("phase_docs", "gauge", "Documentos procesados por fase",
+               [("", [("phase", p["phase"])], p["docs"]) for p in phases])
+        metric("phase_docs_per_second", "gauge", "Documentos por segundo en cada fase",
+               [("", [("phase", p["phase"])], p["docsPerSec"]) for p in phases])
+        metric("phase_read_bytes", "gauge", "Bytes leídos por fase",
+               [("", [("phase", p["phase"])], p["bytesRead"]) for p in phases])
+        metric("phase_written_bytes", "gauge", "Bytes escritos por fase",
+               [("", [("phase", p["phase"])], p["bytesWritten"]) for p in phases])
+        metric("phase_rss_peak_bytes", "gauge", "Pico de memoria residente al terminar la fase",
+               [("", [("phase", p["phase"])], p["rssPeakBytes"]) for p in phases])
+        metric("rss_peak_bytes", "gauge", "Pico de memoria residente del proceso y de sus hijos",
+               [("", [("process", "self")], summary["rssPeakBytes"]),
+                ("", [("process", "children")], summary["rssPeakChildrenBytes"])])
+        metric("run_seconds", "gauge", "Duración de la ejecución", [("", [], summary["seconds"])])
+
+        for name, value in sorted(self.counters.items()):
+            metric(f"{_metric_name(name)}_total", "counter", DESCRIPTIONS.get(name, name), [("", [], value)])
+
+        for name, histogram in sorted(self.histograms.items()):
+            samples = []
+            cumulative = 0
+            for bound, n in zip(histogram.bounds, histogram.counts):
+                cumulative += n
+                samples.append(("_bucket", [("le", repr(float(bound)))], cumulative))
+            samples.append(("_bucket", [("le", "+Inf")], histogram.count))
+            samples.append(("_sum", [], round(histogram.sum, 6)))
+            samples.append(("_count", [], histogram.count))
+            metric(_metric_name(name), "histogram", DESCRIPTIONS.get(name, name), samples)
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Escritura atómica: el collector nunca lee un fichero a medias
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+    def write_profile(self):
+        """Guarda cProfile y tracemalloc de la fase más lenta; devuelve (fase, rutas) o None"""
+        if self.profile_dir is None or self._slowest is None:
+            return None
+        seconds, name, profiler, snapshot, traced_peak = self._slowest
+        os.makedirs(self.profile_dir, exist_ok=True)
+        base = os.path.join(self.profile_dir, _metric_name(name))
+        profiler.dump_stats(f"{base}.prof")
+        stats = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        )).statistics("lineno")
+        with open(f"{base}_memoria.txt", "w", encoding="utf-8") as f:
+            f.write(f"Fase: {name} ({seconds:.2f} s)\n")
+            f.write(f"Pico de memoria trazada: {traced_peak / 1024 / 1024:.1f} MB\n")
+            f.write(f"Reservada al terminar: {sum(s.size for s in stats) / 1024 / 1024:.1f} MB\n\n")
+            for stat in stats[:MEMORY_TOP]:
+                f.write(f"{stat}\n")
+        return name, [f"{base}.prof", f"{base}_memoria.txt"]
+
+    def print_summary(self):
+        print("\nMÉTRICAS POR FASE")
+        print("-" * 80)
+        print(f"   {'Fase':<30} {'Segundos':>9} {'Docs':>10} {'Docs/s':>10} {'Leído MB':>9} {'RSS MB':>8}")
+        for phase in self.phases.values():
+            print(f"   {phase.name:<30} {phase.seconds:>9.2f} {phase.docs:>10} {phase.docs_per_sec:>10.0f} "
+                  f"{phase.bytes_read / 1024 / 1024:>9.1f} {phase.rss_peak / 1024 / 1024:>8.0f}")
+        for name, histogram in self.histograms.items():
+            print(f"   {name}: {histogram.count} muestras, p50 {histogram.quantile(0.5) * 1000:.1f} ms, "
+                  f"p99 {histogram.quantile(0.99) * 1000:.1f} ms, máx {histogram.max * 1000:.1f} ms")
+
+    def export(self, json_path=None, prometheus_path=None):
+        """Imprime el resumen y escribe los ficheros pedidos (--metricas, --metricas-prom, --perfilar)"""
+        self.print_summary()
+        if json_path:
+            self.write_json(json_path)
+            print(f"   Métricas guardadas en {json_path}")
+        if prometheus_path:
+            self.write_prometheus(prometheus_path)
+            print(f"   Métricas de Prometheus guardadas en {prometheus_path}")
+        profiled = self.write_profile()
+        if profiled:
+            name, paths = profiled
+            print(f"   Perfil de la fase más lenta ('{name}'): {', '.join(paths)}")
+
+
+def _metric_name(name):
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def add_metrics_arguments(parser):
+    """Opciones comunes de métricas y perfilado de los scripts"""
+    parser.add_argument('--metricas', metavar='FICHERO', default=None,
+                        help="guardar las métricas por fase en JSON")
+    parser.add_argument('--metricas-prom', metavar='FICHERO', default=None,
+                        help="guardar las métricas en formato de texto de Prometheus (.prom)")
+    parser.add_argument('--perfilar', metavar='DIRECTORIO', default=None,
+                        help="perfilar con cProfile y tracemalloc y guardar los datos de la fase más lenta")
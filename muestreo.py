@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Análisis exploratorio aproximado por muestreo
+Descripción: En lugar de parsear todos los volcados, elige offsets de bytes
+al azar (uniformes sobre el tamaño total), se resincroniza en el límite del
+objeto que contiene cada offset (lector_json.object_at) y decodifica solo
+ese objeto. Un objeto sale elegido con probabilidad proporcional a los
+bytes que ocupa, así que cada muestra se pondera por la inversa de esa
+probabilidad (estimador de Hansen-Hurwitz, con reemplazo). Los conteos
+(ausentes, formatos de fecha, tipos mixtos, TOTAL negativo o cero...) se
+extrapolan al total con su intervalo de confianza.
+
+Los _id duplicados y los valores distintos no se pueden estimar así: para
+eso hace falta el análisis completo.
+"""
+
+import math
+import mmap
+import os
+import random
+import time
+from bisect import bisect_right
+from collections import Counter, namedtuple
+from statistics import NormalDist
+
+from analizadores import DateAnalyzer, NumericAnalyzer
+from fechas import classify_date
+from lector_json import ENCODING_SAMPLE, FALLBACK_ENCODINGS, decode_object, detect_encoding, object_at
+
+# Nivel de confianza por defecto de los intervalos
+DEFAULT_CONFIDENCE = 0.95
+
+# Muestras mínimas con --muestra FRACCION (por debajo la varianza no es fiable)
+MIN_DRAWS = 30
+
+# Conteo estimado con su intervalo de confianza
+Estimate = namedtuple('Estimate', ['value', 'low', 'high'])
+
+
+class SampledDump:
+    """Volcado mapeado en memoria del que se extraen objetos por offset"""
+
+    def __init__(self, path):
+        self.path = path
+        self.size = os.path.getsize(path)
+        self._file = open(path, 'rb')
+        self.buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b''
+        self.encoding = detect_encoding(self.buf[:ENCODING_SAMPLE])
+        # Los bytes anteriores al primer objeto no pertenecen a ninguno
+        head = self.buf[:ENCODING_SAMPLE]
+        self.first = len(head) - len(head.lstrip()) if head.strip() else self.size
+
+    @property
+    def sampled_bytes(self):
+        """Bytes que reparten los objetos (del primero al final del archivo)"""
+        return self.size - self.first
+
+    def document_at(self, offset):
+        """
+        Devuelve (inicio, bytes, documento) del objeto que contiene offset.
+        bytes va hasta el inicio del siguiente objeto; documento es None si
+        el objeto está truncado o no es JSON válido.
+        """
+        start, end, nxt = object_at(self.buf, offset)
+        doc = None
+        if end is not None:
+            raw = self.buf[start:end]
+            for encoding in (self.encoding,) + FALLBACK_ENCODINGS:
+                try:
+                    doc = decode_object(raw, encoding, 'strict')
+                    break
+                except UnicodeDecodeError:
+                    continue
+                except ValueError:
+                    break
+        return start, nxt - start, doc
+
+    def close(self):
+        if self.size:
+            self.buf.close()
+        self._file.close()
+
+
+def document_features(doc):
+    """
+    Indicadores de un documento muestreado (clave -> valor). Son los mismos
+    conteos que hacen los acumuladores de analizadores.py, pero por documento,
+    para poder ponderarlos.
+    """
+    features = Counter(docs=1)
+    if not isinstance(doc, dict):
+        features['invalidos'] = 1
+        return features
+    features['validos'] = 1
+
+    if '_id' not in doc:
+        features['sin', '_id'] = 1
+
+    for field in DateAnalyzer.date_fields:
+        value = doc.get(field)
+        if value is None:
+            features['fecha_ausente', field] = 1
+            continue
+        formato, fecha = classify_date(value)
+        features['fecha_presente', field] = 1
+        features['fecha_formato', field, formato] = 1
+        if fecha is None:
+            features['fecha_no_convertible', field] = 1
+
+    client = doc.get('Client')
+    if client is None:
+        features['sin', 'Client'] = 1
+    elif isinstance(client, dict):
+        features['client'] = 1
+        for key, value in client.items():
+            features['client_campo', key] = 1
+            features['client_tipo', key, type(value).__name__] = 1
+    else:
+        features['client_no_dict'] = 1
+
+    contract = doc.get('contract')
+    if contract is None:
+        features['sin', 'contract'] = 1
+    elif isinstance(contract, dict) and contract.get('product') is None:
+        features['sin', 'product'] = 1
+
+    for field in ('Movies', 'Series'):
+        items = doc.get(field)
+        if items is None:
+            features['sin', field] = 1
+        elif isinstance(items, list):
+            features['con', field] = 1
+            features['elementos', field] = len(items)
+
+    for field in NumericAnalyzer.numeric_fields:
+        value = doc.get(field)
+        if value is None:
+            features['num_ausente', field] = 1
+            continue
+        features['num_tipo', field, type(value).__name__] = 1
+        try:
+            number = float(value)
+        except (ValueError, TypeError):
+            features['num_anomalo', field] = 1
+            continue
+        features['num_valido', field] = 1
+        features['num_suma', field] = number
+        if number < 0:
+            features['num_negativo', field] = 1
+        elif number == 0:
+            features['num_cero', field] = 1
+    return features
+
+
+class DumpSample:
+    """
+    Muestra con reemplazo de los objetos de varios volcados. Cada extracción
+    guarda su peso (bytes totales / bytes del objeto, la inversa de su
+    probabilidad) y sus indicadores.
+    """
+
+    def __init__(self, paths, seed=None, confidence=DEFAULT_CONFIDENCE):
+        self.dumps = []
+        for path in paths:
+            dump = SampledDump(path)
+            if dump.sampled_bytes > 0:
+                self.dumps.append(dump)
+            else:
+                dump.close()
+        self.total_bytes = sum(d.sampled_bytes for d in self.dumps)
+        self._bounds = []
+        acumulado = 0
+        for dump in self.dumps:
+            acumulado += dump.sampled_bytes
+            self._bounds.append(acumulado)
+        self.rng = random.Random(seed)
+        self.confidence = confidence
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+        self.weights = []
+        self.features = []
+        self.parsed_bytes = 0
+        self.distinct = set()
+
+    def __len__(self):
+        return len(self.weights)
+
+    def draw(self):
+        """Elige un byte al azar y añade a la muestra el objeto que lo contiene"""
+        position = self.rng.randrange(self.total_bytes)
+        i = bisect_right(self._bounds, position)
+        dump = self.dumps[i]
+        offset = dump.first + position - (self._bounds[i - 1] if i else 0)
+        start, length, doc = dump.document_at(offset)
+        self.weights.append(self.total_bytes / length)
+        self.features.append(document_features(doc))
+        self.parsed_bytes += length
+        self.distinct.add((i, start))
+
+    def run(self, fraction=None, size=None):
+        """Extrae size objetos o, con fraction, hasta haber leído esa fracción de los bytes"""
+        if not self.total_bytes:
+            return self
+        if size is not None:
+            for _ in range(size):
+                self.draw()
+        else:
+            target = fraction * self.total_bytes
+            while self.parsed_bytes < target or len(self) < MIN_DRAWS:
+                self.draw()
+        return self
+
+    def close(self):
+        for dump in self.dumps:
+            dump.close()
+
+    # ------------------------------------------------------------------
+    # Estimadores
+    # ------------------------------------------------------------------
+
+    def _values(self, key):
+        if callable(key):
+            return [key(f) for f in self.features]
+        return [f.get(key, 0) for f in self.features]
+
+    def total(self, key):
+        """Total estimado de un indicador (clave o función de los indicadores) en todos los volcados"""
+        n = len(self)
+        terms = [y * w for y, w in zip(self._values(key), self.weights)]
+        value = sum(terms) / n
+        if n < 2:
+            return Estimate(value, value, value)
+        variance = sum((t - value) ** 2 for t in terms) / (n * (n - 1))
+        margin = self.z * math.sqrt(variance)
+        return Estimate(value, max(0.0, value - margin), value + margin)
+
+    def ratio(self, key, base, bounded=True):
+        """Cociente estimado total(key) / total(base), p. ej. la proporción de un formato"""
+        n = len(self)
+        ys, xs = self._values(key), self._values(base)
+        y_total = sum(y * w for y, w in zip(ys, self.weights))
+        x_total = sum(x * w for x, w in zip(xs, self.weights))
+        if not x_total:
+            return None
+        value = y_total / x_total
+        if n < 2:
+            return Estimate(value, value, value)
+        residuals = [(y - value * x) * w for y, x, w in zip(ys, xs, self.weights)]
+        mean = sum(residuals) / n
+        variance = sum((r - mean) ** 2 for r in residuals) / (n * (n - 1)) / (x_total / n) ** 2
+        margin = self.z * math.sqrt(variance)
+        low, high = value - margin, value + margin
+        if bounded:
+            low, high = max(0.0, low), min(1.0, high)
+        return Estimate(value, low, high)
+
+    def keys(self, kind, *prefix):
+        """Claves (sin el tipo) de los indicadores kind vistos en la muestra, p. ej. los formatos de un campo"""
+        seen = set()
+        for features in self.features:
+            for key in features:
+                if isinstance(key, tuple) and key[0] == kind and key[1:1 + len(prefix)] == prefix:
+                    seen.add(key[1 + len(prefix):])
+        return sorted(seen)
+
+    # ------------------------------------------------------------------
+    # Informe
+    # ------------------------------------------------------------------
+
+    def _count(self, key):
+        est = self.total(key)
+        return f"≈ {est.value:.0f} (IC {self.confidence:.0%}: {est.low:.0f} – {est.high:.0f})"
+
+    def _share(self, key, base):
+        est = self.ratio(key, base)
+        if est is None:
+            return "sin datos"
+        return f"{est.value:.1%} (IC {self.confidence:.0%}: {est.low:.1%} – {est.high:.1%})"
+
+    def _seen(self, key):
+        return any(f.get(key) for f in self.features)
+
+    def report(self):
+        print("\n" + "=" * 80)
+        print("1. DOCUMENTOS E IDENTIFICADORES (_id)")
+        print("=" * 80)
+        print(f"\n📊 Estimaciones:")
+        print(f"   • Total de documentos: {self._count('docs')}")
+        print(f"   • Objetos JSON inválidos o truncados: {self._count('invalidos')}")
+        print(f"   • Documentos sin _id: {self._count(('sin', '_id'))}")
+        print(f"   • _id duplicados: no estimable por muestreo (usar el análisis completo)")
+
+        print("\n" + "=" * 80)
+        print("2. ANÁLISIS DE FECHAS")
+        print("=" * 80)
+        for field in DateAnalyzer.date_fields:
+            print(f"\n📅 Campo: '{field}'")
+            print(f"   • Valores ausentes/nulos: {self._count(('fecha_ausente', field))}")
+            print(f"   • Valores no convertibles a fecha: {self._count(('fecha_no_convertible', field))}")
+            formatos = self.keys('fecha_formato', field)
+            print(f"   • Formatos vistos en la muestra: {len(formatos)}")
+            shares = sorted(((self.ratio(('fecha_formato', field) + f, ('fecha_presente', field)), f[0])
+                             for f in formatos), key=lambda x: -x[0].value)
+            for est, formato in shares:
+                print(f"      - {formato}: {est.value:.1%} (IC {self.confidence:.0%}: {est.low:.1%} – {est.high:.1%})")
+            if len(formatos) > 1:
+                print(f"   ⚠️  PROBLEMA: Formatos de fecha heterogéneos")
+
+        print("\n" + "=" * 80)
+        print("3. ANÁLISIS DE ESTRUCTURA - CLIENT")
+        print("=" * 80)
+        print(f"\n📊 Estimaciones:")
+        print(f"   • Documentos sin Client: {self._count(('sin', 'Client'))}")
+        if self._seen('client_no_dict'):
+            print(f"   • Client que no es un diccionario: {self._count('client_no_dict')}")
+        print(f"\n📋 Campos en Client:")
+        for (key,) in self.keys('client_campo'):
+            missing = self.total(lambda f, key=key: f.get('client', 0) - f.get(('client_campo', key), 0))
+            aviso = (f" (ausente en ≈ {missing.value:.0f}, IC {self.confidence:.0%}: "
+                     f"{missing.low:.0f} – {missing.high:.0f})") if missing.value else ""
+            print(f"   • {key}{aviso}")
+            tipos = self.keys('client_tipo', key)
+            if len(tipos) > 1:
+                print(f"      ⚠️  PROBLEMA: Tipos mixtos detectados")
+                for (tipo,) in tipos:
+                    print(f"         - {tipo}: {self._share(('client_tipo', key, tipo), ('client_campo', key))}")
+
+        print("\n" + "=" * 80)
+        print("4. ANÁLISIS DE ESTRUCTURA - CONTRACT")
+        print("=" * 80)
+        print(f"\n📊 Estimaciones:")
+        print(f"   • Documentos sin contract: {self._count(('sin', 'contract'))}")
+        print(f"   • Documentos sin product: {self._count(('sin', 'product'))}")
+
+        print("\n" + "=" * 80)
+        print("5. ANÁLISIS DE CONTENIDOS - MOVIES & SERIES")
+        print("=" * 80)
+        for field, emoji in (('Movies', '🎬'), ('Series', '📺')):
+            print(f"\n{emoji} Estimaciones de {field}:")
+            print(f"   • Documentos sin {field}: {self._count(('sin', field))}")
+            print(f"   • Total de elementos: {self._count(('elementos', field))}")
+            average = self.ratio(('elementos', field), ('con', field), bounded=False)
+            if average is not None:
+                print(f"   • Promedio por documento: {average.value:.2f} "
+                      f"(IC {self.confidence:.0%}: {average.low:.2f} – {average.high:.2f})")
+
+        print("\n" + "=" * 80)
+        print("6. ANÁLISIS DE CAMPOS NUMÉRICOS")
+        print("=" * 80)
+        for field in NumericAnalyzer.numeric_fields:
+            print(f"\n💰 Campo: '{field}'")
+            print(f"   • Valores ausentes: {self._count(('num_ausente', field))}")
+            print(f"   • Tipos de datos encontrados:")
+            for (tipo,) in self.keys('num_tipo', field):
+                print(f"      - {tipo}: {self._count(('num_tipo', field, tipo))}")
+            mean = self.ratio(('num_suma', field), ('num_valido', field), bounded=False)
+            if mean is not None:
+                print(f"   • Promedio: {mean.value:.2f} (IC {self.confidence:.0%}: {mean.low:.2f} – {mean.high:.2f})")
+            if self._seen(('num_anomalo', field)):
+                print(f"   ⚠️  ADVERTENCIA: valores no numéricos {self._count(('num_anomalo', field))}")
+            if self._seen(('num_negativo', field)):
+                print(f"   ⚠️  ADVERTENCIA: valores negativos {self._count(('num_negativo', field))}")
+            if self._seen(('num_cero', field)):
+                print(f"   ⚠️  ADVERTENCIA: valores en cero {self._count(('num_cero', field))}")
+
+
+def run_sampled_analysis(data_directory, fraction=None, size=None, seed=None, confidence=DEFAULT_CONFIDENCE):
+    """Muestrea los volcados de data_directory e imprime el informe estimado"""
+    if size is None and not 0 < (fraction or 0) <= 1:
+        raise ValueError("La fracción de muestreo debe estar entre 0 y 1")
+    if size is not None and size < 2:
+        raise ValueError("Hacen falta al menos 2 documentos para estimar el error")
+
+    print("=" * 80)
+    print("ANÁLISIS POR MUESTREO")
+    print("=" * 80)
+
+    json_files = sorted(f for f in os.listdir(data_directory) if f.endswith('.json'))
+    inicio = time.perf_counter()
+    sample = DumpSample([os.path.join(data_directory, f) for f in json_files], seed=seed, confidence=confidence)
+    try:
+        sample.run(fraction=fraction, size=size)
+        elapsed = time.perf_counter() - inicio
+
+        print(f"\n🎲 {len(sample)} extracciones ({len(sample.distinct)} documentos distintos) "
+              f"de {len(sample.dumps)} archivos en {elapsed:.2f} s")
+        print(f"   • Leídos {sample.parsed_bytes / 1024 / 1024:.1f} de {sample.total_bytes / 1024 / 1024:.1f} MB "
+              f"({sample.parsed_bytes / (sample.total_bytes or 1):.1%})")
+        print(f"   • Valores extrapolados al total con intervalos de confianza del {confidence:.0%}")
+
+        if not len(sample):
+            print("\n❌ No se pudieron cargar documentos. Verifica la ruta.")
+            return sample
+
+        sample.report()
+        print("\n✅ Análisis por muestreo completado. Son estimaciones: confirmar con el análisis completo.\n")
+        return sample
+    finally:
+        sample.close()
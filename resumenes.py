@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Resúmenes mensuales precalculados
+Descripción: Acumula, por año/mes de facturación y por país del contrato y
+año/mes, lo que necesitan Q5 (facturación mensual) y Q6 (consumo mensual)
+de PO22_05_07_4_agregaciones.txt: facturas, ingresos, clientes únicos,
+tipos de producto y, para películas y series, visionados, minutos, suma de
+viewingPct y títulos únicos. Así los paneles leen unos cientos de documentos
+pequeños en lugar de volver a agregar todos los visionados.
+
+Los clientes y títulos distintos no se guardan como arrays en el resumen
+(crecerían sin límite): cada miembro es un documento pequeño de
+<resumen>_members, con índice único por grupo, conjunto y miembro, y el
+resumen solo lleva los recuentos (uniqueClients, movies.uniqueTitles,
+series.uniqueTitles), recalculados desde esa colección tras cada escritura.
+
+El reestructurador los construye al escribir 'invoices_restructured' y los
+actualiza en el modo --incremental con $inc y upsert. Si un lote reemplaza
+facturas ya reestructuradas (p. ej. tras carga_limpia.py --anadir), los
+meses de la versión anterior y de la nueva se recalculan enteros con
+rebuild_months(). Ejecutado directamente, este script los reconstruye desde
+'invoices_restructured'.
+
+Uso:
+    python3 resumenes.py
+"""
+
+import time
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal, localcontext
+
+from bson import Decimal128
+from bson.decimal128 import create_decimal128_context
+from pymongo import ASCENDING, MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Configuración
+MONGO_URI = "mongodb://localhost:27017/"
+DATABASE_NAME = "streamit_db"
+INVOICES_COLLECTION = "invoices_restructured"
+MOVIES_COLLECTION = "movies"
+SERIES_COLLECTION = "series"
+
+# Colecciones de resúmenes
+ROLLUP_MONTHLY = "rollup_monthly"
+ROLLUP_COUNTRY = "rollup_country"
+
+# Miembros distintos de cada resumen (un documento por grupo, conjunto y miembro)
+MEMBERS_SUFFIX = "_members"
+
+# Conjuntos de miembros distintos y campo del resumen con su recuento
+DISTINCT_SETS = {
+    "clients": "uniqueClients",
+    "movies": "movies.uniqueTitles",
+    "series": "series.uniqueTitles",
+}
+
+# Documentos de miembros por insert_many y grupos por recuento
+MEMBER_CHUNK = 10000
+COUNT_CHUNK = 1000
+
+# _id por consulta al leer duraciones de los catálogos
+DURATION_CHUNK = 10000
+
+# Código de error de clave duplicada: el lote ya estaba aplicado (reanudación)
+DUPLICATE_KEY = 11000
+
+
+def connect():
+    return MongoClient(MONGO_URI)
+
+
+def _to_decimal(value):
+    """Como $sum: solo suman los valores numéricos"""
+    if isinstance(value, Decimal128):
+        return value.to_decimal()
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return Decimal(repr(value))
+    return Decimal(0)
+
+
+def _field_name(value):
+    """Clave segura para productTypes.<tipo> ("null" si no hay tipo)"""
+    name = "null" if value is None else str(value)
+    return name.replace(".", "_").lstrip("$") or "_"
+
+
+# Campos de las facturas reestructuradas que leen los resúmenes
+INVOICE_PROJECTION = {"billing": 1, "total": 1, "client.customerCode": 1, "contract.country": 1,
+                      "contract.product.type": 1, "movies.movieId": 1, "movies.viewingPct": 1,
+                      "series.seriesId": 1, "series.viewingPct": 1}
+
+
+def month_key(invoice):
+    """(año, mes) de facturación de la factura, o (None, None) si billing no es una fecha"""
+    billing = invoice.get("billing")
+    return (billing.year, billing.month) if isinstance(billing, datetime) else (None, None)
+
+
+def _month_query(year, month):
+    """Filtro de las facturas de un mes de facturación (o sin fecha de facturación)"""
+    if year is None:
+        return {"billing": {"$not": {"$type": "date"}}}
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    return {"billing": {"$gte": start, "$lt": end}}
+
+
+def _new_group():
+    return {
+        "invoiceCount": 0,
+        "totalRevenue": Decimal(0),
+        "clients": set(),
+        "productTypes": Counter(),
+        "movies": Counter(),
+        "moviesPct": 0,
+        "series": Counter(),
+        "seriesPct": 0,
+    }
+
+
+def _merge_group(target, source):
+    target["invoiceCount"] += source["invoiceCount"]
+    target["totalRevenue"] += source["totalRevenue"]
+    target["clients"] |= source["clients"]
+    target["productTypes"].update(source["productTypes"])
+    target["movies"].update(source["movies"])
+    target["moviesPct"] += source["moviesPct"]
+    target["series"].update(source["series"])
+    target["seriesPct"] += source["seriesPct"]
+
+
+class RollupAccumulator:
+    """
+    Resúmenes de un conjunto de facturas reestructuradas, en memoria.
+    add() suma una factura; write() los aplica a MongoDB con $inc y upsert,
+    así varias escrituras (lotes, particiones) se acumulan.
+    """
+
+    def __init__(self):
+        self.monthly = {}
+        self.by_country = {}
+
+    def __len__(self):
+        return len(self.monthly)
+
+    def add(self, invoice):
+        year, month = month_key(invoice)
+        country = (invoice.get("contract") or {}).get("country")
+        product_type = ((invoice.get("contract") or {}).get("product") or {}).get("type")
+        customer_code = (invoice.get("client") or {}).get("customerCode")
+        revenue = _to_decimal(invoice.get("total"))
+        movies = invoice.get("movies") or []
+        series = invoice.get("series") or []
+
+        for groups, key in ((self.monthly, (year, month)), (self.by_country, (country, year, month))):
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = _new_group()
+            group["invoiceCount"] += 1
+            group["totalRevenue"] += revenue
+            group["clients"].add(customer_code)
+            group["productTypes"][product_type] += 1
+            for m in movies:
+                group["movies"][m["movieId"]] += 1
+                group["moviesPct"] += m.get("viewingPct") or 0
+            for s in series:
+                group["series"][s["seriesId"]] += 1
+                group["seriesPct"] += s.get("viewingPct") or 0
+
+    def merge(self, other):
+        """Suma los resúmenes de otro acumulador (p. ej. de una partición)"""
+        for mine, theirs in ((self.monthly, other.monthly), (self.by_country, other.by_country)):
+            for key, group in theirs.items():
+                if key in mine:
+                    _merge_group(mine[key], group)
+                else:
+                    mine[key] = group
+
+    def _load_durations(self, db):
+        """Minutos de cada película (details.duration) y serie (avgDuration) referenciada"""
+        durations = {}
+        for collection, field, ids in (
+            (db[MOVIES_COLLECTION], "details.duration", {i for g in self.monthly.values() for i in g["movies"]}),
+            (db[SERIES_COLLECTION], "avgDuration", {i for g in self.monthly.values() for i in g["series"]}),
+        ):
+            ids = list(ids)
+            for start in range(0, len(ids), DURATION_CHUNK):
+                chunk = ids[start:start + DURATION_CHUNK]
+                for doc in collection.find({"_id": {"$in": chunk}}, {field: 1}):
+                    value = doc
+                    for part in field.split("."):
+                        value = value.get(part) if isinstance(value, dict) else None
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        durations[doc["_id"]] = value
+        return durations
+
+    @staticmethod
+    def _update(key_fields, group, durations, seq):
+        key_fields = dict(key_fields)
+        with localcontext(create_decimal128_context()):
+            revenue = Decimal128(group["totalRevenue"])
+        inc = {
+            "invoiceCount": group["invoiceCount"],
+            "totalRevenue": revenue,
+        }
+        for product_type, count in group["productTypes"].items():
+            inc[f"productTypes.{_field_name(product_type)}"] = count
+        for kind in ("movies", "series"):
+            views = group[kind]
+            inc[f"{kind}.views"] = sum(views.values())
+            inc[f"{kind}.durationMinutes"] = sum(n * durations.get(oid, 0) for oid, n in views.items())
+            inc[f"{kind}.viewingPctSum"] = group[f"{kind}Pct"]
+
+        query = {"_id": key_fields}
+        update = {"$inc": inc, "$setOnInsert": key_fields}
+        if seq is not None:
+            # Un lote ya aplicado no vuelve a sumar: el filtro no encaja y el upsert choca con el _id
+            query["appliedUpTo"] = {"$not": {"$gte": seq}}
+            update["$set"] = {"appliedUpTo": seq}
+        return UpdateOne(query, update, upsert=True)
+
+    @staticmethod
+    def _write_members(collection, fields, groups):
+        """Inserta los miembros distintos de cada grupo; los que ya existen se ignoran"""
+        collection.create_index([(field, ASCENDING) for field in fields] + [("set", ASCENDING), ("member", ASCENDING)],
+                                unique=True, name="group_set_member_uniq")
+        docs = [
+            dict(zip(fields, key), set=kind, member=member)
+            for key, group in groups.items()
+            for kind in DISTINCT_SETS
+            for member in group[kind]
+        ]
+        for start in range(0, len(docs), MEMBER_CHUNK):
+            try:
+                collection.insert_many(docs[start:start + MEMBER_CHUNK], ordered=False)
+            except BulkWriteError as e:
+                if any(err.get("code") != DUPLICATE_KEY for err in e.details.get("writeErrors", [])):
+                    raise
+
+    @staticmethod
+    def _write_counts(rollup, members, fields, keys):
+        """Fija en cada resumen los recuentos de miembros distintos (idempotente)"""
+        for start in range(0, len(keys), COUNT_CHUNK):
+            chunk = keys[start:start + COUNT_CHUNK]
+            counts = {key: dict.fromkeys(DISTINCT_SETS.values(), 0) for key in chunk}
+            group_id = {field: f"${field}" for field in fields}
+            group_id["set"] = "$set"
+            for row in members.aggregate([
+                {"$match": {"$or": [dict(zip(fields, key)) for key in chunk]}},
+                {"$group": {"_id": group_id, "n": {"$sum": 1}}},
+            ]):
+                key = tuple(row["_id"].get(field) for field in fields)
+                if key in counts:
+                    counts[key][DISTINCT_SETS[row["_id"]["set"]]] = row["n"]
+            rollup.bulk_write([UpdateOne({"_id": dict(zip(fields, key))}, {"$set": values})
+                               for key, values in counts.items()], ordered=False)
+
+    def write(self, db, seq=None):
+        """
+        Aplica los resúmenes a ROLLUP_MONTHLY y ROLLUP_COUNTRY. seq (creciente
+        entre lotes) hace la escritura idempotente: un lote repetido tras un
+        corte se ignora. Los miembros distintos se insertan antes y los
+        recuentos se fijan después desde <resumen>_members, así un corte en
+        cualquier punto se corrige al repetir el lote. Devuelve el número de
+        documentos de resumen tocados.
+        """
+        if not self.monthly:
+            return 0
+        durations = self._load_durations(db)
+        touched = 0
+        for name, groups, fields in ((ROLLUP_MONTHLY, self.monthly, ("year", "month")),
+                                     (ROLLUP_COUNTRY, self.by_country, ("country", "year", "month"))):
+            members = db[name + MEMBERS_SUFFIX]
+            self._write_members(members, fields, groups)
+            ops = [self._update(zip(fields, key), group, durations, seq) for key, group in groups.items()]
+            try:
+                db[name].bulk_write(ops, ordered=False)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                if seq is None or any(err.get("code") != DUPLICATE_KEY for err in errors):
+                    raise
+            self._write_counts(db[name], members, fields, list(groups))
+            touched += len(ops)
+        return touched
+
+
+def drop_rollups(db):
+    for name in (ROLLUP_MONTHLY, ROLLUP_COUNTRY):
+        db[name].drop()
+        db[name + MEMBERS_SUFFIX].drop()
+
+
+def rebuild_months(db, months):
+    """
+    Recalcula desde 'invoices_restructured' los resúmenes (y sus miembros)
+    de los meses indicados, [(año, mes)]. Sustituye lo que hubiera, así que
+    repetirlo da el mismo resultado. Devuelve las facturas leídas.
+    """
+    rollups = RollupAccumulator()
+    invoices = 0
+    for year, month in months:
+        for invoice in db[INVOICES_COLLECTION].find(_month_query(year, month), INVOICE_PROJECTION):
+            rollups.add(invoice)
+            invoices += 1
+        for name in (ROLLUP_MONTHLY, ROLLUP_COUNTRY):
+            db[name].delete_many({"year": year, "month": month})
+            db[name + MEMBERS_SUFFIX].delete_many({"year": year, "month": month})
+    rollups.write(db)
+    return invoices
+
+
+def rebuild(db):
+    """Reconstruye los resúmenes desde 'invoices_restructured'"""
+    rollups = RollupAccumulator()
+    invoices = 0
+    for invoice in db[INVOICES_COLLECTION].find({}, INVOICE_PROJECTION):
+        rollups.add(invoice)
+        invoices += 1
+    drop_rollups(db)
+    rollups.write(db)
+    return invoices, len(rollups.monthly), len(rollups.by_country)
+
+
+def main():
+    client = connect()
+    try:
+        start = time.perf_counter()
+        print(f"Reconstruyendo resúmenes desde '{INVOICES_COLLECTION}'...")
+        invoices, monthly, by_country = rebuild(client[DATABASE_NAME])
+        print(f"   Facturas leídas: {invoices}")
+        print(f"   '{ROLLUP_MONTHLY}': {monthly} documentos")
+        print(f"   '{ROLLUP_COUNTRY}': {by_country} documentos")
+        print(f"\nTiempo total: {time.perf_counter() - start:.2f} s")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
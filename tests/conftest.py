@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Configuración común de las pruebas: los scripts del repositorio se importan
+como módulos y las pruebas con MongoDB usan mongomock (se saltan si no está
+instalado).
+"""
+
+import io
+import os
+import runpy
+import sys
+from contextlib import redirect_stdout
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+FIXTURES = os.path.join(ROOT, "tests", "fixtures")
+
+# Volcado de prueba con las particularidades de los volcados reales
+FIXTURE_DUMP = os.path.join(FIXTURES, "volcado_prueba.json")
+
+
+def _patch_mongomock(monkeypatch, mongomock):
+    """
+    mongomock 4.x no admite bulk_write con las operaciones de pymongo 4 ni
+    $inc sobre Decimal128: se sustituyen por equivalentes operación a operación.
+    """
+    from bson import Decimal128
+    from pymongo import InsertOne, ReplaceOne, UpdateMany, UpdateOne
+    from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+    class Result:
+        def __init__(self):
+            self.matched_count = self.modified_count = self.upserted_count = 0
+
+    def bulk_write(self, requests, ordered=True, **kwargs):
+        result, errors = Result(), []
+        for index, op in enumerate(requests):
+            try:
+                if isinstance(op, InsertOne):
+                    self.insert_one(op._doc)
+                    continue
+                if isinstance(op, ReplaceOne):
+                    r = self.replace_one(op._filter, op._doc, upsert=bool(op._upsert))
+                elif isinstance(op, UpdateOne):
+                    r = self.update_one(op._filter, op._doc, upsert=bool(op._upsert),
+                                        array_filters=op._array_filters)
+                elif isinstance(op, UpdateMany):
+                    r = self.update_many(op._filter, op._doc, upsert=bool(op._upsert),
+                                         array_filters=op._array_filters)
+                else:
+                    raise TypeError(f"Operación no soportada: {op!r}")
+            except DuplicateKeyError:
+                errors.append({"index": index, "code": 11000})
+                if ordered:
+                    break
+                continue
+            result.matched_count += r.matched_count
+            result.modified_count += r.modified_count
+            result.upserted_count += r.upserted_id is not None
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+        return result
+
+    original_inc = mongomock.collection._updaters["$inc"]
+
+    def inc(doc, field_name, value):
+        if isinstance(value, Decimal128) and isinstance(doc, dict):
+            old = doc.get(field_name, Decimal128("0"))
+            doc[field_name] = Decimal128(old.to_decimal() + value.to_decimal())
+        else:
+            original_inc(doc, field_name, value)
+
+    monkeypatch.setattr(mongomock.collection.Collection, "bulk_write", bulk_write)
+    monkeypatch.setitem(mongomock.collection._updaters, "$inc", inc)
+
+
+@pytest.fixture
+def mongo_client(monkeypatch):
+    """Cliente mongomock; close() no lo invalida (los scripts lo cierran al terminar)"""
+    mongomock = pytest.importorskip("mongomock")
+    _patch_mongomock(monkeypatch, mongomock)
+    client = mongomock.MongoClient()
+    client.close = lambda: None
+    return client
+
+
+@pytest.fixture
+def fixture_dir(tmp_path):
+    """Directorio de datos con el volcado de prueba"""
+    with open(FIXTURE_DUMP, "rb") as f:
+        (tmp_path / os.path.basename(FIXTURE_DUMP)).write_bytes(f.read())
+    return tmp_path
+
+
+def load_script(filename):
+    """Ejecuta un script .txt del repositorio como módulo y devuelve sus globales"""
+    return runpy.run_path(os.path.join(ROOT, filename), run_name="script_" + os.path.splitext(filename)[0])
+
+
+def clean_invoices(data_directory, client):
+    """Facturas del volcado limpiadas como carga_limpia.py, en 'streamit_db.invoices'"""
+    import carga_limpia
+
+    loader = carga_limpia.CleanLoader(data_directory=str(data_directory), client_factory=lambda: client)
+    with redirect_stdout(io.StringIO()):
+        docs = list(loader.iter_clean_documents())
+    loader.collection.insert_many(docs)
+    return loader
+
+
+def load_restructurer(checkpoint_every=None):
+    """Clase DataRestructurer del script de reestructuración (lotes incrementales opcionales)"""
+    cls = load_script("PO22_05_07_2_reestructuracion.txt")["DataRestructurer"]
+    if checkpoint_every is not None:
+        cls.restructure_incremental.__globals__["CHECKPOINT_EVERY"] = checkpoint_every
+    return cls
+
+
+def run_restructurer(cls, client, **kwargs):
+    """Ejecuta la reestructuración contra client y devuelve su salida"""
+    with redirect_stdout(io.StringIO()) as out:
+        cls(client_factory=lambda: client, **kwargs).run()
+    return out.getvalue()
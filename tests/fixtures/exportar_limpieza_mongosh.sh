@@ -0,0 +1,27 @@
+#!/usr/bin/env bash
+# Regenera limpieza_mongosh.json, la referencia de la prueba de paridad de
+# carga_limpia.py: volcado_prueba.json importado con mongoimport, limpiado con
+# PO22_05_07_1_limpieza.txt en mongosh y exportado con mongoexport.
+# Necesita un servidor MongoDB y las herramientas de base de datos; trabaja en
+# una base de datos propia que borra al terminar.
+#
+#   MONGO_URI=mongodb://localhost:27017 tests/fixtures/exportar_limpieza_mongosh.sh
+
+set -euo pipefail
+
+FIXTURES="$(cd "$(dirname "$0")" && pwd)"
+ROOT="$(dirname "$(dirname "$FIXTURES")")"
+URI="${MONGO_URI:-mongodb://localhost:27017}"
+DB="paridad_limpieza"
+TMP="$(mktemp -d)"
+trap 'rm -rf "$TMP"' EXIT
+
+# Misma conversión que convertir_json.py (array JSON para --jsonArray)
+(cd "$ROOT" && python3 -c "import sys, convertir_json; convertir_json.convert_multi_json_to_array(sys.argv[1], sys.argv[2], 'array', frozenset())" \
+    "$FIXTURES/volcado_prueba.json" "$TMP/volcado_prueba.json")
+
+mongoimport --uri "$URI" --db "$DB" --collection invoices --drop --jsonArray --file "$TMP/volcado_prueba.json"
+mongosh --quiet "$URI/$DB" "$ROOT/PO22_05_07_1_limpieza.txt" > /dev/null
+mongoexport --uri "$URI" --db "$DB" --collection invoices --jsonArray --pretty --sort '{"_id": 1}' \
+    --out "$FIXTURES/limpieza_mongosh.json"
+mongosh --quiet "$URI/$DB" --eval "db.dropDatabase()" > /dev/null
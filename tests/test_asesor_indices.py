@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""
+Informe de asesor_indices.py: ahorro de los índices marcados para eliminar.
+"""
+
+from asesor_indices import IndexAdvisor, IndexInfo
+
+MB = 1024 * 1024
+
+
+def test_report_shows_dropped_and_total_size(mongo_client, capsys):
+    db = mongo_client.streamit_db
+    db.invoices.insert_one({"x": 1})
+    advisor = IndexAdvisor(db, [], collections=["invoices"])
+    advisor.indexes = {"invoices": [
+        IndexInfo("_id_", [("_id", 1)], {}, 1 * MB, 10),
+        IndexInfo("x_1", [("x", 1)], {}, 2 * MB, 0),
+    ]}
+    advisor.keys_per_doc = {("invoices", "_id_"): 1.0, ("invoices", "x_1"): 1.0}
+    advisor.report()
+    out = capsys.readouterr().out
+    assert "Eliminando los marcados: 2.00 de 3.00 MB menos y 1.0 de 2.0 claves menos" in out
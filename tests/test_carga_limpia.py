@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Paridad de carga_limpia.py con el script de mongosh sin servidor: el volcado
+de prueba se compara con limpieza_mongosh.json, la limpieza de referencia
+exportada con fixtures/exportar_limpieza_mongosh.sh.
+"""
+
+import io
+import os
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import pytest
+from bson import json_util
+
+import carga_limpia
+from conftest import FIXTURES
+
+REFERENCE = os.path.join(FIXTURES, "limpieza_mongosh.json")
+
+
+@pytest.fixture
+def reference():
+    with open(REFERENCE, encoding="utf-8") as f:
+        return {doc["_id"]: doc for doc in json_util.loads(f.read())}
+
+
+def verify(mongo_client, fixture_dir, reference_docs):
+    mongo_client.streamit_db.invoices_mongosh.insert_many(list(reference_docs))
+    loader = carga_limpia.CleanLoader(data_directory=str(fixture_dir), client_factory=lambda: mongo_client)
+    with redirect_stdout(io.StringIO()) as out:
+        ok = loader.verify_parity("invoices_mongosh")
+    return ok, out.getvalue()
+
+
+def test_clean_documents_match_mongosh(mongo_client, fixture_dir, reference):
+    ok, out = verify(mongo_client, fixture_dir, reference.values())
+    assert ok, out
+    assert "Documentos idénticos: 6" in out
+
+
+def test_parity_reports_differences(mongo_client, fixture_dir, reference):
+    reference["2500/A1"]["Client"]["age"] = 28
+    del reference["0900/C2"]
+    ok, out = verify(mongo_client, fixture_dir, reference.values())
+    assert not ok
+    assert "Client.age: 1" in out
+    assert "Sin documento en 'invoices_mongosh': 1" in out
+
+
+@pytest.mark.parametrize("invoice_id, field, expected", [
+    # Año de dos dígitos ($substr 6,2): 1990 -> 2019, 2016 -> 2020
+    ("2000/A0", "Client.birthDate", datetime(2019, 1, 15)),
+    ("2000/A0", "contract.startDate", datetime(2020, 1, 1)),
+    ("3000/A0", "chargeDate", datetime(2017, 1, 1)),
+    # Mes de billing desconocido -> enero
+    ("2000/A0", "billing", datetime(2016, 1, 1)),
+    ("2500/A1", "billing", datetime(2016, 11, 1)),
+    # $toDecimal: double con 15 cifras significativas, texto y enteros tal cual
+    ("3000/A0", "total", "19.9900000000000"),
+    ("1500/B1", "total", "0.300000000000000"),
+    ("0900/C2", "total", "2.50000000000000"),
+    ("2000/A0", "total", "7.50"),
+    ("1000/A0", "total", "20"),
+    # $dateDiff en años cuenta cambios de año, no cumpleaños
+    ("3000/A0", "Client.age", 28),
+    ("1000/A0", "Client.age", 26),
+    ("2500/A1", "Client.age", 29),
+    ("2000/A0", "Client.age", -2),
+])
+def test_mongosh_quirks(reference, invoice_id, field, expected):
+    value = reference[invoice_id]
+    for key in field.split("."):
+        value = value[key]
+    if isinstance(value, datetime):
+        value = value.replace(tzinfo=None)
+    elif not isinstance(value, int):
+        value = str(value)
+    assert value == expected
+
+
+def test_cleaner_reproduces_quirks():
+    cleaner = carga_limpia.InvoiceCleaner(now=datetime(2026, 1, 1))
+    doc = cleaner.clean({
+        "_id": "q", "TOTAL": 0.1 + 0.2, "charge date": "01/01/17", "billing": "octobre 2016",
+        "Client": {"Birth date": "31/12/1989"},
+    })
+    assert str(doc["total"]) == "0.300000000000000"
+    assert doc["billing"] == datetime(2016, 1, 1)
+    assert doc["Client"]["birthDate"] == datetime(2019, 12, 31)
+    assert doc["Client"]["age"] == -2
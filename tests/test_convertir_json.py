@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Resumen por archivo de convertir_json.py con un plan de deduplicación.
+"""
+
+import convertir_json
+from lector_json import MappedDump
+
+
+def offsets(path):
+    return frozenset(offset for offset, _ in MappedDump(str(path)).iter_documents_with_offsets())
+
+
+def test_fully_deduplicated_file(fixture_dir, tmp_path, capsys):
+    dump = fixture_dir / "volcado_prueba.json"
+    output = tmp_path / "convertido.json"
+    count = convertir_json.convert_multi_json_to_array(str(dump), str(output), skip=offsets(dump))
+    out = capsys.readouterr().out
+    assert count == 0
+    assert not output.exists()
+    assert "Deduplicado por completo: volcado_prueba.json (6 duplicados descartados" in out
+    assert "No se encontraron documentos" not in out
+
+
+def test_partially_deduplicated_file(fixture_dir, tmp_path, capsys):
+    dump = fixture_dir / "volcado_prueba.json"
+    skip = frozenset(sorted(offsets(dump))[:2])
+    count = convertir_json.convert_multi_json_to_array(str(dump), str(tmp_path / "convertido.json"), skip=skip)
+    assert count == 4
+    assert "→ 4 documentos (2 duplicados descartados)" in capsys.readouterr().out
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Importes de deduplicacion.py: mismo valor para 20, 20.0 y "20.00", sin
+notación exponencial en el informe ni en claveNegocio.
+"""
+
+import pytest
+
+import deduplicacion
+
+
+@pytest.mark.parametrize("value, expected", [
+    (20, "20"),
+    (20.0, "20"),
+    ("20.00", "20"),
+    (1500, "1500"),
+    ("7.50", "7.5"),
+    (0.0, "0"),
+    (" 12.340 ", "12.34"),
+    (1e21, "1000000000000000000000"),
+])
+def test_amount_has_no_exponent(value, expected):
+    assert str(deduplicacion._amount(value)) == expected
+
+
+@pytest.mark.parametrize("value", [None, True, "veinte", [20]])
+def test_amount_of_non_numbers(value):
+    assert deduplicacion._amount(value) is None
+
+
+def test_business_key_total():
+    doc = {"TOTAL": 20.0, "billing": "October 2016",
+           "Client": {"customer code": "AB000001"}, "contract": {"contract ID": "C001"}}
+    assert deduplicacion.business_key(doc)[3] == "20"
+    assert deduplicacion.business_key(dict(doc, TOTAL="20.00")) == deduplicacion.business_key(doc)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Pruebas de escritor_bulk.BulkWriter"""
+
+import threading
+
+import pytest
+
+from escritor_bulk import BulkWriter
+
+# Entero que BSON no puede codificar (más de 64 bits)
+HUGE_INT = 123456789012345678901234
+
+
+class FakeCollection:
+    """Colección mínima que guarda lo insertado"""
+
+    name = "fake"
+
+    def __init__(self):
+        self.docs = []
+        self._lock = threading.Lock()
+
+    def insert_many(self, docs, ordered=True):
+        with self._lock:
+            self.docs.extend(docs)
+
+
+def run_with_timeout(func, seconds=10):
+    """Ejecuta func en un hilo y falla si no termina a tiempo (p. ej. un put() bloqueado)"""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = func()
+        except BaseException as e:
+            outcome["error"] = e
+
+    t = threading.Thread(target=target, daemon=True)
+    t.start()
+    t.join(seconds)
+    assert not t.is_alive(), "la operación se ha quedado bloqueada"
+    return outcome
+
+
+def test_unencodable_document_is_raised_on_close():
+    writer = BulkWriter(FakeCollection(), workers=1)
+    writer.put({"_id": 1, "Extra": HUGE_INT})
+    with pytest.raises(OverflowError):
+        writer.close()
+
+
+def test_unencodable_document_does_not_block_producer():
+    # Cola de un elemento: sin hilos que la vacíen, put() esperaría para siempre
+    collection = FakeCollection()
+    writer = BulkWriter(collection, workers=1, queue_size=1)
+
+    def produce():
+        writer.put({"_id": 0, "Extra": HUGE_INT})
+        for i in range(1, 1000):
+            writer.put({"_id": i})
+
+    outcome = run_with_timeout(produce)
+    assert isinstance(outcome.get("error"), OverflowError)
+    outcome = run_with_timeout(lambda: writer.close(raise_errors=False))
+    assert "error" not in outcome
+
+
+def test_clean_loader_reports_unencodable_invoice(tmp_path):
+    mongomock = pytest.importorskip("mongomock")
+    import carga_limpia
+
+    (tmp_path / "dump.json").write_text(
+        '{"_id": "A1", "TOTAL": 10, "Extra": %d}\n{"_id": "A2", "TOTAL": 5}\n' % HUGE_INT
+    )
+    client = mongomock.MongoClient()
+    loader = carga_limpia.CleanLoader(data_directory=str(tmp_path), client_factory=lambda: client)
+    with pytest.raises(OverflowError):
+        loader.load()
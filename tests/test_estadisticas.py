@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+DuplicateDetector: el resumen no depende de cuántas claves caben en memoria
+(--max-ids-memoria).
+"""
+
+import pytest
+
+from estadisticas import DuplicateDetector
+
+KEYS = [1, "1", 1.0, 2.5, True, 7, "a", 2.5, 7.0, "a", 10 ** 20, float(10 ** 20), None]
+
+
+def summary(detector):
+    distintos, repetidos, ejemplos = detector.summary(max_examples=len(KEYS))
+    return distintos, repetidos, sorted(count for _, count in ejemplos)
+
+
+@pytest.mark.parametrize("max_exact", [1, 2, 3])
+def test_summary_does_not_depend_on_max_exact(tmp_path, max_exact):
+    exact = DuplicateDetector(max_exact=len(KEYS), spill_dir=str(tmp_path))
+    spilled = DuplicateDetector(max_exact=max_exact, spill_dir=str(tmp_path))
+    for key in KEYS:
+        exact.add(key)
+        spilled.add(key)
+    assert not exact.spilled and spilled.spilled
+    assert summary(spilled) == summary(exact) == (7, 5, [2, 2, 2, 2, 3])
+    spilled.cleanup()
+
+
+def test_merged_detectors_match(tmp_path):
+    exact = DuplicateDetector(spill_dir=str(tmp_path))
+    first = DuplicateDetector(max_exact=1, spill_dir=str(tmp_path))
+    second = DuplicateDetector(max_exact=len(KEYS), spill_dir=str(tmp_path))
+    for i, key in enumerate(KEYS):
+        exact.add(key)
+        (first if i % 2 else second).add(key)
+    first.merge(second)
+    assert summary(first) == summary(exact)
+    first.cleanup()
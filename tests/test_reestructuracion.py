@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Reestructuración completa: marca de agua que deja para --incremental y
+mismos catálogos y facturas en todos los modos.
+"""
+
+import pytest
+from bson import ObjectId
+
+from conftest import clean_invoices, load_restructurer, run_restructurer
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def test_full_run_watermark_is_read_before_the_scan(mongo_client, fixture_dir):
+    db = mongo_client.streamit_db
+    clean_invoices(fixture_dir, mongo_client)
+    late = db.invoices.find_one_and_delete({"_id": "3000/A0"})
+
+    class Restructurer(load_restructurer()):
+        def restructure_single_pass(self):
+            # Factura insertada mientras se recorre el origen
+            self.invoices_source.insert_one(late)
+            return super().restructure_single_pass()
+
+    out = run_restructurer(Restructurer, mongo_client)
+    assert "ERROR" not in out, out
+    state = db.restructure_state.find_one()
+    assert state["lastId"] == "2500/A1"
+
+    out = run_restructurer(load_restructurer(), mongo_client, incremental=True)
+    assert "ERROR" not in out, out
+    assert db.restructure_state.find_one()["lastId"] == "3000/A0"
+    assert db.invoices_restructured.count_documents({}) == 6
+    assert sum(d["invoiceCount"] for d in db.rollup_monthly.find()) == 6
+
+
+def test_failed_full_run_leaves_no_watermark(mongo_client, fixture_dir):
+    clean_invoices(fixture_dir, mongo_client)
+
+    class Restructurer(load_restructurer()):
+        def write_rollups(self):
+            raise RuntimeError("fallo al escribir los resúmenes")
+
+    out = run_restructurer(Restructurer, mongo_client)
+    assert "fallo al escribir los resúmenes" in out
+    assert mongo_client.streamit_db.restructure_state.find_one() is None
+
+
+def _by_title(db):
+    """
+    Catálogos y facturas con las referencias a ObjectId sustituidas por el
+    título y sin _metadata (fecha de ejecución)
+    """
+    titles = {}
+    catalogs = {}
+    for name in ("movies", "series"):
+        docs = list(db[name].find())
+        titles.update({doc["_id"]: doc["title"] for doc in docs})
+        catalogs[name] = sorted(({k: v for k, v in doc.items() if k not in ("_id", "_metadata")} for doc in docs),
+                                key=lambda d: d["title"])
+
+    def resolve(value):
+        if isinstance(value, dict):
+            return {k: resolve(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [resolve(v) for v in value]
+        return titles.get(value, value) if isinstance(value, ObjectId) else value
+
+    catalogs["invoices"] = [resolve(doc) for doc in db.invoices_restructured.find({}, {"_metadata": 0}).sort("_id", 1)]
+    return catalogs
+
+
+@pytest.mark.parametrize("options", [
+    {"single_pass": True},
+    {"single_pass": False},
+    {"workers": 3, "executor": "thread"},
+], ids=["una-pasada", "tres-pasadas", "workers"])
+def test_modes_build_the_same_catalogs(mongo_client, fixture_dir, options):
+    db = mongo_client.streamit_db
+    clean_invoices(fixture_dir, mongo_client)
+    reference = mongomock.MongoClient()
+    reference.close = lambda: None
+    clean_invoices(fixture_dir, reference)
+    assert "ERROR" not in run_restructurer(load_restructurer(), reference, single_pass=True)
+
+    out = run_restructurer(load_restructurer(), mongo_client, **options)
+    assert "ERROR" not in out, out
+    assert _by_title(db) == _by_title(reference.streamit_db)
+    # Matrix (1999) trae duration 136 en 3000/A0 y 1500/B1 y 120 en 1000/A0
+    matrix = db.movies.find_one({"title": "Matrix"})
+    assert matrix["details"]["duration"] == 120
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Resúmenes de Q5/Q6 mantenidos por la reestructuración incremental: tras
+cada ejecución deben coincidir con los reconstruidos desde
+'invoices_restructured' (resumenes.rebuild), también si se reemplazan
+facturas o se repite un lote tras un corte.
+"""
+
+from datetime import datetime
+
+from bson import Decimal128
+
+import resumenes
+from conftest import clean_invoices, load_restructurer, run_restructurer
+
+
+def run(cls, client, **kwargs):
+    out = run_restructurer(cls, client, **kwargs)
+    assert "ERROR" not in out, out
+
+
+def _plain(value):
+    """Decimal128 se compara por valor (la suma con $inc puede cambiar el exponente)"""
+    if isinstance(value, Decimal128):
+        return value.to_decimal()
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items() if k != "appliedUpTo"}
+    return value
+
+
+def rollups(db):
+    """Resúmenes y miembros distintos, comparables entre ejecuciones"""
+    snapshot = {}
+    for name in (resumenes.ROLLUP_MONTHLY, resumenes.ROLLUP_COUNTRY):
+        snapshot[name] = sorted((_plain(doc) for doc in db[name].find()), key=lambda d: repr(d["_id"]))
+        members = db[name + resumenes.MEMBERS_SUFFIX].find({}, {"_id": 0})
+        snapshot[name + resumenes.MEMBERS_SUFFIX] = sorted(repr(sorted(doc.items())) for doc in members)
+    return snapshot
+
+
+def recomputed(db):
+    resumenes.rebuild(db)
+    return rollups(db)
+
+
+def test_replaced_invoice_is_not_counted_twice(mongo_client, fixture_dir):
+    db = mongo_client.streamit_db
+    clean_invoices(fixture_dir, mongo_client)
+    cls = load_restructurer()
+    run(cls, mongo_client, watermark="dumpDate")
+
+    # carga_limpia.py --anadir: la factura se reemplaza por _id con un dumpDate posterior
+    invoice = db.invoices.find_one({"_id": "1500/B1"})
+    invoice["dumpDate"] = datetime(2016, 10, 20)
+    invoice["total"] = Decimal128("99.50")
+    invoice["billing"] = datetime(2016, 12, 1)
+    invoice["Client"]["customerCode"] = "AB000099"
+    db.invoices.replace_one({"_id": invoice["_id"]}, invoice)
+
+    run(cls, mongo_client, incremental=True, watermark="dumpDate")
+    assert db.restructure_state.find_one()["processed"] == 7
+    actual = rollups(db)
+    assert actual == recomputed(db)
+    monthly = {(d["year"], d["month"]): d for d in db.rollup_monthly.find()}
+    assert monthly[(2016, 11)]["invoiceCount"] == 2
+    assert monthly[(2016, 12)]["invoiceCount"] == 1
+    assert sum(d["invoiceCount"] for d in monthly.values()) == 6
+
+
+def test_incremental_batches_are_idempotent(mongo_client, fixture_dir):
+    db = mongo_client.streamit_db
+    clean_invoices(fixture_dir, mongo_client)
+    held = list(db.invoices.find({"_id": {"$gt": "2000/A0"}}))
+    db.invoices.delete_many({"_id": {"$in": [doc["_id"] for doc in held]}})
+    cls = load_restructurer(checkpoint_every=1)
+    run(cls, mongo_client)
+
+    db.invoices.insert_many(held)
+    run(cls, mongo_client, incremental=True)
+    expected = recomputed(db)
+    run(cls, mongo_client, incremental=True)
+    assert rollups(db) == expected
+    assert db.restructure_state.find_one()["processed"] == 6
+
+    # Corte tras aplicar el último lote y antes de guardar la marca: se repite
+    db.restructure_state.update_one({}, {"$set": {"lastId": "2000/A0"}, "$inc": {"processed": -2}})
+    run(cls, mongo_client, incremental=True)
+    assert rollups(db) == expected
+    assert db.invoices_restructured.count_documents({}) == 6
+
+
+def test_rollups_store_counts_not_members(mongo_client, fixture_dir):
+    clean_invoices(fixture_dir, mongo_client)
+    run(load_restructurer(), mongo_client)
+    db = mongo_client.streamit_db
+    for doc in db.rollup_monthly.find():
+        assert "clients" not in doc and "titles" not in doc["movies"]
+        assert {"year", "month"} <= doc.keys()
+    november = db.rollup_monthly.find_one({"year": 2016, "month": 11})
+    assert november["uniqueClients"] == 3
+    assert november["movies"]["uniqueTitles"] == 3
+    assert november["series"]["uniqueTitles"] == 2